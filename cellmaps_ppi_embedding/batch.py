@@ -0,0 +1,366 @@
+#! /usr/bin/env python
+
+import os
+import csv
+import json
+import time
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from cellmaps_ppi_embedding.exceptions import CellMapsPPIEmbeddingError
+from cellmaps_ppi_embedding.graph import CSRGraph
+from cellmaps_ppi_embedding.profiling import PhaseProfiler
+from cellmaps_ppi_embedding.runner import Node2VecEmbeddingGenerator
+from cellmaps_ppi_embedding.runner import CellMapsPPIEmbedder
+
+logger = logging.getLogger(__name__)
+
+_worker_batch = None
+"""
+:py:class:`BatchEmbedder` used by the current pool worker process,
+set by :py:func:`_init_batch_worker`
+"""
+
+
+def _init_batch_worker(batch):
+    """
+    Initializer for pool worker processes that stores **batch**
+    and imports gensim so each worker pays that cost once rather
+    than once per network
+
+    :param batch: batch being run
+    :type batch: :py:class:`BatchEmbedder`
+    """
+    global _worker_batch
+    _worker_batch = batch
+    from gensim.models import Word2Vec  # noqa: F401
+
+
+def _run_network_task(network):
+    """
+    Runs **network** with the batch of this worker process
+
+    :param network: network to embed
+    :type network: dict
+    :return: row for summary table
+    :rtype: dict
+    """
+    return _worker_batch.run_network(network)
+
+
+class BatchEmbedder(object):
+    """
+    Embeds many networks, listed in a manifest, with Node2Vec in one
+    process pool instead of one command line invocation per network.
+
+    Networks are run largest first, by number of edges, so the
+    biggest ones do not start last and hold up the whole batch.
+    Pool worker processes are reused from one network to the next.
+    Each network is written to its own output directory under
+    **outdir** by :py:class:`~cellmaps_ppi_embedding.runner.CellMapsPPIEmbedder`,
+    with its own RO-Crate, and a failure only fails that network.
+    Timings and status of every network are written to
+    :py:const:`SUMMARY_FILE`
+    """
+    SUMMARY_FILE = 'batch_summary.tsv'
+    MANIFEST_COLS = ['inputdir', 'name', 'provenance']
+    SUMMARY_COLS = ['name', 'status', 'num_nodes', 'num_edges',
+                    'run_seconds', 'inputdir', 'outdir', 'error']
+    RESERVED_GENERATOR_ARGS = ['nx_network', 'csr_graph', 'workers']
+    RESERVED_EMBEDDER_ARGS = ['outdir', 'inputdir', 'embedding_generator',
+                              'input_data_dict', 'profiler']
+
+    def __init__(self, outdir, networks, workers=1, parallel_networks=1,
+                 weight_col=None, generator_args=None, embedder_args=None):
+        """
+        Constructor
+
+        :param outdir: directory where output directory of each
+                       network and summary are written
+        :type outdir: str
+        :param networks: networks to embed as dicts with ``inputdir``, directory
+                         with edge list file, and optionally ``name``, name of
+                         output directory which defaults to last part of
+                         ``inputdir``, and ``provenance``, path to provenance
+                         JSON file used if ``inputdir`` has no RO-Crate.
+                         :py:meth:`read_manifest` reads these from a file
+        :type networks: list
+        :param workers: Total number of cores to use
+        :type workers: int
+        :param parallel_networks: Number of networks to run at the same time,
+                                  each gets an equal share of **workers**
+        :type parallel_networks: int
+        :param weight_col: Name of column in edge list files with edge weights
+        :type weight_col: str
+        :param generator_args: Additional keyword arguments passed to
+                               :py:class:`~cellmaps_ppi_embedding.runner.Node2VecEmbeddingGenerator`
+                               such as ``dimensions`` or ``seed``. Cannot include
+                               :py:const:`RESERVED_GENERATOR_ARGS` which are set per network
+        :type generator_args: dict
+        :param embedder_args: Additional keyword arguments passed to
+                              :py:class:`~cellmaps_ppi_embedding.runner.CellMapsPPIEmbedder`
+                              such as ``provenance`` or ``skip_logging``. Cannot include
+                              :py:const:`RESERVED_EMBEDDER_ARGS` which are set per network
+        :type embedder_args: dict
+        :raises CellMapsPPIEmbeddingError: If **outdir** is ``None``, there are no
+                                           networks, a network is missing ``inputdir``,
+                                           names are not unique, **generator_args** or
+                                           **embedder_args** have reserved keys or
+                                           ``save_model`` is set along with
+                                           ``split_components``
+        """
+        if outdir is None:
+            raise CellMapsPPIEmbeddingError('outdir is None')
+        if networks is None or len(networks) == 0:
+            raise CellMapsPPIEmbeddingError('No networks to embed')
+        for args, reserved in ((generator_args, BatchEmbedder.RESERVED_GENERATOR_ARGS),
+                               (embedder_args, BatchEmbedder.RESERVED_EMBEDDER_ARGS)):
+            conflicts = [key for key in reserved if args is not None and key in args]
+            if len(conflicts) > 0:
+                raise CellMapsPPIEmbeddingError('Arguments set for each network cannot be '
+                                                'passed in: ' + ', '.join(conflicts))
+        if generator_args is not None and generator_args.get('split_components') and \
+                embedder_args is not None and embedder_args.get('save_model'):
+            raise CellMapsPPIEmbeddingError('save_model cannot be used with split_components '
+                                            'since each component has its own model')
+        self._outdir = os.path.abspath(outdir)
+        self._networks = []
+        for network in networks:
+            if network.get('inputdir') is None or network['inputdir'] == '':
+                raise CellMapsPPIEmbeddingError('Network is missing inputdir: ' + str(network))
+            inputdir = os.path.abspath(network['inputdir'])
+            name = network.get('name') or os.path.basename(os.path.normpath(inputdir))
+            self._networks.append({'name': name, 'inputdir': inputdir,
+                                   'provenance': network.get('provenance') or None})
+        names = [network['name'] for network in self._networks]
+        duplicates = sorted(set([name for name in names if names.count(name) > 1]))
+        if len(duplicates) > 0:
+            raise CellMapsPPIEmbeddingError('Networks must have unique names, '
+                                            'duplicates: ' + ', '.join(duplicates))
+        self._workers = max(1, workers)
+        self._parallel_networks = max(1, min(parallel_networks, self._workers,
+                                             len(self._networks)))
+        self._weight_col = weight_col
+        self._generator_args = generator_args if generator_args is not None else {}
+        self._embedder_args = embedder_args if embedder_args is not None else {}
+
+    @staticmethod
+    def read_manifest(manifest_file):
+        """
+        Reads tab delimited **manifest_file** with a header of
+        :py:const:`MANIFEST_COLS`, of which only ``inputdir`` is
+        required. Relative paths are relative to the directory of
+        **manifest_file**. Blank lines and lines starting with ``#``
+        are skipped
+
+        :param manifest_file: path to manifest
+        :type manifest_file: str
+        :raises CellMapsPPIEmbeddingError: If header lacks ``inputdir``
+                                           or has unknown columns
+        :return: networks as dicts to pass to constructor
+        :rtype: list
+        """
+        basedir = os.path.dirname(os.path.abspath(manifest_file))
+        with open(manifest_file, 'r', newline='') as f:
+            lines = [line for line in f if line.strip() != '' and not line.startswith('#')]
+        reader = csv.DictReader(lines, delimiter='\t')
+        header = reader.fieldnames if reader.fieldnames is not None else []
+        if 'inputdir' not in header:
+            raise CellMapsPPIEmbeddingError('Manifest ' + manifest_file +
+                                            ' must have inputdir column in header')
+        unknown = set(header).difference(BatchEmbedder.MANIFEST_COLS)
+        if len(unknown) > 0:
+            raise CellMapsPPIEmbeddingError('Unsupported manifest columns: ' +
+                                            ', '.join(sorted(unknown)))
+        networks = []
+        for row in reader:
+            network = {}
+            for col in BatchEmbedder.MANIFEST_COLS:
+                val = row.get(col)
+                if val is None or val.strip() == '':
+                    continue
+                val = val.strip()
+                if col != 'name':
+                    val = os.path.join(basedir, val)
+                network[col] = val
+            networks.append(network)
+        return networks
+
+    @staticmethod
+    def get_num_edges(inputdir):
+        """
+        Counts edges in edge list file of **inputdir** by counting
+        lines, which is much faster than loading it
+
+        :param inputdir: directory with edge list file
+        :type inputdir: str
+        :return: number of edges or ``0`` if there is no edge list file
+        :rtype: int
+        """
+        try:
+            edgelist_file = CellMapsPPIEmbedder.get_apms_edgelist_file(inputdir)
+            num_lines = 0
+            last = b'\n'
+            with open(edgelist_file, 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 ** 2), b''):
+                    num_lines += chunk.count(b'\n')
+                    last = chunk[-1:]
+        except OSError:
+            return 0
+        if last != b'\n':
+            num_lines += 1
+        # first line is header
+        return max(0, num_lines - 1)
+
+    def get_summary_file(self):
+        """
+        Gets path to summary table
+
+        :return: path
+        :rtype: str
+        """
+        return os.path.join(self._outdir, BatchEmbedder.SUMMARY_FILE)
+
+    def get_networks(self):
+        """
+        Gets networks in the order they are run, largest first,
+        each with ``name``, ``inputdir``, ``provenance`` and
+        ``num_edges``
+
+        :return: networks
+        :rtype: list
+        """
+        networks = [dict(network, num_edges=BatchEmbedder.get_num_edges(network['inputdir']))
+                    for network in self._networks]
+        return sorted(networks, key=lambda network: network['num_edges'], reverse=True)
+
+    def run_network(self, network):
+        """
+        Loads edge list of **network**, embeds it and writes its
+        output directory. Any error is caught and recorded in the
+        row returned so other networks are unaffected
+
+        :param network: network as returned by :py:meth:`get_networks`
+        :type network: dict
+        :return: row for summary table
+        :rtype: dict
+        """
+        network_outdir = os.path.join(self._outdir, network['name'])
+        row = {'name': network['name'], 'inputdir': network['inputdir'],
+               'outdir': network_outdir, 'num_nodes': '',
+               'num_edges': network['num_edges'], 'error': ''}
+        workers = max(1, self._workers // self._parallel_networks)
+        input_data_dict = dict(self._generator_args)
+        input_data_dict.update({'outdir': network_outdir, 'inputdir': network['inputdir'],
+                                'weight_col': self._weight_col, 'workers': workers})
+        start = time.time()
+        try:
+            embedder_args = dict(self._embedder_args)
+            embedder_args.setdefault('compress_workers', workers)
+            if network['provenance'] is not None:
+                with open(network['provenance'], 'r') as f:
+                    embedder_args['provenance'] = json.load(f)
+            profiler = PhaseProfiler()
+            with profiler.phase('load'):
+                edgelist_file = CellMapsPPIEmbedder.get_apms_edgelist_file(network['inputdir'])
+                csr_graph = CSRGraph.from_edgelist_file(edgelist_file,
+                                                        weight_col=self._weight_col)
+            row['num_nodes'] = csr_graph.get_num_nodes()
+            row['num_edges'] = csr_graph.get_num_edges()
+            gen = Node2VecEmbeddingGenerator(csr_graph=csr_graph, workers=workers,
+                                             **self._generator_args)
+            embedder = CellMapsPPIEmbedder(outdir=network_outdir, embedding_generator=gen,
+                                           inputdir=network['inputdir'],
+                                           input_data_dict=input_data_dict,
+                                           profiler=profiler, **embedder_args)
+            row['status'] = embedder.run()
+        except Exception as e:
+            logger.exception('Network ' + network['name'] + ' failed')
+            row['status'] = 2
+            row['error'] = str(e)
+        row['run_seconds'] = round(time.time() - start, 3)
+        logger.info('Network ' + network['name'] + ' finished with status ' +
+                    str(row['status']) + ' in ' + str(row['run_seconds']) + ' seconds')
+        return row
+
+    def _run_pool(self, networks, processes):
+        """
+        Runs **networks** in a pool of **processes** worker processes
+
+        :param networks: networks to run in order submitted
+        :type networks: list
+        :param processes: number of worker processes
+        :type processes: int
+        :return: (network name to row, networks whose worker process
+                 died before they finished)
+        :rtype: tuple
+        """
+        rows = {}
+        unfinished = []
+        with ProcessPoolExecutor(max_workers=processes,
+                                 initializer=_init_batch_worker,
+                                 initargs=(self,)) as pool:
+            futures = [(network, pool.submit(_run_network_task, network))
+                       for network in networks]
+            for network, future in futures:
+                try:
+                    rows[network['name']] = future.result()
+                except BrokenProcessPool:
+                    unfinished.append(network)
+        return rows, unfinished
+
+    def _write_summary(self, rows):
+        """
+        Writes summary table
+
+        :param rows: rows as returned by :py:meth:`run_network`
+        :type rows: list
+        """
+        with open(self.get_summary_file(), 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=BatchEmbedder.SUMMARY_COLS,
+                                    delimiter='\t')
+            writer.writeheader()
+            for row in rows:
+                writer.writerow(row)
+
+    def run(self):
+        """
+        Embeds every network, then writes summary table with
+        networks in the order given to the constructor.
+
+        If a worker process dies, such as when it runs out of
+        memory, the pool cannot be used again so networks that
+        had not finished are run again one at a time, each in a
+        new process, to find which failed
+
+        :return: ``0`` if all networks succeeded otherwise ``1``
+        :rtype: int
+        """
+        os.makedirs(self._outdir, exist_ok=True)
+        networks = self.get_networks()
+        logger.info('Embedding ' + str(len(networks)) + ' networks with ' +
+                    str(self._parallel_networks) + ' at a time')
+
+        if self._parallel_networks == 1:
+            rows = {network['name']: self.run_network(network) for network in networks}
+        else:
+            rows, unfinished = self._run_pool(networks, self._parallel_networks)
+            for network in unfinished:
+                logger.warning('Worker process running ' + network['name'] +
+                               ' or another network died, running it again alone')
+                retry_rows, _ = self._run_pool([network], 1)
+                rows[network['name']] = retry_rows.get(network['name'],
+                                                       {'name': network['name'],
+                                                        'status': 2,
+                                                        'num_edges': network['num_edges'],
+                                                        'inputdir': network['inputdir'],
+                                                        'outdir': os.path.join(self._outdir,
+                                                                               network['name']),
+                                                        'error': 'Worker process died'})
+
+        ordered_rows = [rows[network['name']] for network in self._networks]
+        self._write_summary(ordered_rows)
+        if all(row['status'] == 0 for row in ordered_rows):
+            return 0
+        return 1
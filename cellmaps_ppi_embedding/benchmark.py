@@ -0,0 +1,367 @@
+#! /usr/bin/env python
+
+import os
+import sys
+import time
+import shutil
+import logging
+import platform
+import multiprocessing
+
+import numpy as np
+from cellmaps_utils import constants
+
+import cellmaps_ppi_embedding
+from cellmaps_ppi_embedding.graph import CSRGraph
+from cellmaps_ppi_embedding.profiling import PhaseProfiler
+from cellmaps_ppi_embedding import runner
+from cellmaps_ppi_embedding.runner import Node2VecEmbeddingGenerator
+from cellmaps_ppi_embedding.runner import SpectralEmbeddingGenerator
+from cellmaps_ppi_embedding.runner import FastRPEmbeddingGenerator
+from cellmaps_ppi_embedding.runner import CellMapsPPIEmbedder
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+"""
+Default number of edges in graphs benchmarked
+"""
+
+BENCHMARK_PROVENANCE = {'name': 'Synthetic scale free PPI benchmark',
+                        'organization-name': 'Benchmark organization',
+                        'project-name': 'Benchmark project',
+                        'description': 'Synthetic scale free network',
+                        'keywords': ['benchmark']}
+"""
+Provenance passed to :py:class:`~cellmaps_ppi_embedding.runner.CellMapsPPIEmbedder`
+for benchmark runs
+"""
+
+
+def write_scale_free_edgelist(edgelist_file, num_edges, mean_degree=8, exponent=2.5, seed=None):
+    """
+    Writes a random PPI like network with a power law degree
+    distribution to **edgelist_file** in the format of
+    :py:const:`~cellmaps_utils.constants.PPI_EDGELIST_FILE`.
+
+    Edges are drawn with the Chung-Lu model where the chance of
+    connecting two nodes is proportional to the product of their
+    expected degrees, which follow a power law with **exponent**.
+    Self loops and duplicate edges are dropped and more edges are
+    drawn until there are **num_edges**.
+
+    :param edgelist_file: path to write
+    :type edgelist_file: str
+    :param num_edges: number of edges to write
+    :type num_edges: int
+    :param mean_degree: average number of neighbors per node, sets
+                        number of nodes to ``2 * num_edges / mean_degree``
+                        unless that is too few nodes for **num_edges**
+                        to be at most a quarter of all pairs of nodes
+    :type mean_degree: float
+    :param exponent: power law exponent of degree distribution
+    :type exponent: float
+    :param seed: seed for random number generator
+    :type seed: int
+    :return: number of nodes with at least one edge
+    :rtype: int
+    """
+    rng = np.random.default_rng(seed)
+    # small graphs get more nodes so distinct pairs are easily drawn,
+    # at most a quarter of all pairs become edges
+    num_nodes = max(2, int(2 * num_edges / mean_degree),
+                    int(np.ceil(np.sqrt(8 * num_edges))) + 1)
+    expected_degree = np.arange(1, num_nodes + 1, dtype=np.float64) ** (-1.0 / (exponent - 1.0))
+    prob = expected_degree / expected_degree.sum()
+    edge_keys = np.empty(0, dtype=np.int64)
+    while len(edge_keys) < num_edges:
+        draw = int((num_edges - len(edge_keys)) * 1.2) + 10
+        src = rng.choice(num_nodes, size=draw, p=prob)
+        dst = rng.choice(num_nodes, size=draw, p=prob)
+        keep = src != dst
+        keys = np.minimum(src, dst)[keep] * num_nodes + np.maximum(src, dst)[keep]
+        # keep edges in order drawn so result does not depend on draw size
+        keys = np.concatenate((edge_keys, keys))
+        _, first = np.unique(keys, return_index=True)
+        edge_keys = keys[np.sort(first)]
+    edge_keys = edge_keys[:num_edges]
+    src = edge_keys // num_nodes
+    dst = edge_keys % num_nodes
+    with open(edgelist_file, 'w') as f:
+        f.write(constants.PPI_EDGELIST_GENEA_COL + '\t' + constants.PPI_EDGELIST_GENEB_COL + '\n')
+        for start in range(0, num_edges, 100000):
+            f.write(''.join(['G' + str(a) + '\tG' + str(b) + '\n'
+                             for a, b in zip(src[start:start + 100000].tolist(),
+                                             dst[start:start + 100000].tolist())]))
+    return int(len(np.union1d(src, dst)))
+
+
+def _get_peak_rss_mb(children=False):
+    """
+    Gets peak resident set size of this process
+
+    :param children: If ``True`` get peak of largest terminated
+                     child process instead, such as walk workers
+    :type children: bool
+    :return: peak resident set size in megabytes or ``None`` if unknown
+    :rtype: float
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    who = resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF
+    maxrss = resource.getrusage(who).ru_maxrss
+    # linux reports kilobytes, macOS bytes
+    if sys.platform == 'darwin':
+        return round(maxrss / 1024.0 ** 2, 1)
+    return round(maxrss / 1024.0, 1)
+
+
+def _run_size_task(task):
+    """
+    Runs benchmark of one graph size, used to run each
+    size in a fresh process so peak memory is per size
+
+    :param task: (benchmark, number of edges, embedder)
+    :type task: tuple
+    :return: result
+    :rtype: dict
+    """
+    benchmark, num_edges, embedder = task
+    return benchmark.run_size(num_edges, embedder=embedder)
+
+
+class EmbeddingBenchmark(object):
+    """
+    Benchmarks the embedding pipeline end to end on synthetic
+    scale free networks of increasing size, recording time spent
+    in each phase and peak memory. Each network is embedded
+    by every embedder in **embedders** so they can be compared
+    on the same graph.
+
+    Results are a dict that can be saved as JSON and compared
+    against an earlier run with :py:meth:`compare_to_baseline`
+    """
+    PEAK_RSS_MIN_MB = 20.0
+    MIN_SECONDS = 0.1
+
+    def __init__(self, workdir, sizes=None,
+                 dimensions=Node2VecEmbeddingGenerator.DIMENSIONS,
+                 walk_length=Node2VecEmbeddingGenerator.WALK_LENGTH,
+                 num_walks=Node2VecEmbeddingGenerator.NUM_WALKS,
+                 epochs=Node2VecEmbeddingGenerator.EPOCHS,
+                 workers=1, seed=1, isolate=True, keep_outputs=False,
+                 embedders=None):
+        """
+        Constructor
+
+        :param workdir: directory where networks and outputs are written
+        :type workdir: str
+        :param sizes: number of edges in each network benchmarked, if ``None``
+                      :py:const:`DEFAULT_SIZES` is used
+        :type sizes: list
+        :param dimensions: size of embedding
+        :type dimensions: int
+        :param walk_length: length of each walk
+        :type walk_length: int
+        :param num_walks: number of walks per node
+        :type num_walks: int
+        :param epochs: Word2Vec epochs
+        :type epochs: int
+        :param workers: number of workers
+        :type workers: int
+        :param seed: seed for networks, walks and Word2Vec
+        :type seed: int
+        :param isolate: If ``True`` run each size in a new process
+                        so peak memory reported is for that size only
+        :type isolate: bool
+        :param keep_outputs: If ``True`` keep networks and outputs in **workdir**
+        :type keep_outputs: bool
+        :param embedders: embedders to benchmark, from
+                          :py:const:`~cellmaps_ppi_embedding.runner.EMBEDDERS`. If
+                          ``None`` only :py:const:`~cellmaps_ppi_embedding.runner.NODE2VEC_EMBEDDER`
+                          is benchmarked
+        :type embedders: list
+        """
+        self._workdir = os.path.abspath(workdir)
+        self._sizes = sizes if sizes is not None else DEFAULT_SIZES
+        self._dimensions = dimensions
+        self._walk_length = walk_length
+        self._num_walks = num_walks
+        self._epochs = epochs
+        self._workers = workers
+        self._seed = seed
+        self._isolate = isolate
+        self._keep_outputs = keep_outputs
+        self._embedders = embedders if embedders is not None else [runner.NODE2VEC_EMBEDDER]
+
+    def get_params(self):
+        """
+        Gets parameters of benchmark
+
+        :return: parameters
+        :rtype: dict
+        """
+        return {'sizes': list(self._sizes),
+                'dimensions': self._dimensions,
+                'walk_length': self._walk_length,
+                'num_walks': self._num_walks,
+                'epochs': self._epochs,
+                'workers': self._workers,
+                'seed': self._seed,
+                'embedders': list(self._embedders)}
+
+    def _get_generator(self, csr_graph, embedder):
+        """
+        Creates embedding generator benchmarked
+
+        :param csr_graph: network to embed
+        :type csr_graph: :py:class:`~cellmaps_ppi_embedding.graph.CSRGraph`
+        :param embedder: one of :py:const:`~cellmaps_ppi_embedding.runner.EMBEDDERS`
+        :type embedder: str
+        :return: generator
+        :rtype: :py:class:`~cellmaps_ppi_embedding.runner.EmbeddingGenerator`
+        """
+        if embedder == runner.SPECTRAL_EMBEDDER:
+            return SpectralEmbeddingGenerator(csr_graph=csr_graph,
+                                              dimensions=self._dimensions,
+                                              seed=self._seed)
+        if embedder == runner.FASTRP_EMBEDDER:
+            return FastRPEmbeddingGenerator(csr_graph=csr_graph,
+                                            dimensions=self._dimensions,
+                                            seed=self._seed)
+        return Node2VecEmbeddingGenerator(csr_graph=csr_graph,
+                                          dimensions=self._dimensions,
+                                          walk_length=self._walk_length,
+                                          num_walks=self._num_walks,
+                                          epochs=self._epochs,
+                                          workers=self._workers,
+                                          seed=self._seed)
+
+    def run_size(self, num_edges, embedder=runner.NODE2VEC_EMBEDDER):
+        """
+        Generates network with **num_edges** edges, loads it and runs
+        :py:class:`~cellmaps_ppi_embedding.runner.CellMapsPPIEmbedder`
+        with the generator of **embedder**
+
+        :param num_edges: number of edges
+        :type num_edges: int
+        :param embedder: one of :py:const:`~cellmaps_ppi_embedding.runner.EMBEDDERS`
+        :type embedder: str
+        :return: result with ``size``, ``embedder``, ``num_nodes``, ``num_edges``, ``status``,
+                 ``total_seconds``, ``phases`` (phase name to seconds),
+                 ``phase_rss_peak_mb`` (phase name to peak resident set size),
+                 ``peak_rss_mb`` and ``peak_children_rss_mb``
+        :rtype: dict
+        """
+        size_dir = os.path.join(self._workdir, 'edges_' + str(num_edges) + '_' + embedder)
+        inputdir = os.path.join(size_dir, 'input')
+        outdir = os.path.join(size_dir, 'output')
+        if os.path.isdir(size_dir):
+            shutil.rmtree(size_dir)
+        os.makedirs(inputdir)
+        try:
+            edgelist_file = os.path.join(inputdir, constants.PPI_EDGELIST_FILE)
+            write_scale_free_edgelist(edgelist_file, num_edges, seed=self._seed)
+
+            profiler = PhaseProfiler()
+            start = time.perf_counter()
+            with profiler.phase('load'):
+                csr_graph = CSRGraph.from_edgelist_file(edgelist_file)
+            gen = self._get_generator(csr_graph, embedder)
+            status = CellMapsPPIEmbedder(outdir=outdir, embedding_generator=gen,
+                                         inputdir=inputdir, provenance=BENCHMARK_PROVENANCE,
+                                         skip_logging=True, profiler=profiler).run()
+            total_seconds = time.perf_counter() - start
+        finally:
+            if not self._keep_outputs:
+                shutil.rmtree(size_dir, ignore_errors=True)
+
+        result = {'size': num_edges,
+                  'embedder': embedder,
+                  'num_nodes': csr_graph.get_num_nodes(),
+                  'num_edges': csr_graph.get_num_edges(),
+                  'status': status,
+                  'total_seconds': round(total_seconds, 3),
+                  'phases': {name: round(stats['seconds'], 3)
+                             for name, stats in profiler.get_phases().items()},
+                  'phase_rss_peak_mb': {name: stats.get('rss_peak_mb')
+                                        for name, stats in profiler.get_phases().items()},
+                  'peak_rss_mb': _get_peak_rss_mb(),
+                  'peak_children_rss_mb': _get_peak_rss_mb(children=True)}
+        logger.info('Benchmark of ' + str(num_edges) + ' edges with ' + embedder + ' took ' +
+                    str(result['total_seconds']) + ' seconds')
+        return result
+
+    def run(self):
+        """
+        Runs benchmark for every size and embedder
+
+        :return: results with ``version``, ``python``, ``platform``,
+                 ``params`` and ``results`` holding one result per
+                 size and embedder as returned by :py:meth:`run_size`
+        :rtype: dict
+        """
+        os.makedirs(self._workdir, exist_ok=True)
+        results = []
+        for num_edges in self._sizes:
+            for embedder in self._embedders:
+                if self._isolate:
+                    ctx = multiprocessing.get_context('spawn')
+                    with ctx.Pool(processes=1) as pool:
+                        results.append(pool.apply(_run_size_task, ((self, num_edges, embedder),)))
+                else:
+                    results.append(self.run_size(num_edges, embedder=embedder))
+        return {'version': cellmaps_ppi_embedding.__version__,
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'params': self.get_params(),
+                'results': results}
+
+    @staticmethod
+    def compare_to_baseline(results, baseline, tolerance=0.25):
+        """
+        Compares **results** to **baseline** flagging any phase,
+        total time or peak memory that grew by more than **tolerance**.
+        Results are matched by size and embedder, results without an
+        embedder being :py:const:`~cellmaps_ppi_embedding.runner.NODE2VEC_EMBEDDER`.
+        Those missing from either are skipped, as are times under
+        :py:const:`MIN_SECONDS` and memory under :py:const:`PEAK_RSS_MIN_MB`
+        in the baseline since those are mostly noise
+
+        :param results: results as returned by :py:meth:`run`
+        :type results: dict
+        :param baseline: results of earlier run
+        :type baseline: dict
+        :param tolerance: allowed fractional increase, ``0.25`` allows 25%
+        :type tolerance: float
+        :return: description of each regression found
+        :rtype: list
+        """
+        baseline_by_key = {(res['size'], res.get('embedder', runner.NODE2VEC_EMBEDDER)): res
+                           for res in baseline.get('results', [])}
+        regressions = []
+        for res in results.get('results', []):
+            embedder = res.get('embedder', runner.NODE2VEC_EMBEDDER)
+            base = baseline_by_key.get((res['size'], embedder))
+            if base is None:
+                continue
+            label = str(res['size']) + ' edges'
+            if embedder != runner.NODE2VEC_EMBEDDER:
+                label += ' ' + embedder
+            metrics = [('total_seconds', res.get('total_seconds'), base.get('total_seconds'),
+                        EmbeddingBenchmark.MIN_SECONDS),
+                       ('peak_rss_mb', res.get('peak_rss_mb'), base.get('peak_rss_mb'),
+                        EmbeddingBenchmark.PEAK_RSS_MIN_MB)]
+            for name, seconds in res.get('phases', {}).items():
+                metrics.append(('phase ' + name, seconds, base.get('phases', {}).get(name),
+                                EmbeddingBenchmark.MIN_SECONDS))
+            for name, val, base_val, minimum in metrics:
+                if val is None or base_val is None or base_val < minimum:
+                    continue
+                if val > base_val * (1.0 + tolerance):
+                    regressions.append(label + ': ' + name + ' ' +
+                                       str(val) + ' vs baseline ' + str(base_val) +
+                                       ' (+' + str(round(100.0 * (val / base_val - 1.0), 1)) + '%)')
+        return regressions
@@ -0,0 +1,219 @@
+#! /usr/bin/env python
+
+import os
+import json
+import uuid
+import shutil
+import hashlib
+import logging
+
+from cellmaps_ppi_embedding.exceptions import CellMapsPPIEmbeddingError
+
+logger = logging.getLogger(__name__)
+
+
+class WalkCache(object):
+    """
+    Content addressed cache of walk files.
+
+    Walks are stored as ``.npy`` matrices of ``int32`` node ids
+    (see :py:class:`~cellmaps_ppi_embedding.walks.WalkCorpus`) named
+    by a hash of the graph and the parameters used to generate them,
+    so a later run over the same network with the same walk
+    parameters can skip walk generation.
+
+    The cache is bounded by total size in bytes. When adding a file
+    pushes the cache over that limit, least recently used entries are
+    removed first. Use is tracked through file modification times
+    which are updated on every hit.
+    """
+    SUFFIX = '.npy'
+    DEFAULT_MAX_BYTES = 10 * 1024 ** 3
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_MAX_BYTES):
+        """
+        Constructor
+
+        :param cache_dir: Directory holding cached walk files,
+                          created if needed
+        :type cache_dir: str
+        :param max_bytes: Maximum total size of cached files in bytes.
+                          If ``None`` the cache is unbounded
+        :type max_bytes: int
+        """
+        self._cache_dir = os.path.abspath(cache_dir)
+        self._max_bytes = max_bytes
+        os.makedirs(self._cache_dir, exist_ok=True)
+
+    def get_cache_dir(self):
+        """
+        Gets directory holding cached walk files
+
+        :return: path to cache directory
+        :rtype: str
+        """
+        return self._cache_dir
+
+    def get_max_bytes(self):
+        """
+        Gets maximum total size of cache
+
+        :return: size in bytes or ``None`` if unbounded
+        :rtype: int
+        """
+        return self._max_bytes
+
+    @staticmethod
+    def get_key(csr_graph, walk_params):
+        """
+        Gets key identifying walks over **csr_graph** generated
+        with **walk_params**. Key is a SHA-256 hex digest of the
+        graph arrays, the node names and the parameters
+
+        :param csr_graph: network walked
+        :type csr_graph: :py:class:`~cellmaps_ppi_embedding.graph.CSRGraph`
+        :param walk_params: parameters that determine the walks,
+                            must be serializable to JSON
+        :type walk_params: dict
+        :return: key
+        :rtype: str
+        """
+        digest = hashlib.sha256()
+        for arr in (csr_graph.get_indptr(), csr_graph.get_indices(), csr_graph.get_weights()):
+            digest.update(str(arr.dtype).encode('utf-8'))
+            digest.update(arr.tobytes())
+        digest.update('\n'.join(csr_graph.get_node_names()).encode('utf-8'))
+        digest.update(json.dumps(walk_params, sort_keys=True).encode('utf-8'))
+        return digest.hexdigest()
+
+    def _get_path(self, key):
+        """
+        Gets path of cached file for **key**
+
+        :param key: key as returned by :py:meth:`get_key`
+        :type key: str
+        :return: path
+        :rtype: str
+        """
+        return os.path.join(self._cache_dir, key + WalkCache.SUFFIX)
+
+    def _get_entries(self):
+        """
+        Gets cached files ordered from least to most recently used
+
+        :return: (modification time, size, path) for each entry
+        :rtype: list
+        """
+        entries = []
+        for entry in os.scandir(self._cache_dir):
+            if not entry.name.endswith(WalkCache.SUFFIX) or not entry.is_file():
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+        entries.sort()
+        return entries
+
+    def get_size(self):
+        """
+        Gets total size of cached files
+
+        :return: size in bytes
+        :rtype: int
+        """
+        return sum(size for _, size, _ in self._get_entries())
+
+    @staticmethod
+    def _link_or_copy(src, dest):
+        """
+        Hard links **src** to **dest** falling back to a copy if
+        they are on different file systems. **dest** is replaced
+        if it exists
+
+        :param src: existing file
+        :type src: str
+        :param dest: path to create
+        :type dest: str
+        """
+        tmp_dest = dest + '.' + uuid.uuid4().hex + '.tmp'
+        try:
+            os.link(src, tmp_dest)
+        except OSError:
+            shutil.copyfile(src, tmp_dest)
+        os.replace(tmp_dest, dest)
+
+    def get(self, key, dest):
+        """
+        Places cached walks for **key** at **dest**. A hard link
+        is used where possible so the walks stay readable even if
+        the entry is evicted while they are in use
+
+        :param key: key as returned by :py:meth:`get_key`
+        :type key: str
+        :param dest: path to place walk file at
+        :type dest: str
+        :return: ``True`` if walks were found in cache otherwise ``False``
+        :rtype: bool
+        """
+        path = self._get_path(key)
+        try:
+            WalkCache._link_or_copy(path, dest)
+        except FileNotFoundError:
+            logger.debug('Walk cache miss for ' + key)
+            return False
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        logger.info('Walk cache hit for ' + key)
+        return True
+
+    def put(self, key, walk_file):
+        """
+        Adds **walk_file** to cache under **key** and evicts least
+        recently used entries if the cache exceeds its maximum size
+
+        :param key: key as returned by :py:meth:`get_key`
+        :type key: str
+        :param walk_file: walk file to add
+        :type walk_file: str
+        :raises CellMapsPPIEmbeddingError: If **walk_file** does not exist
+        """
+        if not os.path.isfile(walk_file):
+            raise CellMapsPPIEmbeddingError('Walk file ' + str(walk_file) + ' does not exist')
+        path = self._get_path(key)
+        WalkCache._link_or_copy(walk_file, path)
+        os.utime(path)
+        logger.debug('Added ' + walk_file + ' to walk cache as ' + key)
+        self.evict(keep=path)
+
+    def evict(self, keep=None):
+        """
+        Removes least recently used entries until cache is no
+        larger than its maximum size
+
+        :param keep: path of entry that should not be removed
+        :type keep: str
+        :return: paths of removed entries
+        :rtype: list
+        """
+        if self._max_bytes is None:
+            return []
+        entries = self._get_entries()
+        total = sum(size for _, size, _ in entries)
+        removed = []
+        for _, size, path in entries:
+            if total <= self._max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed.append(path)
+            logger.debug('Evicted ' + path + ' from walk cache')
+        return removed
@@ -0,0 +1,74 @@
+#! /usr/bin/env python
+
+import os
+import json
+import logging
+
+from gensim.models.callbacks import CallbackAny2Vec
+
+from cellmaps_ppi_embedding import runner
+
+logger = logging.getLogger(__name__)
+
+
+class LossLogger(CallbackAny2Vec):
+    def __init__(self):
+        self.epoch = 0
+        self.cumulative_loss = 0.0
+        self.epoch_losses = []
+    
+    def on_epoch_end(self, model):
+        latest_cumulative = model.get_latest_training_loss()
+        if self.epoch == 0:
+            epoch_loss = latest_cumulative
+        else:
+            epoch_loss = latest_cumulative - self.cumulative_loss
+        self.epoch_losses.append(epoch_loss)
+        self.cumulative_loss = latest_cumulative
+        runner._import_mlflow().log_metrics(
+            metrics={
+                "total_loss": latest_cumulative,
+                "epoch_loss": epoch_loss
+            },
+            step=self.epoch
+        )
+        logger.info('Epoch ' + str(self.epoch) + ' | Loss: ' + str(epoch_loss))
+        self.epoch += 1
+
+
+class CheckpointSaver(CallbackAny2Vec):
+    """
+    Saves model, along with a JSON file noting how many
+    epochs have completed, at the end of every epoch
+    """
+
+    def __init__(self, model_file, state_file, state, epochs_completed=0):
+        """
+        Constructor
+
+        :param model_file: path to write model to
+        :type model_file: str
+        :param state_file: path to write JSON state to
+        :type state_file: str
+        :param state: parameters of the run to store in **state_file**
+        :type state: dict
+        :param epochs_completed: epochs completed before training started
+        :type epochs_completed: int
+        """
+        self.model_file = model_file
+        self.state_file = state_file
+        self.state = state
+        self.epochs_completed = epochs_completed
+
+    def on_epoch_end(self, model):
+        self.epochs_completed += 1
+        # write to temporary file first so an interrupted save
+        # does not clobber the previous checkpoint
+        model.save(self.model_file + '.tmp', separately=[])
+        os.replace(self.model_file + '.tmp', self.model_file)
+        state = dict(self.state)
+        state['epochs_completed'] = self.epochs_completed
+        with open(self.state_file + '.tmp', 'w') as f:
+            json.dump(state, f, indent=2)
+        os.replace(self.state_file + '.tmp', self.state_file)
+        logger.debug('Saved checkpoint after epoch ' + str(self.epochs_completed))
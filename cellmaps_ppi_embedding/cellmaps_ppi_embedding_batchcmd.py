@@ -0,0 +1,210 @@
+#! /usr/bin/env python
+
+import argparse
+import json
+import sys
+import logging
+import logging.config
+from cellmaps_utils import logutils
+from cellmaps_utils import constants
+import cellmaps_ppi_embedding
+from cellmaps_ppi_embedding import writers
+from cellmaps_ppi_embedding import knn
+from cellmaps_ppi_embedding.runner import Node2VecEmbeddingGenerator, EmbeddingGenerator
+from cellmaps_ppi_embedding.batch import BatchEmbedder
+
+logger = logging.getLogger(__name__)
+
+
+def _parse_arguments(desc, args):
+    """
+    Parses command line arguments
+
+    :param desc: description to display on command line
+    :type desc: str
+    :param args: command line arguments usually :py:func:`sys.argv[1:]`
+    :type args: list
+    :return: arguments parsed by :py:mod:`argparse`
+    :rtype: :py:class:`argparse.Namespace`
+    """
+    parser = argparse.ArgumentParser(description=desc,
+                                     formatter_class=constants.ArgParseFormatter)
+    parser.add_argument('outdir', help='Output directory, each network is '
+                                       'written to a subdirectory')
+    parser.add_argument('--manifest', required=True,
+                        help='Tab delimited file listing networks to embed, one '
+                             'per line, with a header of ' +
+                             ', '.join(BatchEmbedder.MANIFEST_COLS) + '. inputdir, '
+                             'a directory where ppi_edgelist.tsv file resides, is '
+                             'required. name sets the output subdirectory and '
+                             'defaults to the last part of inputdir. provenance is '
+                             'a path to a provenance file used in place of --provenance. '
+                             'Relative paths are relative to the manifest')
+    parser.add_argument('--weight_col',
+                        help='Name of column in header of ppi_edgelist.tsv with '
+                             'edge weights, such as a confidence score. If set, '
+                             'walks move to neighbors in proportion to edge weight, '
+                             'otherwise all edges are weighted equally')
+    parser.add_argument('--dimensions', type=int, default=EmbeddingGenerator.DIMENSIONS,
+                        help='Size of embedding to generate')
+    parser.add_argument('--walk_length', type=int, default=Node2VecEmbeddingGenerator.WALK_LENGTH,
+                        help='Walk Length')
+    parser.add_argument('--num_walks', type=int, default=Node2VecEmbeddingGenerator.NUM_WALKS,
+                        help='Num walks')
+    parser.add_argument('--p', type=int, default=Node2VecEmbeddingGenerator.P_DEFAULT,
+                        help='--p value to pass to node2vec')
+    parser.add_argument('--q', type=int, default=Node2VecEmbeddingGenerator.Q_DEFAULT,
+                        help='--q value to pass to node2vec')
+    parser.add_argument('--degree_threshold', type=int,
+                        default=Node2VecEmbeddingGenerator.DEGREE_THRESHOLD,
+                        help='Nodes with at most this many neighbors take exact walk '
+                             'steps from precomputed tables, others use rejection sampling')
+    parser.add_argument('--split_components', action='store_true',
+                        help='If set, embed the largest connected component and all '
+                             'other components of each network with separate walks '
+                             'and models. Cannot be used with --save_model')
+    parser.add_argument('--seed', type=int, default=Node2VecEmbeddingGenerator.SEED,
+                        help='Seed for random walks and Word2Vec, used for every network')
+    parser.add_argument('--workers', type=int, default=Node2VecEmbeddingGenerator.WORKERS,
+                        help='Total number of cores to use. Each network running '
+                             'at the same time gets an equal share')
+    parser.add_argument('--parallel_networks', type=int, default=1,
+                        help='Number of networks to embed at the same time. '
+                             'Networks with the most edges start first')
+    parser.add_argument('--tmpdir',
+                        help='Directory where generated walks are temporarily '
+                             'written during training. If unset, the system '
+                             'default temporary directory is used')
+    parser.add_argument('--save_vectors', action='store_true',
+                        help='If set, save embeddings of each network as gensim '
+                             'KeyedVectors to ' + Node2VecEmbeddingGenerator.KEYED_VECTORS_FILE)
+    parser.add_argument('--save_model', action='store_true',
+                        help='If set, save the gensim Word2Vec model of each network to ' +
+                             Node2VecEmbeddingGenerator.SAVED_MODEL_FILE + '. Implies --save_vectors')
+    parser.add_argument('--knn', type=int, default=0,
+                        help='If greater than 0, write this many most similar genes '
+                             'for every gene to ' + knn.KNN_FILE)
+    parser.add_argument('--output_format', choices=writers.OUTPUT_FORMATS,
+                        default=writers.TSV_FORMAT,
+                        help='Format of embedding file to write in addition to ' +
+                             constants.PPI_EMBEDDING_FILE)
+    parser.add_argument('--tsv_float_format',
+                        default=writers.TSVEmbeddingWriter.DEFAULT_FLOAT_FORMAT,
+                        help='printf style format for values written to ' +
+                             constants.PPI_EMBEDDING_FILE)
+    parser.add_argument('--compress_tsv', action='store_true',
+                        help='If set, gzip compress ' + constants.PPI_EMBEDDING_FILE)
+    parser.add_argument('--provenance',
+                        help='Path to file containing provenance '
+                             'information about input files in JSON format. '
+                             'This is required for networks whose input directory '
+                             'does not contain ro-crate-metadata.json file and '
+                             'that have no provenance in the manifest.')
+    parser.add_argument('--name',
+                        help='Name of each run, needed for FAIRSCAPE. If '
+                             'unset, name value from input directory '
+                             'or provenance file will be used')
+    parser.add_argument('--organization_name',
+                        help='Name of organization running this tool, needed '
+                             'for FAIRSCAPE. If unset, organization name specified '
+                             'in input directory or provenance file will be used')
+    parser.add_argument('--project_name',
+                        help='Name of project running this tool, needed for '
+                             'FAIRSCAPE. If unset, project name specified '
+                             'in input directory or provenance file will be used')
+    parser.add_argument('--skip_logging', action='store_true',
+                        help='If set, output.log, error.log '
+                             'files will not be created in network '
+                             'output directories')
+    parser.add_argument('--logconf', default=None,
+                        help='Path to python logging configuration file in '
+                             'this format: https://docs.python.org/3/library/'
+                             'logging.config.html#logging-config-fileformat '
+                             'Setting this overrides -v parameter which uses '
+                             ' default logger. (default None)')
+    parser.add_argument('--verbose', '-v', action='count', default=1,
+                        help='Increases verbosity of logger to standard '
+                             'error for log messages in this module. Messages are '
+                             'output at these python logging levels '
+                             '-v = WARNING, -vv = INFO, '
+                             '-vvv = DEBUG, -vvvv = NOTSET (default ERROR '
+                             'logging)')
+    parser.add_argument('--version', action='version',
+                        version=('%(prog)s ' +
+                                 cellmaps_ppi_embedding.__version__))
+
+    return parser.parse_args(args)
+
+
+def main(args):
+    """
+    Main entry point for program
+
+    :param args: arguments passed to command line usually :py:func:`sys.argv[1:]`
+    :type args: list
+
+    :return: return value of :py:meth:`cellmaps_ppi_embedding.batch.BatchEmbedder.run`
+             or ``2`` if an exception is raised
+    :rtype: int
+    """
+    desc = """
+    Version {version}
+
+    Runs Node2Vec embedding for every network listed in
+    --manifest within one process pool, so interpreter start up,
+    imports and the like are paid once rather than per network.
+    Up to --parallel_networks networks run at the same time,
+    largest first. Each network is written, with its own RO-Crate,
+    to a directory under outdir and a table of status and timings
+    is written to {summary} under outdir. A network that fails
+    does not stop the others
+
+    """.format(version=cellmaps_ppi_embedding.__version__,
+               summary=BatchEmbedder.SUMMARY_FILE)
+    theargs = _parse_arguments(desc, args[1:])
+    theargs.program = args[0]
+    theargs.version = cellmaps_ppi_embedding.__version__
+
+    if theargs.provenance is not None:
+        with open(theargs.provenance, 'r') as f:
+            json_prov = json.load(f)
+    else:
+        json_prov = None
+
+    try:
+        logutils.setup_cmd_logging(theargs)
+        networks = BatchEmbedder.read_manifest(theargs.manifest)
+        generator_args = {'dimensions': theargs.dimensions,
+                          'p': theargs.p,
+                          'q': theargs.q,
+                          'walk_length': theargs.walk_length,
+                          'num_walks': theargs.num_walks,
+                          'seed': theargs.seed,
+                          'degree_threshold': theargs.degree_threshold,
+                          'split_components': theargs.split_components,
+                          'tmpdir': theargs.tmpdir}
+        return BatchEmbedder(theargs.outdir, networks,
+                             workers=theargs.workers,
+                             parallel_networks=theargs.parallel_networks,
+                             weight_col=theargs.weight_col,
+                             generator_args=generator_args,
+                             embedder_args={'skip_logging': theargs.skip_logging,
+                                            'name': theargs.name,
+                                            'organization_name': theargs.organization_name,
+                                            'project_name': theargs.project_name,
+                                            'provenance': json_prov,
+                                            'output_format': theargs.output_format,
+                                            'tsv_float_format': theargs.tsv_float_format,
+                                            'compress_tsv': theargs.compress_tsv,
+                                            'save_vectors': theargs.save_vectors,
+                                            'save_model': theargs.save_model,
+                                            'knn_neighbors': theargs.knn}).run()
+    except Exception as e:
+        logger.exception('Caught exception: ' + str(e))
+        return 2
+    finally:
+        logging.shutdown()
+
+
+if __name__ == '__main__':  # pragma: no cover
+    sys.exit(main(sys.argv))
@@ -0,0 +1,152 @@
+#! /usr/bin/env python
+
+import os
+import argparse
+import json
+import sys
+import logging
+import logging.config
+from cellmaps_utils import logutils
+from cellmaps_utils import constants
+import cellmaps_ppi_embedding
+from cellmaps_ppi_embedding import runner
+from cellmaps_ppi_embedding.runner import Node2VecEmbeddingGenerator, EmbeddingGenerator
+from cellmaps_ppi_embedding.benchmark import EmbeddingBenchmark
+from cellmaps_ppi_embedding import benchmark
+
+logger = logging.getLogger(__name__)
+
+RESULTS_FILE = 'benchmark.json'
+"""
+Name of results file written to output directory
+"""
+
+
+def _parse_arguments(desc, args):
+    """
+    Parses command line arguments
+
+    :param desc: description to display on command line
+    :type desc: str
+    :param args: command line arguments usually :py:func:`sys.argv[1:]`
+    :type args: list
+    :return: arguments parsed by :py:mod:`argparse`
+    :rtype: :py:class:`argparse.Namespace`
+    """
+    parser = argparse.ArgumentParser(description=desc,
+                                     formatter_class=constants.ArgParseFormatter)
+    parser.add_argument('outdir', help='Output directory where ' + RESULTS_FILE +
+                                       ' is written. Networks and embeddings are '
+                                       'written here while running')
+    parser.add_argument('--sizes', type=int, nargs='+', default=benchmark.DEFAULT_SIZES,
+                        help='Number of edges in each synthetic network to benchmark')
+    parser.add_argument('--embedders', nargs='+', choices=runner.EMBEDDERS,
+                        default=[runner.NODE2VEC_EMBEDDER],
+                        help='Embedders to benchmark, each network is embedded by '
+                             'every one so their time and memory can be compared')
+    parser.add_argument('--dimensions', type=int, default=EmbeddingGenerator.DIMENSIONS,
+                        help='Size of embedding to generate')
+    parser.add_argument('--walk_length', type=int, default=Node2VecEmbeddingGenerator.WALK_LENGTH,
+                        help='Walk Length')
+    parser.add_argument('--num_walks', type=int, default=Node2VecEmbeddingGenerator.NUM_WALKS,
+                        help='Num walks')
+    parser.add_argument('--epochs', type=int, default=Node2VecEmbeddingGenerator.EPOCHS,
+                        help='Word2Vec epochs')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Number of worker processes used to generate walks '
+                             'and threads used to train Word2Vec')
+    parser.add_argument('--seed', type=int, default=1,
+                        help='Seed for networks, walks and Word2Vec')
+    parser.add_argument('--baseline',
+                        help='Path to ' + RESULTS_FILE + ' of an earlier run. If set, '
+                             'any phase, total time or peak memory that grew by more '
+                             'than --tolerance is reported and exit code is 1')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='Allowed fractional increase over --baseline')
+    parser.add_argument('--keep_outputs', action='store_true',
+                        help='If set, keep networks and embeddings generated')
+    parser.add_argument('--logconf', default=None,
+                        help='Path to python logging configuration file in '
+                             'this format: https://docs.python.org/3/library/'
+                             'logging.config.html#logging-config-fileformat '
+                             'Setting this overrides -v parameter which uses '
+                             ' default logger. (default None)')
+    parser.add_argument('--verbose', '-v', action='count', default=1,
+                        help='Increases verbosity of logger to standard '
+                             'error for log messages in this module. Messages are '
+                             'output at these python logging levels '
+                             '-v = WARNING, -vv = INFO, '
+                             '-vvv = DEBUG, -vvvv = NOTSET (default ERROR '
+                             'logging)')
+    parser.add_argument('--version', action='version',
+                        version=('%(prog)s ' +
+                                 cellmaps_ppi_embedding.__version__))
+
+    return parser.parse_args(args)
+
+
+def main(args):
+    """
+    Main entry point for program
+
+    :param args: arguments passed to command line usually :py:func:`sys.argv[1:]`
+    :type args: list
+
+    :return: ``0`` upon success, ``1`` if regressions against baseline
+             were found or ``2`` if an exception is raised
+    :rtype: int
+    """
+    desc = """
+    Version {version}
+
+    Benchmarks the embedding pipeline end to end on synthetic
+    scale free networks with the number of edges set by --sizes.
+    Each network is embedded by every embedder in --embedders.
+    Time spent in each phase (load, setup, walk_preprocessing, walks,
+    training, write and provenance) and peak memory are written
+    as JSON to {results} in outdir.
+
+    If --baseline is set, results are compared against it and
+    regressions are written to standard out.
+
+    """.format(version=cellmaps_ppi_embedding.__version__,
+               results=RESULTS_FILE)
+    theargs = _parse_arguments(desc, args[1:])
+    theargs.program = args[0]
+    theargs.version = cellmaps_ppi_embedding.__version__
+
+    try:
+        logutils.setup_cmd_logging(theargs)
+        results = EmbeddingBenchmark(os.path.join(theargs.outdir, 'work'),
+                                     sizes=theargs.sizes,
+                                     dimensions=theargs.dimensions,
+                                     walk_length=theargs.walk_length,
+                                     num_walks=theargs.num_walks,
+                                     epochs=theargs.epochs,
+                                     workers=theargs.workers,
+                                     seed=theargs.seed,
+                                     keep_outputs=theargs.keep_outputs,
+                                     embedders=theargs.embedders).run()
+        with open(os.path.join(theargs.outdir, RESULTS_FILE), 'w') as f:
+            json.dump(results, f, indent=2)
+
+        if theargs.baseline is None:
+            return 0
+        with open(theargs.baseline, 'r') as f:
+            baseline = json.load(f)
+        regressions = EmbeddingBenchmark.compare_to_baseline(results, baseline,
+                                                             tolerance=theargs.tolerance)
+        for regression in regressions:
+            sys.stdout.write('Regression: ' + regression + '\n')
+        if len(regressions) > 0:
+            return 1
+        return 0
+    except Exception as e:
+        logger.exception('Caught exception: ' + str(e))
+        return 2
+    finally:
+        logging.shutdown()
+
+
+if __name__ == '__main__':  # pragma: no cover
+    sys.exit(main(sys.argv))
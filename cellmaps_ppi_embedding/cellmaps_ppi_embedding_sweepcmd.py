@@ -0,0 +1,181 @@
+#! /usr/bin/env python
+
+import argparse
+import json
+import sys
+import logging
+import logging.config
+from cellmaps_utils import logutils
+from cellmaps_utils import constants
+import cellmaps_ppi_embedding
+from cellmaps_ppi_embedding.graph import CSRGraph
+from cellmaps_ppi_embedding.runner import Node2VecEmbeddingGenerator, EmbeddingGenerator
+from cellmaps_ppi_embedding.runner import CellMapsPPIEmbedder
+from cellmaps_ppi_embedding.sweep import HyperparameterSweep
+
+logger = logging.getLogger(__name__)
+
+
+def _parse_arguments(desc, args):
+    """
+    Parses command line arguments
+
+    :param desc: description to display on command line
+    :type desc: str
+    :param args: command line arguments usually :py:func:`sys.argv[1:]`
+    :type args: list
+    :return: arguments parsed by :py:mod:`argparse`
+    :rtype: :py:class:`argparse.Namespace`
+    """
+    parser = argparse.ArgumentParser(description=desc,
+                                     formatter_class=constants.ArgParseFormatter)
+    parser.add_argument('outdir', help='Output directory, each configuration is '
+                                       'written to a subdirectory')
+    parser.add_argument('--inputdir', required=True,
+                        help='Directory where ppi_edgelist.tsv file resides')
+    parser.add_argument('--weight_col',
+                        help='Name of column in header of ppi_edgelist.tsv with '
+                             'edge weights, such as a confidence score. If set, '
+                             'walks move to neighbors in proportion to edge weight, '
+                             'otherwise all edges are weighted equally')
+    parser.add_argument('--p', type=float, nargs='+',
+                        default=[Node2VecEmbeddingGenerator.P_DEFAULT],
+                        help='--p values to try')
+    parser.add_argument('--q', type=float, nargs='+',
+                        default=[Node2VecEmbeddingGenerator.Q_DEFAULT],
+                        help='--q values to try')
+    parser.add_argument('--dimensions', type=int, nargs='+',
+                        default=[EmbeddingGenerator.DIMENSIONS],
+                        help='Sizes of embedding to try')
+    parser.add_argument('--window', type=int, nargs='+',
+                        default=[Node2VecEmbeddingGenerator.WINDOW],
+                        help='Word2Vec window sizes to try')
+    parser.add_argument('--epochs', type=int, nargs='+',
+                        default=[Node2VecEmbeddingGenerator.EPOCHS],
+                        help='Word2Vec epochs to try')
+    parser.add_argument('--walk_length', type=int, default=Node2VecEmbeddingGenerator.WALK_LENGTH,
+                        help='Walk Length')
+    parser.add_argument('--num_walks', type=int, default=Node2VecEmbeddingGenerator.NUM_WALKS,
+                        help='Num walks')
+    parser.add_argument('--seed', type=int,
+                        help='Seed for random walks and Word2Vec. If unset, '
+                             'one is chosen at random and used for all '
+                             'configurations')
+    parser.add_argument('--workers', type=int, default=Node2VecEmbeddingGenerator.WORKERS,
+                        help='Total number of cores to use. Walks are generated '
+                             'with all of them and each configuration running '
+                             'at the same time gets an equal share for training')
+    parser.add_argument('--parallel_configs', type=int, default=1,
+                        help='Number of configurations to run at the same time')
+    parser.add_argument('--walk_cache_dir',
+                        help='Directory where generated walks are cached. If unset, ' +
+                             HyperparameterSweep.WALK_CACHE_DIR +
+                             ' directory under output directory is used')
+    parser.add_argument('--tmpdir',
+                        help='Directory where generated walks are temporarily '
+                             'written during training. If unset, the system '
+                             'default temporary directory is used')
+    parser.add_argument('--provenance',
+                        help='Path to file containing provenance '
+                             'information about input files in JSON format. '
+                             'This is required if inputdir does not contain '
+                             'ro-crate-metadata.json file.')
+    parser.add_argument('--name',
+                        help='Name of this run, needed for FAIRSCAPE. If '
+                             'unset, name value from specified '
+                             'by --inputdir directory or provenance file will be used')
+    parser.add_argument('--organization_name',
+                        help='Name of organization running this tool, needed '
+                             'for FAIRSCAPE. If unset, organization name specified '
+                             'in --inputdir directory or provenance file will be used')
+    parser.add_argument('--project_name',
+                        help='Name of project running this tool, needed for '
+                             'FAIRSCAPE. If unset, project name specified '
+                             'in --input directory or provenance file will be used')
+    parser.add_argument('--skip_logging', action='store_true',
+                        help='If set, output.log, error.log '
+                             'files will not be created in configuration '
+                             'output directories')
+    parser.add_argument('--logconf', default=None,
+                        help='Path to python logging configuration file in '
+                             'this format: https://docs.python.org/3/library/'
+                             'logging.config.html#logging-config-fileformat '
+                             'Setting this overrides -v parameter which uses '
+                             ' default logger. (default None)')
+    parser.add_argument('--verbose', '-v', action='count', default=1,
+                        help='Increases verbosity of logger to standard '
+                             'error for log messages in this module. Messages are '
+                             'output at these python logging levels '
+                             '-v = WARNING, -vv = INFO, '
+                             '-vvv = DEBUG, -vvvv = NOTSET (default ERROR '
+                             'logging)')
+    parser.add_argument('--version', action='version',
+                        version=('%(prog)s ' +
+                                 cellmaps_ppi_embedding.__version__))
+
+    return parser.parse_args(args)
+
+
+def main(args):
+    """
+    Main entry point for program
+
+    :param args: arguments passed to command line usually :py:func:`sys.argv[1:]`
+    :type args: list
+
+    :return: return value of :py:meth:`cellmaps_ppi_embedding.sweep.HyperparameterSweep.run`
+             or ``2`` if an exception is raised
+    :rtype: int
+    """
+    desc = """
+    Version {version}
+
+    Runs Node2Vec embedding for every combination of the
+    --p, --q, --dimensions, --window and --epochs values given.
+    The edge list is loaded once and walks are generated once
+    for each combination of --p and --q. Each configuration
+    is written to its own directory under outdir and a table
+    of timings and training loss is written to
+    {summary} under outdir
+
+    """.format(version=cellmaps_ppi_embedding.__version__,
+               summary=HyperparameterSweep.SUMMARY_FILE)
+    theargs = _parse_arguments(desc, args[1:])
+    theargs.program = args[0]
+    theargs.version = cellmaps_ppi_embedding.__version__
+
+    if theargs.provenance is not None:
+        with open(theargs.provenance, 'r') as f:
+            json_prov = json.load(f)
+    else:
+        json_prov = None
+
+    try:
+        logutils.setup_cmd_logging(theargs)
+        csr_graph = CSRGraph.from_edgelist_file(CellMapsPPIEmbedder.get_apms_edgelist_file(theargs.inputdir),
+                                                weight_col=theargs.weight_col)
+        grid = {'p': theargs.p, 'q': theargs.q, 'dimensions': theargs.dimensions,
+                'window': theargs.window, 'epochs': theargs.epochs}
+        return HyperparameterSweep(theargs.outdir, csr_graph, grid,
+                                   inputdir=theargs.inputdir,
+                                   walk_length=theargs.walk_length,
+                                   num_walks=theargs.num_walks,
+                                   seed=theargs.seed,
+                                   workers=theargs.workers,
+                                   parallel_configs=theargs.parallel_configs,
+                                   walk_cache_dir=theargs.walk_cache_dir,
+                                   tmpdir=theargs.tmpdir,
+                                   embedder_args={'skip_logging': theargs.skip_logging,
+                                                  'name': theargs.name,
+                                                  'organization_name': theargs.organization_name,
+                                                  'project_name': theargs.project_name,
+                                                  'provenance': json_prov}).run()
+    except Exception as e:
+        logger.exception('Caught exception: ' + str(e))
+        return 2
+    finally:
+        logging.shutdown()
+
+
+if __name__ == '__main__':  # pragma: no cover
+    sys.exit(main(sys.argv))
@@ -1,15 +1,25 @@
 #! /usr/bin/env python
 
+import os
 import argparse
 import json
 import sys
 import logging
 import logging.config
-import networkx as nx
 from cellmaps_utils import logutils
 from cellmaps_utils import constants
 import cellmaps_ppi_embedding
+from cellmaps_ppi_embedding.graph import CSRGraph
+from cellmaps_ppi_embedding.cache import WalkCache
+from cellmaps_ppi_embedding.profiling import PhaseProfiler
+from cellmaps_ppi_embedding.profiling import CallProfiler
+from cellmaps_ppi_embedding import writers
+from cellmaps_ppi_embedding import knn
+from cellmaps_ppi_embedding import spectral
+from cellmaps_ppi_embedding import runner
 from cellmaps_ppi_embedding.runner import Node2VecEmbeddingGenerator, EmbeddingGenerator
+from cellmaps_ppi_embedding.runner import SpectralEmbeddingGenerator
+from cellmaps_ppi_embedding.runner import FastRPEmbeddingGenerator
 from cellmaps_ppi_embedding.runner import CellMapsPPIEmbedder
 from cellmaps_ppi_embedding.runner import FakeEmbeddingGenerator
 
@@ -32,20 +42,159 @@ def _parse_arguments(desc, args):
     parser.add_argument('outdir', help='Output directory')
     parser.add_argument('--inputdir', required=True,
                         help='Directory where ppi_edgelist.tsv file resides')
+    parser.add_argument('--weight_col',
+                        help='Name of column in header of ppi_edgelist.tsv with '
+                             'edge weights, such as a confidence score. If set, '
+                             'walks move to neighbors in proportion to edge weight, '
+                             'otherwise all edges are weighted equally')
     parser.add_argument('--dimensions', type=int, default=EmbeddingGenerator.DIMENSIONS,
                         help='Size of embedding to generate')
+    parser.add_argument('--embedder', choices=runner.EMBEDDERS,
+                        default=runner.NODE2VEC_EMBEDDER,
+                        help='Algorithm used to embed network. ' + runner.SPECTRAL_EMBEDDER +
+                             ' factorizes a matrix derived from the network by randomized '
+                             'truncated SVD, which has no walks or training so it is much '
+                             'faster than ' + runner.NODE2VEC_EMBEDDER + ' and suits '
+                             'exploratory runs. ' + runner.FASTRP_EMBEDDER + ' sums '
+                             'repeated products of the sparse transition matrix and a '
+                             'random projection, taking time linear in the number of '
+                             'edges, for networks with millions of edges. Options specific '
+                             'to ' + runner.NODE2VEC_EMBEDDER + ', such as --walk_length, '
+                             'are ignored by the others')
+    parser.add_argument('--spectral_matrix', choices=spectral.MATRICES,
+                        default=SpectralEmbeddingGenerator.MATRIX,
+                        help='Matrix factorized by --embedder ' + runner.SPECTRAL_EMBEDDER +
+                             '. ' + spectral.ADJACENCY_MATRIX + ' is the sparse normalized '
+                             'adjacency matrix and takes time roughly linear in the number '
+                             'of edges. ' + spectral.NETMF_MATRIX + ' is the dense matrix '
+                             'Node2Vec with --p 1 --q 1 implicitly factorizes, closer to '
+                             'Node2Vec but time grows with the square of the number of nodes')
+    parser.add_argument('--spectral_power_iterations', type=int,
+                        default=spectral.POWER_ITERATIONS,
+                        help='Number of power iterations of randomized truncated SVD '
+                             'run by --embedder ' + runner.SPECTRAL_EMBEDDER + '. More '
+                             'is more accurate but slower')
+    parser.add_argument('--fastrp_iteration_weights', type=float, nargs='+',
+                        default=FastRPEmbeddingGenerator.ITERATION_WEIGHTS,
+                        help='Weight of each iteration of --embedder ' + runner.FASTRP_EMBEDDER +
+                             ', the first being one step from each gene. The number of '
+                             'values sets the number of iterations')
+    parser.add_argument('--fastrp_normalization_strength', type=float,
+                        default=FastRPEmbeddingGenerator.NORMALIZATION_STRENGTH,
+                        help='Random projection of each gene is scaled by its degree '
+                             'to this power by --embedder ' + runner.FASTRP_EMBEDDER +
+                             '. Values below 0 reduce the influence of hubs')
     parser.add_argument('--walk_length', type=int, default=Node2VecEmbeddingGenerator.WALK_LENGTH,
                         help='Walk Length')
     parser.add_argument('--num_walks', type=int, default=Node2VecEmbeddingGenerator.NUM_WALKS,
                         help='Num walks')
     parser.add_argument('--workers', type=int, default=Node2VecEmbeddingGenerator.WORKERS,
-                        help='Number of workers')
+                        help='Number of worker processes used to generate walks '
+                             'and threads used to train Word2Vec')
     parser.add_argument('--p', type=int, default=Node2VecEmbeddingGenerator.P_DEFAULT,
                         help='--p value to pass to node2vec')
     parser.add_argument('--q', type=int, default=Node2VecEmbeddingGenerator.Q_DEFAULT,
                         help='--q value to pass to node2vec')
+    parser.add_argument('--degree_threshold', type=int,
+                        default=Node2VecEmbeddingGenerator.DEGREE_THRESHOLD,
+                        help='Nodes with at most this many neighbors take exact walk '
+                             'steps from precomputed tables. Nodes with more, such '
+                             'as hubs, use rejection sampling which needs no tables '
+                             'so time and memory stay bounded. 0 uses rejection '
+                             'sampling for all nodes')
+    parser.add_argument('--split_components', action='store_true',
+                        help='If set, embed the largest connected component and all '
+                             'other components with separate walks and models, the '
+                             'other components in another process with one of --workers. '
+                             'Component structure is added to the task finish json file. '
+                             'Cannot be used with --checkpoint, --resume, --update_from '
+                             'or --save_model')
+    parser.add_argument('--tmpdir',
+                        help='Directory where generated walks are temporarily '
+                             'written during training. If unset, the system '
+                             'default temporary directory is used')
+    parser.add_argument('--seed', type=int, default=Node2VecEmbeddingGenerator.SEED,
+                        help='Seed for random walks and Word2Vec, for randomized SVD '
+                             'of --embedder ' + runner.SPECTRAL_EMBEDDER + ', for random '
+                             'projection of --embedder ' + runner.FASTRP_EMBEDDER + ' or for embeddings '
+                             'drawn by --fake_embedder. If unset, results differ '
+                             'from run to run')
+    parser.add_argument('--walk_cache_dir',
+                        help='Directory where generated walks are cached so later '
+                             'runs over the same network with the same --p, --q, '
+                             '--walk_length, --num_walks and --seed reuse them instead '
+                             'of generating them again')
+    parser.add_argument('--walk_cache_max_size', type=int,
+                        default=WalkCache.DEFAULT_MAX_BYTES // 1024 ** 2,
+                        help='Maximum size in megabytes of --walk_cache_dir. Least '
+                             'recently used walks are removed once it is exceeded')
+    parser.add_argument('--checkpoint', action='store_true',
+                        help='If set, keep generated walks and save the model '
+                             'after every epoch in ' + CellMapsPPIEmbedder.CHECKPOINT_DIR + ' directory '
+                             'under output directory')
+    parser.add_argument('--resume', action='store_true',
+                        help='If set, reuse walks and continue training from the '
+                             'last epoch saved in ' + CellMapsPPIEmbedder.CHECKPOINT_DIR + ' directory '
+                             'under output directory. Implies --checkpoint')
+    parser.add_argument('--update_from',
+                        help='Output directory of an earlier run made with --checkpoint '
+                             'on an older version of the network. Instead of training '
+                             'from scratch, a new model starts from the vectors of the '
+                             'earlier model, matched by node name, and is trained only '
+                             'on walks from nodes near edges that changed. Nodes '
+                             'updated are written to ' +
+                             CellMapsPPIEmbedder.REEMBEDDED_NODES_FILE + '. Implies --checkpoint')
+    parser.add_argument('--update_hops', type=int,
+                        default=Node2VecEmbeddingGenerator.UPDATE_HOPS,
+                        help='With --update_from, nodes up to this many edges away '
+                             'from a changed edge start new walks')
+    parser.add_argument('--save_vectors', action='store_true',
+                        help='If set, save embeddings as gensim KeyedVectors to ' +
+                             Node2VecEmbeddingGenerator.KEYED_VECTORS_FILE + ' with each '
+                             'array in a separate .npy file so they can be loaded with '
+                             'mmap=\'r\' for nearest neighbor lookups')
+    parser.add_argument('--save_model', action='store_true',
+                        help='If set, save the whole gensim Word2Vec model, which can '
+                             'continue training, to ' + Node2VecEmbeddingGenerator.SAVED_MODEL_FILE +
+                             ' in the same way. Implies --save_vectors')
+    parser.add_argument('--knn', type=int, default=0,
+                        help='If greater than 0, write this many most similar genes, by '
+                             'cosine similarity of their embeddings, for every gene to ' +
+                             knn.KNN_FILE)
+    parser.add_argument('--output_format', choices=writers.OUTPUT_FORMATS,
+                        default=writers.TSV_FORMAT,
+                        help='Format of embedding file to write in addition to ' +
+                             constants.PPI_EMBEDDING_FILE + '. ' +
+                             writers.NPY_FORMAT + ' writes a float32 matrix that can be '
+                             'memory mapped along with a file of ids, ' +
+                             writers.PARQUET_FORMAT + ' requires pyarrow and ' +
+                             writers.HDF5_FORMAT + ' requires h5py')
+    parser.add_argument('--tsv_float_format',
+                        default=writers.TSVEmbeddingWriter.DEFAULT_FLOAT_FORMAT,
+                        help='printf style format for values written to ' +
+                             constants.PPI_EMBEDDING_FILE + '. The default writes '
+                             'full precision, a format such as %%.6g gives a '
+                             'smaller file that is faster to write')
+    parser.add_argument('--compress_tsv', action='store_true',
+                        help='If set, gzip compress ' + constants.PPI_EMBEDDING_FILE +
+                             ' in parallel using --workers threads, the file '
+                             'will have a .gz suffix')
+    parser.add_argument('--profile', action='store_true',
+                        help='If set, profile the run writing ' + CallProfiler.PSTATS_FILE +
+                             ' with cProfile statistics and ' + CallProfiler.COLLAPSED_FILE +
+                             ' with sampled collapsed stacks for flame graphs to output '
+                             'directory. Only the main process is profiled')
+    parser.add_argument('--register_profile', action='store_true',
+                        help='If set along with --profile, register profile files in '
+                             'the RO-Crate. Profiling then stops before output files '
+                             'are registered')
     parser.add_argument('--fake_embedder', action='store_true',
                         help='If set, generate fake embedding')
+    parser.add_argument('--fake_num_genes', type=int,
+                        help='If set along with --fake_embedder, embed this many '
+                             'synthetic genes instead of genes in ' +
+                             constants.PPI_GENE_NODE_ATTR_FILE + ' so large load tests '
+                             'do not need that file')
     parser.add_argument('--provenance',
                         help='Path to file containing provenance '
                              'information about input files in JSON format. '
@@ -86,6 +235,45 @@ def _parse_arguments(desc, args):
     return parser.parse_args(args)
 
 
+def _get_node2vec_generator(theargs, csr_graph):
+    """
+    Creates Node2Vec embedding generator configured by command line arguments
+
+    :param theargs: arguments parsed by :py:func:`_parse_arguments`
+    :type theargs: :py:class:`argparse.Namespace`
+    :param csr_graph: network to embed
+    :type csr_graph: :py:class:`~cellmaps_ppi_embedding.graph.CSRGraph`
+    :return: generator
+    :rtype: :py:class:`~cellmaps_ppi_embedding.runner.Node2VecEmbeddingGenerator`
+    """
+    checkpoint_dir = None
+    update_dir = None
+    if theargs.update_from is not None:
+        update_dir = os.path.join(theargs.update_from, CellMapsPPIEmbedder.CHECKPOINT_DIR)
+    if theargs.checkpoint is True or theargs.resume is True or update_dir is not None:
+        checkpoint_dir = os.path.join(theargs.outdir, CellMapsPPIEmbedder.CHECKPOINT_DIR)
+    walk_cache = None
+    if theargs.walk_cache_dir is not None:
+        walk_cache = WalkCache(theargs.walk_cache_dir,
+                               max_bytes=theargs.walk_cache_max_size * 1024 ** 2)
+    return Node2VecEmbeddingGenerator(csr_graph=csr_graph,
+                                      dimensions=theargs.dimensions,
+                                      p=theargs.p,
+                                      q=theargs.q,
+                                      walk_length=theargs.walk_length,
+                                      num_walks=theargs.num_walks,
+                                      workers=theargs.workers,
+                                      seed=theargs.seed,
+                                      degree_threshold=theargs.degree_threshold,
+                                      tmpdir=theargs.tmpdir,
+                                      checkpoint_dir=checkpoint_dir,
+                                      resume=theargs.resume,
+                                      walk_cache=walk_cache,
+                                      update_dir=update_dir,
+                                      update_hops=theargs.update_hops,
+                                      split_components=theargs.split_components)
+
+
 def main(args):
     """
     Main entry point for program
@@ -115,18 +303,30 @@ def main(args):
 
     try:
         logutils.setup_cmd_logging(theargs)
+        profiler = PhaseProfiler()
         if theargs.fake_embedder is True:
             gen = FakeEmbeddingGenerator(theargs.inputdir,
-                                         dimensions=theargs.dimensions)
+                                         dimensions=theargs.dimensions,
+                                         seed=theargs.seed,
+                                         num_genes=theargs.fake_num_genes)
         else:
-            gen = Node2VecEmbeddingGenerator(nx_network=nx.read_edgelist(CellMapsPPIEmbedder.get_apms_edgelist_file(theargs.inputdir),
-                                                                         delimiter='\t'),
-                                             dimensions=theargs.dimensions,
-                                             p=theargs.p,
-                                             q=theargs.q,
-                                             walk_length=theargs.walk_length,
-                                             num_walks=theargs.num_walks,
-                                             workers=theargs.workers)
+            with profiler.phase('load'):
+                csr_graph = CSRGraph.from_edgelist_file(CellMapsPPIEmbedder.get_apms_edgelist_file(theargs.inputdir),
+                                                        weight_col=theargs.weight_col)
+            if theargs.embedder == runner.SPECTRAL_EMBEDDER:
+                gen = SpectralEmbeddingGenerator(csr_graph=csr_graph,
+                                                 dimensions=theargs.dimensions,
+                                                 matrix=theargs.spectral_matrix,
+                                                 power_iterations=theargs.spectral_power_iterations,
+                                                 seed=theargs.seed)
+            elif theargs.embedder == runner.FASTRP_EMBEDDER:
+                gen = FastRPEmbeddingGenerator(csr_graph=csr_graph,
+                                               dimensions=theargs.dimensions,
+                                               iteration_weights=theargs.fastrp_iteration_weights,
+                                               normalization_strength=theargs.fastrp_normalization_strength,
+                                               seed=theargs.seed)
+            else:
+                gen = _get_node2vec_generator(theargs, csr_graph)
 
         return CellMapsPPIEmbedder(outdir=theargs.outdir,
                                    embedding_generator=gen,
@@ -136,7 +336,17 @@ def main(args):
                                    project_name=theargs.project_name,
                                    inputdir=theargs.inputdir,
                                    provenance=json_prov,
-                                   input_data_dict=theargs.__dict__).run()
+                                   input_data_dict=theargs.__dict__,
+                                   output_format=theargs.output_format,
+                                   tsv_float_format=theargs.tsv_float_format,
+                                   compress_tsv=theargs.compress_tsv,
+                                   compress_workers=theargs.workers,
+                                   profiler=profiler,
+                                   profile=theargs.profile,
+                                   register_profile=theargs.register_profile,
+                                   save_vectors=theargs.save_vectors,
+                                   save_model=theargs.save_model,
+                                   knn_neighbors=theargs.knn).run()
     except Exception as e:
         logger.exception('Caught exception: ' + str(e))
         return 2
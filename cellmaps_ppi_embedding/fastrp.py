@@ -0,0 +1,120 @@
+#! /usr/bin/env python
+
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def get_transition_matrix(csr_graph):
+    """
+    Builds random walk transition matrix ``D^-1 A`` of **csr_graph**
+    where ``D`` holds the sum of edge weights of each node. Rows
+    of nodes without edges are all zero
+
+    :param csr_graph: network
+    :type csr_graph: :py:class:`~cellmaps_ppi_embedding.graph.CSRGraph`
+    :return: (``float32`` :py:class:`scipy.sparse.csr_matrix`,
+             ``float64`` weighted degree of each node)
+    :rtype: tuple
+    """
+    from scipy.sparse import csr_matrix
+    num_nodes = csr_graph.get_num_nodes()
+    indptr = csr_graph.get_indptr()
+    weights = csr_graph.get_weights().astype(np.float64)
+    rows = np.repeat(np.arange(num_nodes), np.diff(indptr))
+    degrees = np.bincount(rows, weights=weights, minlength=num_nodes)
+    inv_degrees = np.zeros(num_nodes, dtype=np.float64)
+    has_edges = degrees > 0
+    inv_degrees[has_edges] = 1.0 / degrees[has_edges]
+    data = (weights * inv_degrees[rows]).astype(np.float32)
+    return csr_matrix((data, csr_graph.get_indices(), indptr),
+                      shape=(num_nodes, num_nodes)), degrees
+
+
+def get_random_projection(num_rows, dimensions, seed=None, chunk_size=4 * 1024 ** 2):
+    """
+    Draws very sparse random projection matrix of Li, Hastie and
+    Church whose values are ``1`` or ``-1``, each with a chance of
+    ``1 / (2 * sqrt(dimensions))``, and otherwise ``0``. Each row has
+    about ``sqrt(dimensions)`` values that are not ``0``, so the matrix
+    takes far less memory than a dense one while projections keep
+    distances about as well.
+
+    Rather than a draw per value, the gaps between values that are
+    not ``0``, taken in row major order, are drawn from a geometric
+    distribution **chunk_size** at a time
+
+    :param num_rows: number of rows
+    :type num_rows: int
+    :param dimensions: number of columns
+    :type dimensions: int
+    :param seed: seed for random number generator
+    :type seed: int
+    :param chunk_size: Maximum number of gaps drawn at once
+    :type chunk_size: int
+    :return: ``float32`` matrix
+    :rtype: :py:class:`scipy.sparse.csr_matrix`
+    """
+    from scipy.sparse import csr_matrix
+    rng = np.random.default_rng(seed)
+    density = 1.0 / np.sqrt(dimensions)
+    total = num_rows * dimensions
+    positions = []
+    last = -1
+    while last < total:
+        expected = int((total - last) * density * 1.1) + 16
+        chunk = last + np.cumsum(rng.geometric(density, size=min(expected, chunk_size)))
+        positions.append(chunk[chunk < total])
+        last = int(chunk[-1])
+    positions = np.concatenate(positions)
+    values = rng.choice(np.array([-1.0, 1.0], dtype=np.float32), size=len(positions))
+    indptr = np.searchsorted(positions, np.arange(num_rows + 1) * dimensions)
+    return csr_matrix((values, positions % dimensions, indptr), shape=(num_rows, dimensions))
+
+
+def project(transition, projection, iteration_weights, block_bytes=64 * 1024 ** 2):
+    """
+    Computes FastRP embeddings of Chen et al., the weighted sum
+    over iterations ``i`` of ``transition^i projection`` with each
+    row of every iteration scaled to unit length.
+
+    Products are computed a block of rows at a time, each block
+    staying under **block_bytes**, and added to the embeddings
+    right away so apart from the embeddings only the previous and
+    current iteration are held. Time is linear in the number of edges
+
+    :param transition: transition matrix
+    :type transition: :py:class:`scipy.sparse.csr_matrix`
+    :param projection: random projection matrix with a row per node
+    :type projection: :py:class:`scipy.sparse.csr_matrix`
+    :param iteration_weights: weight of each iteration, first is
+                              one step from each node
+    :type iteration_weights: list
+    :param block_bytes: Maximum size in bytes of each block of rows
+    :type block_bytes: int
+    :return: ``float32`` embeddings, one row per node
+    :rtype: :py:class:`numpy.ndarray`
+    """
+    num_rows, dimensions = projection.shape
+    embeddings = np.zeros((num_rows, dimensions), dtype=np.float32)
+    block_rows = max(1, min(num_rows, block_bytes // (4 * dimensions)))
+    previous = None
+    current = np.empty((num_rows, dimensions), dtype=np.float32)
+    for weight in iteration_weights:
+        for start in range(0, num_rows, block_rows):
+            end = min(start + block_rows, num_rows)
+            if previous is None:
+                block = (transition[start:end] @ projection).toarray()
+            else:
+                block = transition[start:end] @ previous
+            current[start:end] = block
+            if weight != 0:
+                norms = np.linalg.norm(block, axis=1, keepdims=True)
+                norms[norms == 0] = 1.0
+                embeddings[start:end] += block * np.float32(weight) / norms
+        if previous is None:
+            previous = np.empty_like(current)
+        previous, current = current, previous
+    return embeddings
@@ -0,0 +1,487 @@
+#! /usr/bin/env python
+
+import logging
+from array import array
+
+import numpy as np
+from cellmaps_utils import constants
+
+from cellmaps_ppi_embedding.exceptions import CellMapsPPIEmbeddingError
+
+logger = logging.getLogger(__name__)
+
+
+class CSRGraph(object):
+    """
+    Compact undirected graph stored in compressed sparse row (CSR)
+    format. Nodes are identified by contiguous integer ids
+    ``0..N-1`` and the node name table maps those ids back to the
+    gene names found in the edge list.
+
+    Every undirected edge ``(u, v)`` appears twice in the
+    adjacency (once in the row of ``u`` and once in the row of ``v``)
+    except self loops which appear once. Neighbors within a row
+    are sorted by node id.
+    """
+
+    def __init__(self, indptr, indices, weights, node_names):
+        """
+        Constructor
+
+        :param indptr: Row offsets into **indices** of length ``N + 1``
+        :type indptr: :py:class:`numpy.ndarray`
+        :param indices: Neighbor node ids
+        :type indices: :py:class:`numpy.ndarray`
+        :param weights: Edge weights, same length as **indices**
+        :type weights: :py:class:`numpy.ndarray`
+        :param node_names: Names of nodes indexed by node id
+        :type node_names: list
+        """
+        self._indptr = indptr
+        self._indices = indices
+        self._weights = weights
+        self._node_names = node_names
+
+    def get_indptr(self):
+        """
+        Gets row offsets array
+
+        :return: row offsets of length ``N + 1``
+        :rtype: :py:class:`numpy.ndarray`
+        """
+        return self._indptr
+
+    def get_indices(self):
+        """
+        Gets neighbor node ids array
+
+        :return: neighbor ids
+        :rtype: :py:class:`numpy.ndarray`
+        """
+        return self._indices
+
+    def get_weights(self):
+        """
+        Gets edge weights array
+
+        :return: edge weights
+        :rtype: :py:class:`numpy.ndarray`
+        """
+        return self._weights
+
+    def get_node_names(self):
+        """
+        Gets node names indexed by node id
+
+        :return: node names
+        :rtype: list
+        """
+        return self._node_names
+
+    def get_num_nodes(self):
+        """
+        Gets number of nodes
+
+        :return: number of nodes
+        :rtype: int
+        """
+        return len(self._node_names)
+
+    def get_num_edges(self):
+        """
+        Gets number of undirected edges, self loops included
+
+        :return: number of edges
+        :rtype: int
+        """
+        num_selfloops = int(np.count_nonzero(self._indices == self._get_row_ids()))
+        return (len(self._indices) - num_selfloops) // 2 + num_selfloops
+
+    def get_degrees(self):
+        """
+        Gets number of neighbors for every node
+
+        :return: degree of each node indexed by node id
+        :rtype: :py:class:`numpy.ndarray`
+        """
+        return np.diff(self._indptr)
+
+    def get_neighbors(self, node_id):
+        """
+        Gets neighbors of node
+
+        :param node_id: id of node
+        :type node_id: int
+        :return: ids of neighboring nodes
+        :rtype: :py:class:`numpy.ndarray`
+        """
+        return self._indices[self._indptr[node_id]:self._indptr[node_id + 1]]
+
+    def _get_row_ids(self):
+        """
+        Gets id of the source node for every entry in
+        the adjacency
+
+        :return: source node id for each entry of **indices**
+        :rtype: :py:class:`numpy.ndarray`
+        """
+        return np.repeat(np.arange(self.get_num_nodes(), dtype=self._indices.dtype),
+                         self.get_degrees())
+
+    def save(self, graph_file):
+        """
+        Saves graph to **graph_file** in NumPy ``.npz`` format
+
+        :param graph_file: path to write, should end with ``.npz``
+        :type graph_file: str
+        """
+        np.savez(graph_file, indptr=self._indptr, indices=self._indices,
+                 weights=self._weights, node_names=np.array(self._node_names, dtype=str))
+
+    @staticmethod
+    def load(graph_file):
+        """
+        Loads graph saved by :py:meth:`save`
+
+        :param graph_file: path to graph
+        :type graph_file: str
+        :return: graph
+        :rtype: :py:class:`CSRGraph`
+        """
+        with np.load(graph_file, allow_pickle=False) as data:
+            return CSRGraph(indptr=data['indptr'], indices=data['indices'],
+                            weights=data['weights'], node_names=data['node_names'].tolist())
+
+    def get_changed_nodes(self, other):
+        """
+        Finds nodes of this graph whose edges differ from those in
+        **other**, matching nodes by name. A node is changed if it is not
+        in **other**, or if an edge of it was added, removed or had its
+        weight changed
+
+        :param other: earlier version of this graph
+        :type other: :py:class:`CSRGraph`
+        :return: ``True`` for each changed node indexed by node id
+        :rtype: :py:class:`numpy.ndarray`
+        """
+        num_nodes = self.get_num_nodes()
+        node_ids = {name: i for i, name in enumerate(self._node_names)}
+        other_to_self = np.array([node_ids.get(name, -1) for name in other.get_node_names()],
+                                 dtype=np.int64)
+
+        keys = self._get_row_ids().astype(np.int64) * num_nodes + self._indices
+        other_src = other_to_self[other._get_row_ids()]
+        other_dst = other_to_self[other.get_indices()]
+        changed = np.zeros(num_nodes, dtype=bool)
+
+        # edges of other to a node that is gone are removed edges
+        present = (other_src >= 0) & (other_dst >= 0)
+        changed[other_src[(other_src >= 0) & (other_dst < 0)]] = True
+
+        other_keys = other_src[present] * num_nodes + other_dst[present]
+        other_weights = other.get_weights()[present]
+        order = np.argsort(other_keys)
+        other_keys = other_keys[order]
+        other_weights = other_weights[order]
+
+        # edges of this graph missing from, or weighted differently in, other
+        pos = np.minimum(np.searchsorted(other_keys, keys), max(len(other_keys) - 1, 0))
+        if len(other_keys) == 0:
+            same = np.zeros(len(keys), dtype=bool)
+        else:
+            same = (other_keys[pos] == keys) & (other_weights[pos] == self._weights)
+        changed[self._get_row_ids()[~same]] = True
+
+        # edges of other missing from this graph
+        keys = np.sort(keys)
+        pos = np.minimum(np.searchsorted(keys, other_keys), max(len(keys) - 1, 0))
+        if len(keys) == 0:
+            removed = np.ones(len(other_keys), dtype=bool)
+        else:
+            removed = keys[pos] != other_keys
+        changed[other_keys[removed] // num_nodes] = True
+
+        # nodes not in other at all, including those without edges
+        in_other = np.zeros(num_nodes, dtype=bool)
+        in_other[other_to_self[other_to_self >= 0]] = True
+        changed[~in_other] = True
+        return changed
+
+    def expand_nodes(self, nodes, hops):
+        """
+        Finds nodes within **hops** edges of **nodes**
+
+        :param nodes: ``True`` for each node to start from indexed by node id
+        :type nodes: :py:class:`numpy.ndarray`
+        :param hops: maximum number of edges away from **nodes**
+        :type hops: int
+        :return: ``True`` for each node within **hops** of **nodes**,
+                 including **nodes**, indexed by node id
+        :rtype: :py:class:`numpy.ndarray`
+        """
+        reached = np.array(nodes, dtype=bool)
+        frontier = reached
+        for _ in range(hops):
+            neighbors = np.zeros(len(reached), dtype=bool)
+            neighbors[self._indices[np.repeat(frontier, self.get_degrees())]] = True
+            frontier = neighbors & ~reached
+            if not np.any(frontier):
+                break
+            reached |= frontier
+        return reached
+
+    def get_components(self):
+        """
+        Finds connected components of this graph
+
+        :return: (component of each node indexed by node id, number of
+                 nodes in each component) with components numbered from
+                 largest to smallest, ties broken by lowest node id
+        :rtype: tuple
+        """
+        from scipy.sparse import csr_matrix
+        from scipy.sparse.csgraph import connected_components
+        num_nodes = self.get_num_nodes()
+        adjacency = csr_matrix((np.ones(len(self._indices), dtype=np.int8),
+                                self._indices, self._indptr), shape=(num_nodes, num_nodes))
+        num_components, labels = connected_components(adjacency, directed=False)
+        # scipy numbers components in order of their lowest node id
+        sizes = np.bincount(labels, minlength=num_components)
+        order = np.argsort(-sizes, kind='stable')
+        rank = np.empty(num_components, dtype=np.int32)
+        rank[order] = np.arange(num_components, dtype=np.int32)
+        return rank[labels], sizes[order]
+
+    def subgraph(self, node_ids):
+        """
+        Gets graph of **node_ids** and the edges between them. Nodes
+        are renumbered in the order given
+
+        :param node_ids: ids of nodes to keep, in ascending order
+                         so neighbors stay sorted
+        :type node_ids: :py:class:`numpy.ndarray`
+        :return: graph
+        :rtype: :py:class:`CSRGraph`
+        """
+        node_ids = np.asarray(node_ids, dtype=np.int64)
+        new_ids = np.full(self.get_num_nodes(), -1, dtype=np.int64)
+        new_ids[node_ids] = np.arange(len(node_ids))
+        degrees = self.get_degrees()[node_ids]
+        # offsets into indices of every neighbor of every kept node
+        row_starts = np.repeat(self._indptr[node_ids] - np.cumsum(degrees) + degrees, degrees)
+        offsets = row_starts + np.arange(int(degrees.sum()), dtype=np.int64)
+        dst = new_ids[self._indices[offsets]]
+        keep = dst >= 0
+        rows = np.repeat(np.arange(len(node_ids)), degrees)[keep]
+        indptr = np.zeros(len(node_ids) + 1, dtype=self._indptr.dtype)
+        np.cumsum(np.bincount(rows, minlength=len(node_ids)), out=indptr[1:])
+        return CSRGraph(indptr=indptr, indices=dst[keep].astype(self._indices.dtype),
+                        weights=self._weights[offsets[keep]],
+                        node_names=[self._node_names[i] for i in node_ids.tolist()])
+
+    def to_networkx(self):
+        """
+        Converts this graph to a :py:class:`networkx.Graph` with
+        edge attribute ``weight``
+
+        :return: graph
+        :rtype: :py:class:`networkx.Graph`
+        """
+        import networkx as nx
+        nx_network = nx.Graph()
+        nx_network.add_nodes_from(self._node_names)
+        rows = self._get_row_ids()
+        mask = rows <= self._indices
+        names = self._node_names
+        nx_network.add_weighted_edges_from(zip([names[x] for x in rows[mask]],
+                                               [names[x] for x in self._indices[mask]],
+                                               self._weights[mask].tolist()))
+        return nx_network
+
+    @staticmethod
+    def from_edges(src, dst, node_names, weights=None):
+        """
+        Builds graph from parallel arrays of edge end points.
+        Duplicate edges (in either direction) are collapsed
+        keeping the weight of the last occurrence.
+
+        :param src: ids of first node of each edge
+        :type src: :py:class:`numpy.ndarray`
+        :param dst: ids of second node of each edge
+        :type dst: :py:class:`numpy.ndarray`
+        :param node_names: Names of nodes indexed by node id
+        :type node_names: list
+        :param weights: Weight of each edge, if ``None`` all
+                        edges get a weight of ``1``
+        :type weights: :py:class:`numpy.ndarray`
+        :return: graph
+        :rtype: :py:class:`CSRGraph`
+        """
+        num_nodes = len(node_names)
+        src = np.asarray(src, dtype=np.int64)
+        dst = np.asarray(dst, dtype=np.int64)
+        if weights is None:
+            weights = np.ones(len(src), dtype=np.float32)
+        else:
+            weights = np.asarray(weights, dtype=np.float32)
+
+        low = np.minimum(src, dst)
+        high = np.maximum(src, dst)
+
+        # keep last occurrence of duplicate edges like networkx does
+        _, rev_idx = np.unique((low * num_nodes + high)[::-1], return_index=True)
+        keep = len(src) - 1 - rev_idx
+        low = low[keep]
+        high = high[keep]
+        weights = weights[keep]
+
+        not_loop = low != high
+        rows = np.concatenate((low, high[not_loop]))
+        cols = np.concatenate((high, low[not_loop]))
+        weights = np.concatenate((weights, weights[not_loop]))
+
+        order = np.lexsort((cols, rows))
+        indptr = np.zeros(num_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=num_nodes), out=indptr[1:])
+        return CSRGraph(indptr=indptr,
+                        indices=cols[order].astype(np.int32),
+                        weights=weights[order],
+                        node_names=list(node_names))
+
+    @staticmethod
+    def from_networkx(nx_network, weight='weight'):
+        """
+        Builds graph from a :py:class:`networkx.Graph`
+
+        :param nx_network: network to convert
+        :type nx_network: :py:class:`networkx.Graph`
+        :param weight: Edge attribute holding the weight, edges
+                       missing it get a weight of ``1``
+        :type weight: str
+        :return: graph
+        :rtype: :py:class:`CSRGraph`
+        """
+        node_names = [str(n) for n in nx_network.nodes()]
+        node_ids = {n: i for i, n in enumerate(nx_network.nodes())}
+        src = array('i')
+        dst = array('i')
+        weights = array('f')
+        for u, v, w in nx_network.edges(data=weight, default=1.0):
+            src.append(node_ids[u])
+            dst.append(node_ids[v])
+            weights.append(w)
+        return CSRGraph.from_edges(np.frombuffer(src, dtype=np.int32),
+                                   np.frombuffer(dst, dtype=np.int32),
+                                   node_names,
+                                   weights=np.frombuffer(weights, dtype=np.float32))
+
+    @staticmethod
+    def _parse_weight(value):
+        """
+        Parses edge weight
+
+        :param value: weight as text
+        :type value: str
+        :raises ValueError: If **value** is not a finite non-negative number
+        :return: weight
+        :rtype: float
+        """
+        weight = float(value)
+        # also rejects nan
+        if not 0.0 <= weight < float('inf'):
+            raise ValueError(value + ' is not a finite non-negative number')
+        return weight
+
+    @staticmethod
+    def from_edgelist_file(edgelist_file, delimiter='\t',
+                           genea_col=constants.PPI_EDGELIST_GENEA_COL,
+                           geneb_col=constants.PPI_EDGELIST_GENEB_COL,
+                           weight_col=None):
+        """
+        Streams tab delimited edge list file into a graph without
+        building an intermediate networkx graph.
+
+        As with :py:func:`networkx.read_edgelist`, anything after a ``#``
+        is a comment and ignored, as are blank lines. Whitespace around
+        each column value is stripped.
+
+        If the first remaining line of the file contains **genea_col**
+        and **geneb_col** it is treated as a header and used to locate
+        those columns, otherwise the first two columns are used.
+
+        If **weight_col** is set, edge weights are read from the header
+        column of that name, such as a confidence score, otherwise all
+        edges get a weight of ``1``.
+
+        :param edgelist_file: Path to edge list file, usually
+                              :py:const:`~cellmaps_utils.constants.PPI_EDGELIST_FILE`
+        :type edgelist_file: str
+        :param delimiter: column delimiter
+        :type delimiter: str
+        :param genea_col: Name of header column with first gene
+        :type genea_col: str
+        :param geneb_col: Name of header column with second gene
+        :type geneb_col: str
+        :param weight_col: Name of header column with edge weight
+        :type weight_col: str
+        :raises CellMapsPPIEmbeddingError: If a line has too few columns,
+                                           **weight_col** is not in the header
+                                           or a weight is not a non-negative number
+        :return: graph
+        :rtype: :py:class:`CSRGraph`
+        """
+        node_ids = {}
+        node_names = []
+        src = array('i')
+        dst = array('i')
+        weights = array('f') if weight_col is not None else None
+        a_idx = 0
+        b_idx = 1
+        w_idx = None
+        check_header = True
+        with open(edgelist_file, 'r') as f:
+            for line_num, line in enumerate(f):
+                line = line.split('#', 1)[0].strip()
+                if len(line) == 0:
+                    continue
+                cols = [col.strip() for col in line.split(delimiter)]
+                if check_header:
+                    check_header = False
+                    if genea_col in cols and geneb_col in cols:
+                        a_idx = cols.index(genea_col)
+                        b_idx = cols.index(geneb_col)
+                        if weight_col in cols:
+                            w_idx = cols.index(weight_col)
+                        continue
+                if weight_col is not None and w_idx is None:
+                    raise CellMapsPPIEmbeddingError('Weight column ' + str(weight_col) +
+                                                    ' not found in header of ' +
+                                                    str(edgelist_file))
+                try:
+                    gene_a = cols[a_idx]
+                    gene_b = cols[b_idx]
+                    if w_idx is not None:
+                        weights.append(CSRGraph._parse_weight(cols[w_idx]))
+                except IndexError:
+                    raise CellMapsPPIEmbeddingError('Line ' + str(line_num + 1) + ' of ' +
+                                                    str(edgelist_file) +
+                                                    ' has too few columns: ' + line)
+                except ValueError:
+                    raise CellMapsPPIEmbeddingError('Line ' + str(line_num + 1) + ' of ' +
+                                                    str(edgelist_file) + ' has invalid ' +
+                                                    str(weight_col) + ' value: ' + cols[w_idx])
+                for gene, ids in ((gene_a, src), (gene_b, dst)):
+                    node_id = node_ids.get(gene)
+                    if node_id is None:
+                        node_id = len(node_names)
+                        node_ids[gene] = node_id
+                        node_names.append(gene)
+                    ids.append(node_id)
+
+        logger.debug('Read ' + str(len(src)) + ' edges and ' +
+                     str(len(node_names)) + ' nodes from ' + str(edgelist_file))
+        if weights is not None:
+            weights = np.frombuffer(weights, dtype=np.float32)
+        return CSRGraph.from_edges(np.frombuffer(src, dtype=np.int32),
+                                   np.frombuffer(dst, dtype=np.int32),
+                                   node_names, weights=weights)
@@ -0,0 +1,206 @@
+#! /usr/bin/env python
+
+import logging
+
+import numpy as np
+
+from cellmaps_ppi_embedding.exceptions import CellMapsPPIEmbeddingError
+from cellmaps_ppi_embedding.writers import TSVEmbeddingWriter
+
+logger = logging.getLogger(__name__)
+
+KNN_FILE = 'ppi_emd_knn.tsv'
+"""
+Name of file, written to output directory, listing most similar genes
+"""
+
+KNN_COLS = ['id', 'neighbor', 'rank', 'similarity']
+"""
+Columns of :py:const:`KNN_FILE`
+"""
+
+
+class CosineKNN(object):
+    """
+    Exact k nearest neighbor search by cosine similarity over
+    embeddings added a block at a time.
+
+    Embeddings are scaled to unit length and kept as one ``float32``
+    matrix so the similarity of a block of query rows to every
+    embedding is a single matrix multiplication. Query blocks are
+    sized so the block of similarities stays under
+    :py:const:`BLOCK_BYTES`, bounding memory regardless of how many
+    embeddings there are.
+
+    Rather than partially sorting whole rows of similarities, which
+    takes longer than computing them, the columns are split into at
+    least :py:const:`MIN_GROUPS` groups and the **k** th largest
+    group maximum of each row is taken as a threshold. At least **k**
+    similarities reach it, and typically not many more, so only those
+    are sorted. Needs no packages other than NumPy
+    """
+    BLOCK_BYTES = 64 * 1024 ** 2
+    MIN_GROUPS = 256
+
+    def __init__(self, block_bytes=BLOCK_BYTES):
+        """
+        Constructor
+
+        :param block_bytes: Maximum size in bytes of each block of similarities
+        :type block_bytes: int
+        """
+        self._block_bytes = block_bytes
+        self._ids = []
+        self._blocks = []
+        self._vectors = None
+
+    @staticmethod
+    def normalize(embeddings):
+        """
+        Scales each row of **embeddings** to unit length, leaving
+        rows that are all zero as is
+
+        :param embeddings: embeddings, one per row
+        :type embeddings: :py:class:`numpy.ndarray`
+        :return: ``float32`` unit length embeddings
+        :rtype: :py:class:`numpy.ndarray`
+        """
+        embeddings = np.array(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        embeddings /= norms
+        return embeddings
+
+    def add_embeddings(self, ids, embeddings):
+        """
+        Adds block of embeddings
+
+        :param ids: id of each embedding
+        :type ids: list
+        :param embeddings: embeddings, one row per id
+        :type embeddings: :py:class:`numpy.ndarray`
+        """
+        self._ids.extend(ids)
+        self._blocks.append(CosineKNN.normalize(embeddings))
+        self._vectors = None
+
+    def get_ids(self):
+        """
+        Gets ids of embeddings added so far
+
+        :return: ids
+        :rtype: list
+        """
+        return self._ids
+
+    def _get_vectors(self):
+        """
+        Gets unit length embeddings added so far as a single matrix
+
+        :return: embeddings, one row per id
+        :rtype: :py:class:`numpy.ndarray`
+        """
+        if self._vectors is None:
+            self._vectors = np.concatenate(self._blocks) if len(self._blocks) > 1 \
+                else self._blocks[0]
+            self._blocks = [self._vectors]
+        return self._vectors
+
+    @staticmethod
+    def _get_top_k(sims, k):
+        """
+        Finds the **k** largest values in each row of **sims**
+
+        :param sims: similarities
+        :type sims: :py:class:`numpy.ndarray`
+        :param k: number of values to find, less than number of columns
+        :type k: int
+        :return: (``int64`` matrix of column indices, matrix of values)
+                 ordered from largest to smallest value, ties broken
+                 by lowest column index
+        :rtype: tuple
+        """
+        num_rows, num_cols = sims.shape
+        num_groups = max(CosineKNN.MIN_GROUPS, 16 * k)
+        if num_cols < 2 * num_groups:
+            top = np.argsort(-sims, axis=1, kind='stable')[:, :k]
+            return top.astype(np.int64), np.take_along_axis(sims, top, axis=1)
+
+        # group j holds columns j, j + num_groups, j + 2 * num_groups...
+        # so maximum is taken across contiguous rows of groups
+        group_size = num_cols // num_groups
+        split = num_groups * group_size
+        group_max = sims[:, :split].reshape(num_rows, group_size, num_groups).max(axis=1)
+        tail = num_cols - split
+        if tail > 0:
+            group_max[:, :tail] = np.maximum(group_max[:, :tail], sims[:, split:])
+        threshold = np.partition(group_max, num_groups - k, axis=1)[:, num_groups - k]
+
+        rows, cols = np.nonzero(sims >= threshold[:, None])
+        vals = sims[rows, cols]
+        # nonzero orders by row then column so ties keep lowest column first
+        order = np.lexsort((-vals, rows))
+        starts = np.searchsorted(rows[order], np.arange(num_rows))
+        selected = order[starts[:, None] + np.arange(k)]
+        return cols[selected].astype(np.int64), vals[selected]
+
+    def get_neighbors(self, k):
+        """
+        Generator that finds the **k** most similar embeddings to each
+        embedding, not counting itself, a block of embeddings at a time
+
+        :param k: number of neighbors, if there are fewer than **k**
+                  other embeddings all of them are neighbors
+        :type k: int
+        :raises CellMapsPPIEmbeddingError: If **k** is less than ``1`` or
+                                           no embeddings were added
+        :return: (index of first embedding in block, ``int64`` matrix of
+                 neighbor indices, ``float32`` matrix of similarities) with
+                 neighbors ordered from most to least similar
+        :rtype: tuple
+        """
+        if k < 1:
+            raise CellMapsPPIEmbeddingError('k must be at least 1')
+        if len(self._ids) == 0:
+            raise CellMapsPPIEmbeddingError('No embeddings added')
+        vectors = self._get_vectors()
+        num_rows = vectors.shape[0]
+        k = min(k, num_rows - 1)
+        if k == 0:
+            return
+        block_rows = max(1, min(num_rows, self._block_bytes // (4 * num_rows)))
+        for start in range(0, num_rows, block_rows):
+            end = min(start + block_rows, num_rows)
+            sims = vectors[start:end] @ vectors.T
+            rows = np.arange(end - start)
+            sims[rows, rows + start] = -np.inf
+            neighbors, neighbor_sims = CosineKNN._get_top_k(sims, k)
+            yield start, neighbors, neighbor_sims
+
+    def write_neighbors(self, knn_file, k, float_format='%.6g'):
+        """
+        Writes **k** most similar embeddings to each embedding to
+        **knn_file** as tab delimited :py:const:`KNN_COLS` with
+        one row per neighbor, ``rank`` ``1`` being most similar
+
+        :param knn_file: path to write
+        :type knn_file: str
+        :param k: number of neighbors
+        :type k: int
+        :param float_format: printf style format for similarities
+        :type float_format: str
+        """
+        ids = [TSVEmbeddingWriter._quote_id(x) for x in self._ids]
+        row_format = '%s\t%s\t%d\t' + float_format + '\n'
+        with open(knn_file, 'w') as f:
+            f.write('\t'.join(KNN_COLS) + '\n')
+            for start, neighbors, sims in self.get_neighbors(k):
+                num_neighbors = neighbors.shape[1]
+                args = np.empty((neighbors.size, 4), dtype=object)
+                args[:, 0] = np.repeat(ids[start:start + neighbors.shape[0]], num_neighbors)
+                args[:, 1] = [ids[x] for x in neighbors.ravel().tolist()]
+                args[:, 2] = np.tile(np.arange(1, num_neighbors + 1), neighbors.shape[0])
+                args[:, 3] = sims.astype(np.float64).ravel()
+                f.write((row_format * neighbors.size) % tuple(args.ravel().tolist()))
+        logger.info('Wrote ' + str(k) + ' nearest neighbors of ' + str(len(ids)) +
+                    ' genes to ' + knn_file)
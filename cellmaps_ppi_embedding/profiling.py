@@ -0,0 +1,370 @@
+#! /usr/bin/env python
+
+import os
+import sys
+import time
+import cProfile
+import logging
+import threading
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+def get_rss_bytes():
+    """
+    Gets current resident set size of this process
+
+    :return: resident set size in bytes or ``None`` if it cannot
+             be determined on this platform
+    :rtype: int
+    """
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _to_mb(num_bytes):
+    """
+    Converts bytes to megabytes rounded to one decimal
+
+    :param num_bytes: bytes
+    :type num_bytes: int
+    :return: megabytes or ``None`` if **num_bytes** is ``None``
+    :rtype: float
+    """
+    if num_bytes is None:
+        return None
+    return round(num_bytes / 1024.0 ** 2, 1)
+
+
+class PhaseProfiler(object):
+    """
+    Records how long each named phase of a run takes and
+    how much memory it used.
+
+    Phases are timed with the :py:meth:`phase` context manager and
+    may be nested. Time spent in a nested phase is only counted
+    towards that phase, so the times of all phases add up to the
+    time spent in them overall. This matters because embeddings
+    are generated lazily while they are being written. Entering
+    a phase more than once adds to its total.
+
+    While any phase is running, a background thread samples the
+    resident set size of the process every
+    :py:const:`SAMPLE_INTERVAL` seconds to find the peak of each
+    phase. If **trace_python_memory** is set, :py:mod:`tracemalloc`
+    also records the peak memory allocated by Python code, which is
+    more precise but slows allocation heavy code down.
+    """
+    SAMPLE_INTERVAL = 0.1
+
+    def __init__(self, sample_memory=True, trace_python_memory=False):
+        """
+        Constructor
+
+        :param sample_memory: If ``True`` sample resident set size
+                              while phases run
+        :type sample_memory: bool
+        :param trace_python_memory: If ``True`` use :py:mod:`tracemalloc`
+                                    to find peak Python memory of each phase
+        :type trace_python_memory: bool
+        """
+        self._phases = {}
+        self._stack = []
+        self._lock = threading.Lock()
+        self._sample_memory = sample_memory
+        self._trace_python_memory = trace_python_memory
+        self._started_tracemalloc = False
+        self._sampler = None
+        self._stop_sampler = None
+
+    def _sample(self):
+        """
+        Updates peak resident set size of running phases
+
+        :return: resident set size in bytes
+        :rtype: int
+        """
+        rss = get_rss_bytes()
+        if rss is not None:
+            with self._lock:
+                for entry in self._stack:
+                    entry['rss_peak'] = max(entry['rss_peak'], rss)
+        return rss
+
+    def _run_sampler(self, stop):
+        """
+        Samples resident set size until **stop** is set
+
+        :param stop: event signalling sampler to stop
+        :type stop: :py:class:`threading.Event`
+        """
+        while not stop.wait(PhaseProfiler.SAMPLE_INTERVAL):
+            self._sample()
+
+    def _start_monitors(self):
+        """
+        Starts memory sampling thread and tracemalloc, called
+        when outermost phase is entered
+        """
+        if self._trace_python_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        if self._sample_memory and get_rss_bytes() is not None:
+            self._stop_sampler = threading.Event()
+            self._sampler = threading.Thread(target=self._run_sampler,
+                                             args=(self._stop_sampler,),
+                                             name='PhaseProfilerSampler',
+                                             daemon=True)
+            self._sampler.start()
+
+    def _stop_monitors(self):
+        """
+        Stops memory sampling thread and tracemalloc, called
+        when outermost phase exits
+        """
+        if self._sampler is not None:
+            self._stop_sampler.set()
+            self._sampler.join()
+            self._sampler = None
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+    def _update_python_peak(self):
+        """
+        Adds peak traced Python memory since the last call to
+        every running phase then resets the peak
+        """
+        if not self._trace_python_memory or not tracemalloc.is_tracing():
+            return
+        peak = tracemalloc.get_traced_memory()[1]
+        for entry in self._stack:
+            entry['python_peak'] = max(entry['python_peak'], peak)
+        tracemalloc.reset_peak()
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Context manager that profiles the code it wraps as phase **name**
+
+        .. code-block:: python
+
+            profiler = PhaseProfiler()
+            with profiler.phase('load'):
+                load_graph()
+
+        :param name: name of phase
+        :type name: str
+        """
+        stats = self._phases.setdefault(name, {'seconds': 0.0, 'calls': 0})
+        if len(self._stack) == 0:
+            self._start_monitors()
+        self._update_python_peak()
+        rss = get_rss_bytes() if self._sample_memory else None
+        entry = {'start': time.perf_counter(), 'nested': 0.0,
+                 'rss_start': rss, 'rss_peak': rss or 0, 'python_peak': 0}
+        with self._lock:
+            self._stack.append(entry)
+        try:
+            yield
+        finally:
+            self._update_python_peak()
+            rss = self._sample() if self._sample_memory else None
+            with self._lock:
+                self._stack.pop()
+            elapsed = time.perf_counter() - entry['start']
+            if len(self._stack) > 0:
+                self._stack[-1]['nested'] += elapsed
+            else:
+                self._stop_monitors()
+            stats['seconds'] += elapsed - entry['nested']
+            stats['calls'] += 1
+            if rss is not None:
+                stats.setdefault('rss_start_mb', _to_mb(entry['rss_start']))
+                stats['rss_end_mb'] = _to_mb(rss)
+                stats['rss_peak_mb'] = max(stats.get('rss_peak_mb', 0.0), _to_mb(entry['rss_peak']))
+            if self._trace_python_memory:
+                stats['python_peak_mb'] = max(stats.get('python_peak_mb', 0.0),
+                                              _to_mb(entry['python_peak']))
+            logger.debug('Phase ' + name + ' took ' + str(round(elapsed, 3)) + ' seconds')
+
+    def get_phases(self):
+        """
+        Gets phases recorded so far in the order they were first entered.
+
+        Each phase has ``seconds`` and ``calls``. If memory was sampled
+        it also has ``rss_start_mb`` when the phase was first entered,
+        ``rss_end_mb`` when it last exited and ``rss_peak_mb``. If Python
+        memory was traced it has ``python_peak_mb``
+
+        :return: phase name to dict of measurements
+        :rtype: dict
+        """
+        return {name: dict(stats) for name, stats in self._phases.items()}
+
+    def get_total_seconds(self):
+        """
+        Gets total time spent in all phases
+
+        :return: seconds
+        :rtype: float
+        """
+        return sum(stats['seconds'] for stats in self._phases.values())
+
+    def get_peak_rss_mb(self):
+        """
+        Gets highest resident set size sampled in any phase
+
+        :return: megabytes or ``None`` if memory was not sampled
+        :rtype: float
+        """
+        peaks = [stats['rss_peak_mb'] for stats in self._phases.values()
+                 if 'rss_peak_mb' in stats]
+        if len(peaks) == 0:
+            return None
+        return max(peaks)
+
+    def get_metrics(self):
+        """
+        Gets measurements flattened into a dict of metric name
+        to value, such as ``training_seconds`` and
+        ``training_rss_peak_mb``, suitable for MLflow
+
+        :return: metrics
+        :rtype: dict
+        """
+        metrics = {}
+        for name, stats in self._phases.items():
+            for key in ('seconds', 'rss_peak_mb', 'python_peak_mb'):
+                if key in stats:
+                    metrics[name + '_' + key] = stats[key]
+        return metrics
+
+
+class CallProfiler(object):
+    """
+    Profiles code run between :py:meth:`start` and :py:meth:`stop`
+    in the calling thread two ways:
+
+    * :py:mod:`cProfile` records every function call, saved in
+      :py:mod:`pstats` format to :py:const:`PSTATS_FILE`
+
+    * A background thread samples the call stack every **interval**
+      seconds, saved as collapsed stacks to :py:const:`COLLAPSED_FILE`
+      with one ``outer;inner;innermost count`` line per distinct stack,
+      the input format of flame graph tools such as ``flamegraph.pl``
+      and speedscope
+
+    Work done in other processes, such as walk workers, is not profiled.
+    """
+    PSTATS_FILE = 'profile.pstats'
+    COLLAPSED_FILE = 'profile_collapsed.txt'
+    INTERVAL = 0.005
+
+    def __init__(self, interval=INTERVAL):
+        """
+        Constructor
+
+        :param interval: seconds between stack samples
+        :type interval: float
+        """
+        self._interval = interval
+        self._profile = None
+        self._stacks = Counter()
+        self._thread_id = None
+        self._sampler = None
+        self._stop_sampler = None
+
+    @staticmethod
+    def _get_frame_name(frame):
+        """
+        Gets name of frame for collapsed stack
+
+        :param frame: stack frame
+        :type frame: frame
+        :return: name such as ``run (runner.py:1101)``
+        :rtype: str
+        """
+        code = frame.f_code
+        return code.co_name + ' (' + os.path.basename(code.co_filename) + ':' + \
+            str(code.co_firstlineno) + ')'
+
+    def _sample(self):
+        """
+        Adds current stack of profiled thread to counts
+        """
+        frame = sys._current_frames().get(self._thread_id)
+        if frame is None:
+            return
+        stack = []
+        while frame is not None:
+            stack.append(CallProfiler._get_frame_name(frame))
+            frame = frame.f_back
+        self._stacks[';'.join(reversed(stack))] += 1
+
+    def _run_sampler(self, stop):
+        """
+        Samples stack until **stop** is set
+
+        :param stop: event signalling sampler to stop
+        :type stop: :py:class:`threading.Event`
+        """
+        while not stop.wait(self._interval):
+            self._sample()
+
+    def is_running(self):
+        """
+        Gets whether profiler is running
+
+        :return: ``True`` if started and not yet stopped
+        :rtype: bool
+        """
+        return self._profile is not None
+
+    def start(self):
+        """
+        Starts profiling calling thread
+        """
+        self._thread_id = threading.get_ident()
+        self._stop_sampler = threading.Event()
+        self._sampler = threading.Thread(target=self._run_sampler,
+                                         args=(self._stop_sampler,),
+                                         name='CallProfilerSampler',
+                                         daemon=True)
+        self._sampler.start()
+        self._profile = cProfile.Profile()
+        self._profile.enable()
+
+    def stop(self, outdir):
+        """
+        Stops profiling and writes :py:const:`PSTATS_FILE` and
+        :py:const:`COLLAPSED_FILE` to **outdir**. Does nothing
+        if profiler is not running
+
+        :param outdir: directory to write files to
+        :type outdir: str
+        :return: paths of files written
+        :rtype: list
+        """
+        if self._profile is None:
+            return []
+        self._profile.disable()
+        self._stop_sampler.set()
+        self._sampler.join()
+
+        pstats_file = os.path.join(outdir, CallProfiler.PSTATS_FILE)
+        self._profile.dump_stats(pstats_file)
+        self._profile = None
+
+        collapsed_file = os.path.join(outdir, CallProfiler.COLLAPSED_FILE)
+        with open(collapsed_file, 'w') as f:
+            for stack, count in sorted(self._stacks.items()):
+                f.write(stack + ' ' + str(count) + '\n')
+        logger.info('Wrote profile to ' + pstats_file + ' and ' + collapsed_file)
+        return [pstats_file, collapsed_file]
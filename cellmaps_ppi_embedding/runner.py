@@ -1,45 +1,168 @@
 #! /usr/bin/env python
 
 import os
+import glob
+import json
+import shutil
+import tempfile
 import numpy as np
 import time
 from datetime import date
 import logging
 import csv
-import networkx as nx
-from node2vec import Node2Vec
+from concurrent.futures import ProcessPoolExecutor
 from cellmaps_utils import constants
 from cellmaps_utils import logutils
 from cellmaps_utils.provenance import ProvenanceUtil
 import warnings
-from gensim.models.callbacks import CallbackAny2Vec
 
 import cellmaps_ppi_embedding
 from cellmaps_ppi_embedding.exceptions import CellMapsPPIEmbeddingError
+from cellmaps_ppi_embedding.graph import CSRGraph
+from cellmaps_ppi_embedding.cache import WalkCache
+from cellmaps_ppi_embedding.profiling import PhaseProfiler
+from cellmaps_ppi_embedding.profiling import CallProfiler
+from cellmaps_ppi_embedding.walks import Node2VecWalker
+from cellmaps_ppi_embedding.walks import WalkCorpus
+from cellmaps_ppi_embedding import writers
+from cellmaps_ppi_embedding import knn
+from cellmaps_ppi_embedding import spectral
+from cellmaps_ppi_embedding import fastrp
 
 logger = logging.getLogger(__name__)
 
-try:
-    import mlflow
-    MLFLOW_LOADED = True
-except ImportError as ie:
-    MLFLOW_LOADED = False
-    logger.debug('Unable to load MLFlow. Utilities '
-                 'relying on MLFlow will not work : ' + str(ie))
+NODE2VEC_EMBEDDER = 'node2vec'
+"""
+Name of :py:class:`Node2VecEmbeddingGenerator` embedder
+"""
+
+SPECTRAL_EMBEDDER = 'spectral'
+"""
+Name of :py:class:`SpectralEmbeddingGenerator` embedder
+"""
+
+FASTRP_EMBEDDER = 'fastrp'
+"""
+Name of :py:class:`FastRPEmbeddingGenerator` embedder
+"""
+
+EMBEDDERS = [NODE2VEC_EMBEDDER, SPECTRAL_EMBEDDER, FASTRP_EMBEDDER]
+"""
+Embedders that can be selected on the command line
+"""
+
+mlflow = None
+"""
+:py:mod:`mlflow` module, imported by :py:func:`_import_mlflow`
+the first time it is needed since importing it takes seconds
+"""
+
+
+def _import_mlflow():
+    """
+    Imports :py:mod:`mlflow` if it has not been imported yet
+
+    :raises CellMapsPPIEmbeddingError: If mlflow is not installed
+    :return: mlflow module
+    :rtype: module
+    """
+    global mlflow
+    if mlflow is None:
+        try:
+            import mlflow as mlflow_module
+        except ImportError as ie:
+            raise CellMapsPPIEmbeddingError('mlflow is required to log to '
+                                            'MLflow : ' + str(ie))
+        mlflow = mlflow_module
+    return mlflow
+
+
+def __getattr__(name):
+    """
+    Gets gensim callbacks, which used to be defined in this module,
+    from :py:mod:`cellmaps_ppi_embedding.callbacks` so gensim is
+    only imported when they are used
+    """
+    if name in ('LossLogger', 'CheckpointSaver'):
+        from cellmaps_ppi_embedding import callbacks
+        return getattr(callbacks, name)
+    raise AttributeError('module ' + __name__ + ' has no attribute ' + name)
+
+
+def _embed_graph_task(csr_graph, params):
+    """
+    Embeds **csr_graph** with a new :py:class:`Node2VecEmbeddingGenerator`,
+    used to embed components other than the largest in another process
+
+    :param csr_graph: network to embed
+    :type csr_graph: :py:class:`~cellmaps_ppi_embedding.graph.CSRGraph`
+    :param params: keyword arguments for :py:class:`Node2VecEmbeddingGenerator`
+    :type params: dict
+    :return: (node names, ``float32`` embeddings one row per name,
+             walk statistics, training loss)
+    :rtype: tuple
+    """
+    gen = Node2VecEmbeddingGenerator(csr_graph=csr_graph, **params)
+    names = []
+    blocks = []
+    for batch_names, embeddings in gen.get_next_embedding_batch():
+        names.extend(batch_names)
+        blocks.append(np.array(embeddings, dtype=np.float32))
+    if len(blocks) == 0:
+        blocks.append(np.zeros((0, gen.get_dimensions()), dtype=np.float32))
+    return names, np.concatenate(blocks), gen.get_walk_stats(), gen.get_training_loss()
 
 
 class EmbeddingGenerator(object):
     """
     Base class for implementations that generate
-    network embeddings
+    network embeddings.
+
+    Subclasses implement :py:meth:`get_next_embedding` and should
+    also override :py:meth:`get_next_embedding_batch` when they can
+    produce whole blocks of embeddings without building a
+    Python list per row
     """
     DIMENSIONS = 1024
+    BATCH_SIZE = 1024
 
     def __init__(self, dimensions=DIMENSIONS):
         """
         Constructor
         """
         self._dimensions = dimensions
+        self._profiler = PhaseProfiler()
+
+    def get_profiler(self):
+        """
+        Gets profiler recording how long each phase of
+        embedding generation takes
+
+        :return: profiler
+        :rtype: :py:class:`~cellmaps_ppi_embedding.profiling.PhaseProfiler`
+        """
+        return self._profiler
+
+    def set_profiler(self, profiler):
+        """
+        Sets profiler recording how long each phase of
+        embedding generation takes
+
+        :param profiler: profiler
+        :type profiler: :py:class:`~cellmaps_ppi_embedding.profiling.PhaseProfiler`
+        """
+        self._profiler = profiler
+
+    def log_profile(self, profiler):
+        """
+        Called once a run finishes with the profiler holding time and
+        memory used by each phase. Does nothing by default, subclasses
+        can override to report these measurements elsewhere
+
+        :param profiler: profiler
+        :type profiler: :py:class:`~cellmaps_ppi_embedding.profiling.PhaseProfiler`
+        """
+        pass
 
     def get_dimensions(self):
         """
@@ -61,35 +184,70 @@ class EmbeddingGenerator(object):
         """
         raise NotImplementedError('Subclasses should implement')
 
+    def get_next_embedding_batch(self, batch_size=BATCH_SIZE):
+        """
+        Generator method for getting the next block of
+        embeddings. This implementation groups rows from
+        :py:meth:`get_next_embedding`
+
+        :param batch_size: Maximum number of embeddings in each block
+        :type batch_size: int
+        :return: (ids, embeddings as ``float32`` matrix with one row per id)
+        :rtype: tuple
+        """
+        return EmbeddingGenerator.get_batches_from_rows(self.get_next_embedding(),
+                                                        batch_size=batch_size)
 
-class LossLogger(CallbackAny2Vec):
-    def __init__(self):
-        self.epoch = 0
-        self.cumulative_loss = 0.0
-        self.epoch_losses = []
-    
-    def on_epoch_end(self, model):
-        latest_cumulative = model.get_latest_training_loss()
-        if self.epoch == 0:
-            epoch_loss = latest_cumulative
-        else:
-            epoch_loss = latest_cumulative - self.cumulative_loss
-        self.epoch_losses.append(epoch_loss)
-        self.cumulative_loss = latest_cumulative
-        mlflow.log_metrics(
-            metrics={
-                "total_loss": latest_cumulative,
-                "epoch_loss": epoch_loss
-            },
-            step=self.epoch
-        )
-        print(f"Epoch {self.epoch} | Loss: {epoch_loss}")
-        self.epoch += 1
+    @staticmethod
+    def get_batches_from_rows(rows, batch_size=BATCH_SIZE):
+        """
+        Generator that groups embedding rows, as returned by
+        :py:meth:`get_next_embedding`, into blocks
+
+        :param rows: rows with id followed by embedding values
+        :type rows: iterable
+        :param batch_size: Maximum number of embeddings in each block
+        :type batch_size: int
+        :return: (ids, embeddings as ``float32`` matrix with one row per id)
+        :rtype: tuple
+        """
+        ids = []
+        values = []
+        for row in rows:
+            ids.append(row[0])
+            values.append(row[1:])
+            if len(ids) >= batch_size:
+                yield ids, np.asarray(values, dtype=np.float32)
+                ids = []
+                values = []
+        if len(ids) > 0:
+            yield ids, np.asarray(values, dtype=np.float32)
+
+    @staticmethod
+    def get_rows_from_batches(batches):
+        """
+        Generator that splits blocks of embeddings, as returned by
+        :py:meth:`get_next_embedding_batch`, into rows
+
+        :param batches: (ids, embeddings) tuples
+        :type batches: iterable
+        :return: id followed by embedding values
+        :rtype: list
+        """
+        for ids, embeddings in batches:
+            for node_id, embedding in zip(ids, embeddings.tolist()):
+                row = [node_id]
+                row.extend(embedding)
+                yield row
 
 
 class Node2VecEmbeddingGenerator(EmbeddingGenerator):
     """
+    Generates embeddings with node2vec from either a
+    :py:class:`networkx.Graph` or a :py:class:`~cellmaps_ppi_embedding.graph.CSRGraph`.
 
+    Walks are generated by :py:class:`~cellmaps_ppi_embedding.walks.Node2VecWalker`
+    and then used to train a :py:class:`gensim.models.Word2Vec` skip-gram model
     """
     P_DEFAULT = 2
     Q_DEFAULT = 1
@@ -101,15 +259,85 @@ class Node2VecEmbeddingGenerator(EmbeddingGenerator):
     MIN_COUNT = 0
     SG = 1
     EPOCHS = 1
-
-    def __init__(self, nx_network, p=P_DEFAULT, q=Q_DEFAULT, dimensions=EmbeddingGenerator.DIMENSIONS,
+    DEGREE_THRESHOLD = Node2VecWalker.DEGREE_THRESHOLD
+    WALKS_FILE = 'walks.npy'
+    WALKS_STATE_FILE = 'walks.json'
+    MODEL_FILE = 'model.gensim'
+    MODEL_STATE_FILE = 'model.json'
+    GRAPH_FILE = 'graph.npz'
+    UPDATE_HOPS = 1
+    KEYED_VECTORS_FILE = 'ppi_emd.kv'
+    SAVED_MODEL_FILE = 'ppi_model.gensim'
+
+    def __init__(self, nx_network=None, p=P_DEFAULT, q=Q_DEFAULT, dimensions=EmbeddingGenerator.DIMENSIONS,
                  walk_length=WALK_LENGTH, num_walks=NUM_WALKS, workers=WORKERS, seed=SEED,
-                 window=WINDOW, min_count=MIN_COUNT, sg=SG, epochs=EPOCHS, log_fairops=False):
+                 window=WINDOW, min_count=MIN_COUNT, sg=SG, epochs=EPOCHS, log_fairops=False,
+                 csr_graph=None, tmpdir=None, checkpoint_dir=None, resume=False,
+                 walk_cache=None, compute_loss=False, degree_threshold=DEGREE_THRESHOLD,
+                 update_dir=None, update_hops=UPDATE_HOPS, split_components=False):
         """
         Constructor
+
+        :param nx_network: Network to embed. Ignored if **csr_graph** is set
+        :type nx_network: :py:class:`networkx.Graph`
+        :param csr_graph: Network to embed, typically loaded via
+                          :py:meth:`~cellmaps_ppi_embedding.graph.CSRGraph.from_edgelist_file`
+        :type csr_graph: :py:class:`~cellmaps_ppi_embedding.graph.CSRGraph`
+        :param tmpdir: Directory where a temporary directory holding the
+                       generated walks is created. If ``None`` the system
+                       default temporary directory is used
+        :type tmpdir: str
+        :param checkpoint_dir: If set, walks are kept in this directory
+                               instead of **tmpdir** and the model is saved
+                               here after every epoch
+        :type checkpoint_dir: str
+        :param resume: If ``True`` reuse walks and continue training
+                       from the model found in **checkpoint_dir**
+        :type resume: bool
+        :param walk_cache: If set, and **seed** is set, walks are reused
+                           from this cache when the same network was walked
+                           with the same parameters before
+        :type walk_cache: :py:class:`~cellmaps_ppi_embedding.cache.WalkCache`
+        :param compute_loss: If ``True`` have Word2Vec compute training loss which
+                             is then available via :py:meth:`get_training_loss`.
+                             Always done if **log_fairops** is ``True``
+        :type compute_loss: bool
+        :param degree_threshold: Nodes with at most this many neighbors take exact
+                                 walk steps from precomputed tables while nodes with
+                                 more, such as hubs, use rejection sampling. ``0``
+                                 uses rejection sampling for all nodes. See
+                                 :py:class:`~cellmaps_ppi_embedding.walks.Node2VecWalker`
+        :type degree_threshold: int
+        :param update_dir: If set, checkpoint directory of an earlier run, holding
+                           :py:const:`MODEL_FILE` and :py:const:`GRAPH_FILE`, whose
+                           embeddings are updated instead of training from scratch. A new
+                           model is built for the current network starting from the
+                           vectors of that model, copied over by node name, and trained
+                           only on walks from nodes within **update_hops** of edges that
+                           changed since that run. New nodes start from random vectors
+        :type update_dir: str
+        :param update_hops: Number of edges away from a changed edge a node can be
+                            and still start new walks when **update_dir** is set
+        :type update_hops: int
+        :param split_components: If ``True`` embed the largest connected component
+                                 and all other components with separate walks and
+                                 models. When there is more than one worker the other
+                                 components are embedded in another process with one
+                                 worker while the largest component gets the rest.
+                                 See :py:meth:`get_component_stats`
+        :type split_components: bool
+        :raises CellMapsPPIEmbeddingError: If **update_dir** and **resume** are both set
+                                           or **split_components** is set along with
+                                           **checkpoint_dir**, **resume** or **update_dir**
         """
+        if update_dir is not None and resume:
+            raise CellMapsPPIEmbeddingError('update_dir cannot be used with resume')
+        if split_components and (checkpoint_dir is not None or resume or update_dir is not None):
+            raise CellMapsPPIEmbeddingError('split_components cannot be used with '
+                                            'checkpoint_dir, resume or update_dir')
         super().__init__(dimensions=dimensions)
         self._nx_network = nx_network
+        self._csr_graph = csr_graph
         self._p = p
         self._q = q
         self._walk_length = walk_length
@@ -121,9 +349,25 @@ class Node2VecEmbeddingGenerator(EmbeddingGenerator):
         self._sg = sg
         self._epochs = epochs
         self._log_fairops = log_fairops
+        self._tmpdir = tmpdir
+        self._checkpoint_dir = checkpoint_dir
+        self._resume = resume
+        self._walk_cache = walk_cache
+        self._compute_loss = compute_loss
+        self._degree_threshold = degree_threshold
+        self._update_dir = update_dir
+        self._update_hops = update_hops
+        self._split_components = split_components
+        self._updated_nodes = None
+        self._model = None
+        self._model_graph = None
+        self._component_stats = None
+        self._other_embeddings = None
+        self._training_loss = None
+        self._walk_stats = None
 
         if self._log_fairops:
-            mlflow.log_params(
+            _import_mlflow().log_params(
                 {
                     "dimensions": dimensions,
                     "p": p,
@@ -145,6 +389,7 @@ class Node2VecEmbeddingGenerator(EmbeddingGenerator):
         header of the edge list file
 
         """
+        import networkx as nx
         # remove geneA geneB edge cause it is the header of file
         try:
             self._nx_network.remove_edge('geneA', 'geneB')
@@ -153,56 +398,977 @@ class Node2VecEmbeddingGenerator(EmbeddingGenerator):
 
         self._nx_network.remove_nodes_from(['geneA', 'geneB'])
 
-    def get_next_embedding(self):
+    def _get_csr_graph(self):
         """
+        Gets network to embed as a CSR graph, converting
+        the networkx network passed in if needed
 
-        :return:
+        :raises CellMapsPPIEmbeddingError: If no network was set
+        :return: network
+        :rtype: :py:class:`~cellmaps_ppi_embedding.graph.CSRGraph`
+        """
+        if self._csr_graph is None:
+            if self._nx_network is None:
+                raise CellMapsPPIEmbeddingError('network is None')
+            with self._profiler.phase('load'):
+                self._remove_header_edge_from_network()
+                self._csr_graph = CSRGraph.from_networkx(self._nx_network)
+        return self._csr_graph
+
+    def _get_walk_state(self, csr_graph):
+        """
+        Gets parameters that determine the walks over **csr_graph**
+
+        :param csr_graph: network to walk
+        :type csr_graph: :py:class:`~cellmaps_ppi_embedding.graph.CSRGraph`
+        :return: walk parameters
+        :rtype: dict
+        """
+        return {'p': self._p,
+                'q': self._q,
+                'walk_length': self._walk_length,
+                'num_walks': self._num_walks,
+                'seed': self._seed,
+                'degree_threshold': self._degree_threshold,
+                'num_nodes': csr_graph.get_num_nodes(),
+                'num_edges': csr_graph.get_num_edges()}
+
+    def _get_model_state(self, walk_state):
+        """
+        Gets parameters that determine the Word2Vec model
+
+        :param walk_state: parameters of walks model is trained on
+        :type walk_state: dict
+        :return: model parameters
+        :rtype: dict
+        """
+        return {'walks': walk_state,
+                'vocabulary': 'node_ids',
+                'dimensions': self._dimensions,
+                'window': self._window,
+                'min_count': self._min_count,
+                'sg': self._sg,
+                'epochs': self._epochs}
+
+    @staticmethod
+    def _load_state(state_file, expected_state):
+        """
+        Loads JSON state written with a checkpoint
+
+        :param state_file: path to JSON file
+        :type state_file: str
+        :param expected_state: parameters that must match those in **state_file**
+        :type expected_state: dict
+        :return: state or ``None`` if file is missing or does not
+                 match **expected_state**
+        :rtype: dict
+        """
+        if not os.path.isfile(state_file):
+            return None
+        with open(state_file, 'r') as f:
+            state = json.load(f)
+        for key, val in expected_state.items():
+            if state.get(key) != val:
+                logger.warning('Ignoring checkpoint ' + state_file + ' cause ' + key +
+                               ' is ' + str(state.get(key)) + ' instead of ' + str(val))
+                return None
+        return state
+
+    def _get_walker(self, csr_graph):
+        """
+        Creates walker over **csr_graph** and records its statistics
+
+        :param csr_graph: network to walk
+        :type csr_graph: :py:class:`~cellmaps_ppi_embedding.graph.CSRGraph`
+        :return: walker
+        :rtype: :py:class:`~cellmaps_ppi_embedding.walks.Node2VecWalker`
+        """
+        walker = Node2VecWalker(csr_graph, p=self._p, q=self._q,
+                                walk_length=self._walk_length,
+                                degree_threshold=self._degree_threshold)
+        self._walk_stats = walker.get_stats()
+        logger.info(str(self._walk_stats['exact_nodes']) + ' nodes with at most ' +
+                    str(self._degree_threshold) + ' neighbors take exact steps and ' +
+                    str(self._walk_stats['rejection_nodes']) + ' nodes, with up to ' +
+                    str(self._walk_stats['max_degree']) + ' neighbors, use '
+                    'rejection sampling')
+        return walker
+
+    def _get_walks(self, csr_graph, walk_dir):
+        """
+        Generates random walks over **csr_graph** and spools
+        them to a file in **walk_dir**. If resuming from a
+        checkpoint, walks already in **walk_dir** are reused.
+        If a walk cache was set and ``seed`` is set, walks are
+        taken from or added to the cache
+
+        :param csr_graph: network to walk
+        :type csr_graph: :py:class:`~cellmaps_ppi_embedding.graph.CSRGraph`
+        :param walk_dir: directory to write walks to
+        :type walk_dir: str
+        :return: walks
+        :rtype: :py:class:`~cellmaps_ppi_embedding.walks.WalkCorpus`
+        """
+        walk_file = os.path.join(walk_dir, Node2VecEmbeddingGenerator.WALKS_FILE)
+        walk_state = self._get_walk_state(csr_graph)
+        state_file = os.path.join(walk_dir, Node2VecEmbeddingGenerator.WALKS_STATE_FILE)
+        if self._resume and os.path.isfile(walk_file) and \
+                Node2VecEmbeddingGenerator._load_state(state_file, walk_state) is not None:
+            logger.info('Reusing walks in ' + walk_file)
+            return WalkCorpus(walk_file)
+
+        cache_key = None
+        if self._walk_cache is not None:
+            if self._seed is None:
+                logger.info('Not using walk cache cause seed is not set')
+            else:
+                cache_params = dict(walk_state)
+                cache_params['batch_size'] = Node2VecWalker.BATCH_SIZE
+                cache_key = WalkCache.get_key(csr_graph, cache_params)
+
+        if cache_key is None or not self._walk_cache.get(cache_key, walk_file):
+            if os.path.exists(walk_file):
+                # file may be hard linked to a cache entry so
+                # remove it rather than overwrite it in place
+                os.remove(walk_file)
+            with self._profiler.phase('walk_preprocessing'):
+                walker = self._get_walker(csr_graph)
+            with self._profiler.phase('walks'):
+                WalkCorpus.write_walks(walk_file,
+                                       walker.generate_walks(self._num_walks, seed=self._seed,
+                                                             workers=self._workers),
+                                       num_walks=self._num_walks * csr_graph.get_num_nodes(),
+                                       walk_length=self._walk_length)
+            if cache_key is not None:
+                self._walk_cache.put(cache_key, walk_file)
+
+        if self._checkpoint_dir is not None:
+            # state is written last so it only exists for complete walks
+            with open(state_file, 'w') as f:
+                json.dump(walk_state, f, indent=2)
+        return WalkCorpus(walk_file)
+
+    def _build_model(self, counts, corpus_count, compute_loss):
+        """
+        Creates Word2Vec model whose vocabulary is the ids of nodes
+        with a count above ``0``
+
+        :param counts: number of times each node appears in walks indexed by node id
+        :type counts: :py:class:`numpy.ndarray`
+        :param corpus_count: number of walks
+        :type corpus_count: int
+        :param compute_loss: If ``True`` compute training loss
+        :type compute_loss: bool
+        :return: model ready to train
+        :rtype: :py:class:`gensim.models.Word2Vec`
+        """
+        from gensim.models import Word2Vec
+        w2v_params = {}
+        if self._seed is not None:
+            w2v_params['seed'] = self._seed
+        model = Word2Vec(vector_size=self._dimensions,
+                         window=self._window, min_count=self._min_count,
+                         sg=self._sg, epochs=self._epochs, workers=self._workers,
+                         compute_loss=compute_loss, **w2v_params)
+        # counts are known from the walks so corpus need not be scanned
+        node_ids = np.flatnonzero(counts)
+        model.build_vocab_from_freq(dict(zip(node_ids.tolist(), counts[node_ids].tolist())),
+                                    corpus_count=corpus_count)
+        return model
+
+    def _fit_model(self, corpus, model_state, compute_loss, callbacks):
+        """
+        Trains Word2Vec model on **corpus**, continuing from
+        the checkpointed model if resuming. The vocabulary of the
+        model is node ids
+
+        :param corpus: walks
+        :type corpus: :py:class:`~cellmaps_ppi_embedding.walks.WalkCorpus`
+        :param model_state: parameters of model
+        :type model_state: dict
+        :param compute_loss: If ``True`` compute training loss
+        :type compute_loss: bool
+        :param callbacks: callbacks passed to Word2Vec
+        :type callbacks: list
+        :return: trained model
+        :rtype: :py:class:`gensim.models.Word2Vec`
+        """
+        from gensim.models import Word2Vec
+        from cellmaps_ppi_embedding.callbacks import CheckpointSaver
+        model = None
+        epochs_completed = 0
+        if self._checkpoint_dir is not None:
+            model_file = os.path.join(self._checkpoint_dir, Node2VecEmbeddingGenerator.MODEL_FILE)
+            state_file = os.path.join(self._checkpoint_dir, Node2VecEmbeddingGenerator.MODEL_STATE_FILE)
+            if self._resume and os.path.isfile(model_file):
+                state = Node2VecEmbeddingGenerator._load_state(state_file, model_state)
+                if state is not None:
+                    logger.info('Resuming training from ' + model_file + ' after epoch ' +
+                                str(state['epochs_completed']))
+                    model = Word2Vec.load(model_file)
+                    epochs_completed = state['epochs_completed']
+                    model_state = state
+
+        if model is None:
+            model = self._build_model(corpus.get_counts(self._get_csr_graph().get_num_nodes()),
+                                      len(corpus), compute_loss)
+            model_state = dict(model_state)
+            model_state['alpha'] = model.alpha
+            model_state['min_alpha'] = model.min_alpha
+
+        if self._checkpoint_dir is not None:
+            callbacks = callbacks + [CheckpointSaver(model_file, state_file, model_state,
+                                                     epochs_completed=epochs_completed)]
+
+        remaining_epochs = self._epochs - epochs_completed
+        if remaining_epochs <= 0:
+            return model
+
+        # continue linear learning rate decay where it left off
+        alpha = model_state['alpha']
+        min_alpha = model_state['min_alpha']
+        start_alpha = alpha - (alpha - min_alpha) * epochs_completed / self._epochs
+        model.train(corpus, total_examples=model.corpus_count,
+                    epochs=remaining_epochs, start_alpha=start_alpha,
+                    end_alpha=min_alpha, compute_loss=compute_loss,
+                    callbacks=callbacks)
+        if compute_loss:
+            self._training_loss = model.get_latest_training_loss()
+        return model
+
+    def _get_update_walks(self, csr_graph, old_graph, walk_dir):
+        """
+        Generates walks over **csr_graph** starting only from nodes within
+        ``update_hops`` of an edge that differs from **old_graph** and
+        records the nodes visited by those walks as updated
+
+        :param csr_graph: network to walk
+        :type csr_graph: :py:class:`~cellmaps_ppi_embedding.graph.CSRGraph`
+        :param old_graph: network the model was trained on
+        :type old_graph: :py:class:`~cellmaps_ppi_embedding.graph.CSRGraph`
+        :param walk_dir: directory to write walks to
+        :type walk_dir: str
+        :return: walks or ``None`` if no edges changed
+        :rtype: :py:class:`~cellmaps_ppi_embedding.walks.WalkCorpus`
         """
-        if self._nx_network is None:
-            raise CellMapsPPIEmbeddingError('network is None')
+        with self._profiler.phase('walk_preprocessing'):
+            changed = csr_graph.get_changed_nodes(old_graph)
+            start_nodes = np.flatnonzero(csr_graph.expand_nodes(changed, self._update_hops))
+            logger.info(str(int(changed.sum())) + ' nodes have changed edges, starting walks from ' +
+                        str(len(start_nodes)) + ' nodes within ' + str(self._update_hops) + ' hops')
+            if len(start_nodes) == 0:
+                self._updated_nodes = []
+                return None
+            walker = self._get_walker(csr_graph)
+
+        walk_file = os.path.join(walk_dir, Node2VecEmbeddingGenerator.WALKS_FILE)
+        if os.path.exists(walk_file):
+            os.remove(walk_file)
+        with self._profiler.phase('walks'):
+            WalkCorpus.write_walks(walk_file,
+                                   walker.generate_walks(self._num_walks, seed=self._seed,
+                                                         nodes=start_nodes.astype(np.int32),
+                                                         workers=self._workers),
+                                   num_walks=self._num_walks * len(start_nodes),
+                                   walk_length=self._walk_length)
+        corpus = WalkCorpus(walk_file)
+        node_names = csr_graph.get_node_names()
+        self._updated_nodes = [node_names[i] for i in
+                               np.flatnonzero(corpus.get_counts(csr_graph.get_num_nodes()))]
+        return corpus
+
+    def _update_model(self, csr_graph, walk_dir, compute_loss, callbacks):
+        """
+        Loads model and network of an earlier run from ``update_dir`` and
+        trains a model on walks from nodes near changed edges only.
+
+        The vocabulary of the earlier model is node ids of the earlier
+        network so rather than updating that model in place, a new model
+        is built whose vocabulary is node ids of **csr_graph**. Counts,
+        vectors and output weights of nodes in both networks are copied
+        over by name before training, so nodes the new walks do not visit
+        keep their earlier vectors. New nodes start from random vectors
+        and nodes no longer in the network are dropped
+
+        :param csr_graph: network to embed
+        :type csr_graph: :py:class:`~cellmaps_ppi_embedding.graph.CSRGraph`
+        :param walk_dir: directory to write walks to
+        :type walk_dir: str
+        :param compute_loss: If ``True`` compute training loss
+        :type compute_loss: bool
+        :param callbacks: callbacks passed to Word2Vec
+        :type callbacks: list
+        :raises CellMapsPPIEmbeddingError: If model or network of earlier run is
+                                           missing or model has different dimensions
+        :return: updated model
+        :rtype: :py:class:`gensim.models.Word2Vec`
+        """
+        from gensim.models import Word2Vec
+        model_file = os.path.join(self._update_dir, Node2VecEmbeddingGenerator.MODEL_FILE)
+        graph_file = os.path.join(self._update_dir, Node2VecEmbeddingGenerator.GRAPH_FILE)
+        for needed_file in (model_file, graph_file):
+            if not os.path.isfile(needed_file):
+                raise CellMapsPPIEmbeddingError(needed_file + ' not found, the run being '
+                                                              'updated must be run with checkpointing')
+        with self._profiler.phase('load'):
+            old_graph = CSRGraph.load(graph_file)
+            old_model = Word2Vec.load(model_file)
+        if old_model.vector_size != self._dimensions:
+            raise CellMapsPPIEmbeddingError('Model in ' + model_file + ' has ' +
+                                            str(old_model.vector_size) + ' dimensions instead of ' +
+                                            str(self._dimensions))
+
+        corpus = self._get_update_walks(csr_graph, old_graph, walk_dir)
+
+        with self._profiler.phase('training'):
+            node_ids = {name: i for i, name in enumerate(csr_graph.get_node_names())}
+            old_names = old_graph.get_node_names()
+            old_keys = [key for key in old_model.wv.index_to_key if old_names[key] in node_ids]
+            new_keys = [node_ids[old_names[key]] for key in old_keys]
+            counts = np.zeros(csr_graph.get_num_nodes(), dtype=np.int64)
+            counts[new_keys] = [old_model.wv.get_vecattr(key, 'count') for key in old_keys]
+            if corpus is not None:
+                counts += corpus.get_counts(csr_graph.get_num_nodes())
+            model = self._build_model(counts, len(corpus) if corpus is not None else 0,
+                                      compute_loss)
+            new_index = [model.wv.key_to_index[key] for key in new_keys]
+            old_index = [old_model.wv.key_to_index[key] for key in old_keys]
+            model.wv.vectors[new_index] = old_model.wv.vectors[old_index]
+            if model.negative:
+                model.syn1neg[new_index] = old_model.syn1neg[old_index]
+            del old_model
+
+            if corpus is None:
+                logger.info('No edges changed, keeping embeddings as is')
+            else:
+                model.train(corpus, total_examples=len(corpus), epochs=self._epochs,
+                            compute_loss=compute_loss, callbacks=callbacks)
+                if compute_loss:
+                    self._training_loss = model.get_latest_training_loss()
+        if self._checkpoint_dir is not None:
+            model_file = os.path.join(self._checkpoint_dir, Node2VecEmbeddingGenerator.MODEL_FILE)
+            tmp_file = model_file + '.tmp'
+            model.save(tmp_file)
+            os.replace(tmp_file, model_file)
+        return model
+
+    def _get_component_params(self, workers):
+        """
+        Gets keyword arguments to create a generator, with the
+        same parameters as this one, for a subset of components
+
+        :param workers: number of workers
+        :type workers: int
+        :return: parameters
+        :rtype: dict
+        """
+        return {'p': self._p, 'q': self._q, 'dimensions': self._dimensions,
+                'walk_length': self._walk_length, 'num_walks': self._num_walks,
+                'workers': workers, 'seed': self._seed, 'window': self._window,
+                'min_count': self._min_count, 'sg': self._sg, 'epochs': self._epochs,
+                'tmpdir': self._tmpdir, 'walk_cache': self._walk_cache,
+                'compute_loss': self._compute_loss or self._log_fairops,
+                'degree_threshold': self._degree_threshold}
+
+    @staticmethod
+    def _merge_walk_stats(walk_stats, other_walk_stats):
+        """
+        Combines walk statistics of two walkers
+
+        :param walk_stats: statistics as returned by
+                           :py:meth:`~cellmaps_ppi_embedding.walks.Node2VecWalker.get_stats`
+        :type walk_stats: dict
+        :param other_walk_stats: statistics of other walker
+        :type other_walk_stats: dict
+        :return: statistics with counts summed and largest ``max_degree``
+                 or whichever is not ``None``
+        :rtype: dict
+        """
+        if walk_stats is None or other_walk_stats is None:
+            return walk_stats if other_walk_stats is None else other_walk_stats
+        merged = dict(walk_stats)
+        for key, val in other_walk_stats.items():
+            if key == 'max_degree':
+                merged[key] = max(merged.get(key, 0), val)
+            elif key != 'degree_threshold':
+                merged[key] = merged.get(key, 0) + val
+        return merged
+
+    def _train_components(self, csr_graph):
+        """
+        Embeds the largest connected component of **csr_graph** and the
+        other components separately, each with their own walks and model.
+        Components other than the largest are embedded in another process,
+        with one worker, while the largest is embedded here with the rest.
+        With a single worker they are embedded one after the other
+
+        :param csr_graph: network to embed
+        :type csr_graph: :py:class:`~cellmaps_ppi_embedding.graph.CSRGraph`
+        :return: model of the largest component, whose vocabulary is node
+                 ids of :py:attr:`_model_graph`
+        :rtype: :py:class:`gensim.models.Word2Vec`
+        """
+        with self._profiler.phase('walk_preprocessing'):
+            labels, sizes = csr_graph.get_components()
+            largest_graph = csr_graph
+            other_graph = None
+            if len(sizes) > 1:
+                largest_graph = csr_graph.subgraph(np.flatnonzero(labels == 0))
+                other_graph = csr_graph.subgraph(np.flatnonzero(labels != 0))
+            size_counts = np.bincount(sizes)
+            self._component_stats = {'num_components': len(sizes),
+                                     'largest_component_nodes': largest_graph.get_num_nodes(),
+                                     'largest_component_edges': largest_graph.get_num_edges(),
+                                     'other_components_nodes': csr_graph.get_num_nodes() -
+                                                               largest_graph.get_num_nodes(),
+                                     'other_components_edges': csr_graph.get_num_edges() -
+                                                               largest_graph.get_num_edges(),
+                                     'component_sizes': {str(size): int(size_counts[size])
+                                                         for size in np.flatnonzero(size_counts)}}
+        logger.info('Network has ' + str(len(sizes)) + ' connected components, the largest has ' +
+                    str(largest_graph.get_num_nodes()) + ' of ' + str(csr_graph.get_num_nodes()) +
+                    ' nodes')
+
+        largest_workers = self._workers
+        pool = None
+        future = None
+        try:
+            if other_graph is not None and self._workers > 1:
+                largest_workers = self._workers - 1
+                pool = ProcessPoolExecutor(max_workers=1)
+                future = pool.submit(_embed_graph_task, other_graph,
+                                     self._get_component_params(1))
+
+            largest_gen = Node2VecEmbeddingGenerator(csr_graph=largest_graph,
+                                                     **self._get_component_params(largest_workers))
+            largest_gen.set_profiler(self._profiler)
+            model = largest_gen._train_model()
+            self._walk_stats = largest_gen.get_walk_stats()
+            self._training_loss = largest_gen.get_training_loss()
+
+            if other_graph is not None:
+                with self._profiler.phase('other_components'):
+                    if future is not None:
+                        names, embeddings, walk_stats, loss = future.result()
+                    else:
+                        names, embeddings, walk_stats, loss = _embed_graph_task(other_graph,
+                                                                                self._get_component_params(1))
+                self._other_embeddings = (names, embeddings)
+                self._walk_stats = Node2VecEmbeddingGenerator._merge_walk_stats(self._walk_stats,
+                                                                                walk_stats)
+                if self._training_loss is not None and loss is not None:
+                    self._training_loss += loss
+        finally:
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+        self._model_graph = largest_graph
+        return model
+
+    def get_component_stats(self):
+        """
+        Gets connected component structure of the network, if embedded
+        with ``split_components``, as a dict with ``num_components``,
+        ``largest_component_nodes``, ``largest_component_edges``,
+        ``other_components_nodes``, ``other_components_edges`` and
+        ``component_sizes``, which maps number of nodes, as a string,
+        to number of components of that size
+
+        :return: component statistics or ``None`` if components were not split
+        :rtype: dict
+        """
+        return self._component_stats
+
+    def get_split_components(self):
+        """
+        Gets whether connected components are embedded with separate models
+
+        :return: ``True`` if ``split_components`` was set
+        :rtype: bool
+        """
+        return self._split_components
+
+    def log_profile(self, profiler):
+        """
+        Logs time and memory used by each phase to MLflow as
+        metrics if **log_fairops** was set
+
+        :param profiler: profiler
+        :type profiler: :py:class:`~cellmaps_ppi_embedding.profiling.PhaseProfiler`
+        """
+        if self._log_fairops:
+            _import_mlflow().log_metrics(profiler.get_metrics())
+
+    def get_walk_stats(self):
+        """
+        Gets how many nodes took exact walk steps and how many used
+        rejection sampling, as returned by
+        :py:meth:`~cellmaps_ppi_embedding.walks.Node2VecWalker.get_stats`
+
+        :return: walk statistics or ``None`` if walks were not generated
+                 by this generator, such as when reused from a cache
+        :rtype: dict
+        """
+        return self._walk_stats
+
+    def get_training_loss(self):
+        """
+        Gets training loss reported by Word2Vec, summed over the
+        epochs trained, once the model has been trained
+
+        :return: loss or ``None`` if loss was not computed
+        :rtype: float
+        """
+        return self._training_loss
+
+    def save_model(self, outdir, include_model=False):
+        """
+        Saves embeddings of the model trained by :py:meth:`get_next_embedding_batch`
+        as :py:class:`gensim.models.KeyedVectors` to :py:const:`KEYED_VECTORS_FILE`
+        in **outdir** and, if **include_model** is ``True``, the whole
+        :py:class:`gensim.models.Word2Vec` model, which can continue training,
+        to :py:const:`SAVED_MODEL_FILE`.
+
+        Every array is saved to its own ``.npy`` file next to these files so
+        they can be loaded memory mapped, letting processes share the pages:
+
+        .. code-block:: python
+
+            from gensim.models import KeyedVectors
+            kv = KeyedVectors.load('ppi_emd.kv', mmap='r')
+            kv.most_similar('TP53')
+
+        Unlike the model trained, whose vocabulary is node ids, the
+        files saved use gene names as keys. If components were split
+        the embeddings of all components are saved together, but there
+        is no whole model to save
+
+        :param outdir: directory to save to
+        :type outdir: str
+        :param include_model: If ``True`` also save whole model
+        :type include_model: bool
+        :raises CellMapsPPIEmbeddingError: If model has not been trained yet
+                                           or **include_model** is ``True``
+                                           and components were split
+        :return: (path, data format) of each file saved
+        :rtype: list
+        """
+        if self._model is None:
+            raise CellMapsPPIEmbeddingError('model has not been trained')
+        if include_model and self._other_embeddings is not None:
+            raise CellMapsPPIEmbeddingError('model cannot be saved when components are split '
+                                            'since each has its own model')
+        wv = self._model.wv
+        node_ids = wv.index_to_key
+        node_names = self._model_graph.get_node_names()
+        to_save = [(wv, Node2VecEmbeddingGenerator.KEYED_VECTORS_FILE)]
+        if include_model:
+            to_save.append((self._model, Node2VecEmbeddingGenerator.SAVED_MODEL_FILE))
+        if self._other_embeddings is not None:
+            from gensim.models import KeyedVectors
+            names, embeddings = self._other_embeddings
+            all_wv = KeyedVectors(self._dimensions)
+            all_wv.add_vectors([node_names[node_id] for node_id in node_ids] + names,
+                               np.concatenate((wv.vectors, embeddings)))
+            to_save = [(all_wv, Node2VecEmbeddingGenerator.KEYED_VECTORS_FILE)]
+        saved = []
+        # swap keys to names while saving rather than copy the vectors
+        wv.index_to_key = [node_names[node_id] for node_id in node_ids]
+        wv.key_to_index = {name: i for i, name in enumerate(wv.index_to_key)}
+        try:
+            for obj, file_name in to_save:
+                save_file = os.path.join(outdir, file_name)
+                # sep_limit=0 puts every array in a separate .npy file that can be memory mapped
+                obj.save(save_file, sep_limit=0)
+                saved.append((save_file, 'gensim'))
+                for array_file in sorted(glob.glob(glob.escape(save_file) + '.*.npy')):
+                    saved.append((array_file, 'npy'))
+        finally:
+            wv.index_to_key = node_ids
+            wv.key_to_index = {node_id: i for i, node_id in enumerate(node_ids)}
+        logger.info('Saved model to ' + ', '.join(path for path, _ in saved))
+        return saved
+
+    def get_updated_nodes(self):
+        """
+        Gets names of nodes whose embeddings were updated when
+        updating the model of an earlier run via ``update_dir``
+
+        :return: node names or ``None`` if not updating a model
+        :rtype: list
+        """
+        return self._updated_nodes
+
+    def cache_walks(self):
+        """
+        Generates walks and adds them to the walk cache, unless
+        they are already there, without training a model. Lets
+        several generators that differ only in Word2Vec parameters
+        share walks generated once
 
-        self._remove_header_edge_from_network()
+        :raises CellMapsPPIEmbeddingError: If no network, walk cache or seed was set
+        """
+        if self._walk_cache is None or self._seed is None:
+            raise CellMapsPPIEmbeddingError('walk_cache and seed must be set to cache walks')
+        csr_graph = self._get_csr_graph()
+        walk_dir = tempfile.mkdtemp(prefix='walks', dir=self._tmpdir)
+        try:
+            self._get_walks(csr_graph, walk_dir)
+        finally:
+            shutil.rmtree(walk_dir, ignore_errors=True)
 
-        n2v_obj = Node2Vec(self._nx_network, dimensions=self._dimensions,
-                           walk_length=self._walk_length,
-                           num_walks=self._num_walks, workers=self._workers,
-                           q=self._q, p=self._p, seed=self._seed)
+    def _train_model(self):
+        """
+        Generates walks and trains Word2Vec model on them
+
+        :raises CellMapsPPIEmbeddingError: If no network was set
+        :return: trained model
+        :rtype: :py:class:`gensim.models.Word2Vec`
+        """
+        csr_graph = self._get_csr_graph()
+        if self._split_components:
+            return self._train_components(csr_graph)
+        self._model_graph = csr_graph
 
         callbacks = []
-        compute_loss = False
+        compute_loss = self._compute_loss
         if self._log_fairops:
+            from cellmaps_ppi_embedding.callbacks import LossLogger
             compute_loss = True
             loss_logger = LossLogger()
             callbacks = [loss_logger]
 
-        # Embed nodes
-        model = n2v_obj.fit(
-            window=self._window, min_count=self._min_count,
-            sg=self._sg, epochs=self._epochs,
-            compute_loss=compute_loss, callbacks=callbacks
-        )
-        for key in model.wv.index_to_key:
-            row = [key.strip()]
-            row.extend(model.wv[key].tolist())
-            yield row
+        if self._checkpoint_dir is None:
+            walk_dir = tempfile.mkdtemp(prefix='walks', dir=self._tmpdir)
+        else:
+            os.makedirs(self._checkpoint_dir, exist_ok=True)
+            walk_dir = self._checkpoint_dir
+            if not self._resume:
+                # starting over so invalidate any earlier checkpoint
+                for state_file in (Node2VecEmbeddingGenerator.WALKS_STATE_FILE,
+                                   Node2VecEmbeddingGenerator.MODEL_STATE_FILE):
+                    if os.path.isfile(os.path.join(walk_dir, state_file)):
+                        os.remove(os.path.join(walk_dir, state_file))
+        try:
+            if self._update_dir is not None:
+                model = self._update_model(csr_graph, walk_dir, compute_loss, callbacks)
+            else:
+                # Embed nodes, walks are streamed from disk for every epoch
+                corpus = self._get_walks(csr_graph, walk_dir)
+                with self._profiler.phase('training'):
+                    model = self._fit_model(corpus,
+                                            self._get_model_state(self._get_walk_state(csr_graph)),
+                                            compute_loss, callbacks)
+            if self._checkpoint_dir is not None:
+                # network the model was trained on, needed to update it later
+                csr_graph.save(os.path.join(self._checkpoint_dir,
+                                            Node2VecEmbeddingGenerator.GRAPH_FILE))
+            return model
+        finally:
+            if self._checkpoint_dir is None:
+                shutil.rmtree(walk_dir, ignore_errors=True)
+
+    def get_next_embedding(self):
+        """
+        Generates walks, trains Word2Vec model on them and
+        yields embedding for each node
+
+        :raises CellMapsPPIEmbeddingError: If no network was set
+        :return: node name followed by embedding values
+        :rtype: list
+        """
+        return EmbeddingGenerator.get_rows_from_batches(self.get_next_embedding_batch())
+
+    def get_next_embedding_batch(self, batch_size=EmbeddingGenerator.BATCH_SIZE):
+        """
+        Generates walks, trains Word2Vec model on them and
+        yields blocks of embeddings sliced directly from the
+        model's vectors
+
+        :param batch_size: Maximum number of embeddings in each block
+        :type batch_size: int
+        :raises CellMapsPPIEmbeddingError: If no network was set
+        :return: (node names, embeddings as ``float32`` matrix)
+        :rtype: tuple
+        """
+        model = self._train_model()
+        self._model = model
+        node_names = self._model_graph.get_node_names()
+        keys = model.wv.index_to_key
+        vectors = model.wv.vectors
+        for start in range(0, len(keys), batch_size):
+            # vocabulary is node ids, translated to names only here
+            yield ([node_names[key] for key in keys[start:start + batch_size]],
+                   vectors[start:start + batch_size])
+        if self._other_embeddings is not None:
+            names, embeddings = self._other_embeddings
+            for start in range(0, len(names), batch_size):
+                yield names[start:start + batch_size], embeddings[start:start + batch_size]
+
+
+class SpectralEmbeddingGenerator(EmbeddingGenerator):
+    """
+    Generates embeddings by randomized truncated SVD, via
+    :py:func:`~cellmaps_ppi_embedding.spectral.randomized_eigsh`,
+    of a matrix derived from the network.
+
+    With :py:const:`~cellmaps_ppi_embedding.spectral.ADJACENCY_MATRIX`
+    the sparse normalized adjacency matrix is factorized, taking time
+    roughly linear in the number of edges. With
+    :py:const:`~cellmaps_ppi_embedding.spectral.NETMF_MATRIX` the
+    dense matrix that Node2Vec with ``p = q = 1`` implicitly factorizes
+    is, which is closer to Node2Vec but takes time quadratic in the
+    number of nodes. Either way there are no walks or training epochs,
+    so this is much faster than :py:class:`Node2VecEmbeddingGenerator`.
+    The embedding of each node is its row of the leading singular
+    vectors scaled by the square roots of the singular values. If
+    **dimensions** is more than the number of nodes the extra values
+    are ``0``
+    """
+    MATRIX = spectral.ADJACENCY_MATRIX
+    WINDOW = 10
+    NEGATIVE = 1
+    NETMF_RANK = 256
+    SEED = None
+
+    def __init__(self, csr_graph=None, dimensions=EmbeddingGenerator.DIMENSIONS,
+                 matrix=MATRIX, window=WINDOW, negative=NEGATIVE, netmf_rank=NETMF_RANK,
+                 oversample=spectral.OVERSAMPLE, power_iterations=spectral.POWER_ITERATIONS,
+                 seed=SEED):
+        """
+        Constructor
+
+        :param csr_graph: network to embed
+        :type csr_graph: :py:class:`~cellmaps_ppi_embedding.graph.CSRGraph`
+        :param dimensions: Desired size of output embedding
+        :type dimensions: int
+        :param matrix: matrix to factorize, one of
+                       :py:const:`~cellmaps_ppi_embedding.spectral.MATRICES`
+        :type matrix: str
+        :param window: window size of NetMF matrix, as in context window of Word2Vec
+        :type window: int
+        :param negative: number of negative samples of NetMF matrix
+        :type negative: int
+        :param netmf_rank: number of eigenvectors of normalized adjacency
+                           matrix used to approximate NetMF matrix
+        :type netmf_rank: int
+        :param oversample: number of extra random vectors used by randomized SVD
+        :type oversample: int
+        :param power_iterations: number of power iterations run by randomized SVD
+        :type power_iterations: int
+        :param seed: Seed for random vectors of randomized SVD. If ``None``
+                     embeddings may differ slightly from run to run
+        :type seed: int
+        :raises CellMapsPPIEmbeddingError: If **csr_graph** is ``None`` or
+                                           **matrix** is not supported
+        """
+        super().__init__(dimensions=dimensions)
+        if csr_graph is None:
+            raise CellMapsPPIEmbeddingError('Network must be set')
+        if matrix not in spectral.MATRICES:
+            raise CellMapsPPIEmbeddingError('Unsupported matrix: ' + str(matrix) +
+                                            ' must be one of ' + ', '.join(spectral.MATRICES))
+        self._csr_graph = csr_graph
+        self._matrix = matrix
+        self._window = window
+        self._negative = negative
+        self._netmf_rank = netmf_rank
+        self._oversample = oversample
+        self._power_iterations = power_iterations
+        self._seed = seed
+
+    def _get_embeddings(self):
+        """
+        Factorizes matrix
+
+        :return: ``float32`` embeddings, one row per node
+        :rtype: :py:class:`numpy.ndarray`
+        """
+        num_nodes = self._csr_graph.get_num_nodes()
+        adjacency, degrees = spectral.get_normalized_adjacency(self._csr_graph)
+        if self._matrix == spectral.NETMF_MATRIX:
+            eigenvalues, eigenvectors = spectral.randomized_eigsh(adjacency.dot, num_nodes,
+                                                                  self._netmf_rank,
+                                                                  oversample=self._oversample,
+                                                                  power_iterations=self._power_iterations,
+                                                                  seed=self._seed)
+            matmat = spectral.NetMFMatrix(eigenvalues, eigenvectors, degrees,
+                                          window=self._window,
+                                          negative=self._negative).matmat
+        else:
+            matmat = adjacency.dot
+        eigenvalues, eigenvectors = spectral.randomized_eigsh(matmat, num_nodes,
+                                                              self.get_dimensions(),
+                                                              oversample=self._oversample,
+                                                              power_iterations=self._power_iterations,
+                                                              seed=self._seed)
+        embeddings = np.zeros((num_nodes, self.get_dimensions()), dtype=np.float32)
+        embeddings[:, :len(eigenvalues)] = eigenvectors * np.sqrt(np.abs(eigenvalues)).astype(np.float32)
+        if len(eigenvalues) < self.get_dimensions():
+            logger.warning('Network has only ' + str(num_nodes) + ' nodes, last ' +
+                           str(self.get_dimensions() - len(eigenvalues)) +
+                           ' values of every embedding are 0')
+        return embeddings
+
+    def get_next_embedding(self):
+        """
+        Factorizes matrix and yields embedding for each node
+
+        :return: node name followed by embedding values
+        :rtype: list
+        """
+        return EmbeddingGenerator.get_rows_from_batches(self.get_next_embedding_batch())
+
+    def get_next_embedding_batch(self, batch_size=EmbeddingGenerator.BATCH_SIZE):
+        """
+        Factorizes matrix and yields blocks of embeddings
+
+        :param batch_size: Maximum number of embeddings in each block
+        :type batch_size: int
+        :return: (node names, embeddings as ``float32`` matrix)
+        :rtype: tuple
+        """
+        with self._profiler.phase('training'):
+            embeddings = self._get_embeddings()
+        node_names = self._csr_graph.get_node_names()
+        for start in range(0, len(node_names), batch_size):
+            yield node_names[start:start + batch_size], embeddings[start:start + batch_size]
+
+
+class FastRPEmbeddingGenerator(EmbeddingGenerator):
+    """
+    Generates embeddings with FastRP, fast random projection, of
+    Chen et al. via :py:func:`~cellmaps_ppi_embedding.fastrp.project`.
+
+    A very sparse random projection matrix, with rows scaled by
+    node degree to the power of **normalization_strength**, is
+    repeatedly multiplied by the sparse random walk transition
+    matrix. Each product, scaled to unit length rows, is added to
+    the embeddings with the weight of its iteration in
+    **iteration_weights**. There is no training, so time is linear
+    in the number of edges and million edge networks are embedded
+    in seconds to minutes. Products are computed a block of rows at
+    a time so memory, apart from the sparse matrices, is about three
+    ``float32`` matrices of number of nodes by **dimensions**
+    """
+    ITERATION_WEIGHTS = [0.0, 1.0, 1.0]
+    NORMALIZATION_STRENGTH = 0.0
+    SEED = None
+
+    def __init__(self, csr_graph=None, dimensions=EmbeddingGenerator.DIMENSIONS,
+                 iteration_weights=None, normalization_strength=NORMALIZATION_STRENGTH,
+                 seed=SEED):
+        """
+        Constructor
+
+        :param csr_graph: network to embed
+        :type csr_graph: :py:class:`~cellmaps_ppi_embedding.graph.CSRGraph`
+        :param dimensions: Desired size of output embedding
+        :type dimensions: int
+        :param iteration_weights: weight of each iteration, first is one
+                                  step from each node. If ``None``
+                                  :py:const:`ITERATION_WEIGHTS` is used
+        :type iteration_weights: list
+        :param normalization_strength: power of node degree rows of random
+                                       projection matrix are scaled by. Values
+                                       below ``0`` reduce the influence of hubs
+        :type normalization_strength: float
+        :param seed: Seed for random projection matrix. If ``None``
+                     embeddings differ from run to run
+        :type seed: int
+        :raises CellMapsPPIEmbeddingError: If **csr_graph** is ``None`` or
+                                           **iteration_weights** is empty
+        """
+        super().__init__(dimensions=dimensions)
+        if csr_graph is None:
+            raise CellMapsPPIEmbeddingError('Network must be set')
+        if iteration_weights is None:
+            iteration_weights = FastRPEmbeddingGenerator.ITERATION_WEIGHTS
+        if len(iteration_weights) == 0:
+            raise CellMapsPPIEmbeddingError('At least one iteration weight is needed')
+        self._csr_graph = csr_graph
+        self._iteration_weights = list(iteration_weights)
+        self._normalization_strength = normalization_strength
+        self._seed = seed
+
+    def _get_embeddings(self):
+        """
+        Projects network
+
+        :return: ``float32`` embeddings, one row per node
+        :rtype: :py:class:`numpy.ndarray`
+        """
+        transition, degrees = fastrp.get_transition_matrix(self._csr_graph)
+        projection = fastrp.get_random_projection(self._csr_graph.get_num_nodes(),
+                                                   self.get_dimensions(), seed=self._seed)
+        if self._normalization_strength != 0:
+            scale = np.zeros(len(degrees), dtype=np.float64)
+            has_edges = degrees > 0
+            scale[has_edges] = degrees[has_edges] ** self._normalization_strength
+            projection = projection.multiply(scale.astype(np.float32)[:, None]).tocsr()
+        return fastrp.project(transition, projection, self._iteration_weights)
+
+    def get_next_embedding(self):
+        """
+        Projects network and yields embedding for each node
+
+        :return: node name followed by embedding values
+        :rtype: list
+        """
+        return EmbeddingGenerator.get_rows_from_batches(self.get_next_embedding_batch())
+
+    def get_next_embedding_batch(self, batch_size=EmbeddingGenerator.BATCH_SIZE):
+        """
+        Projects network and yields blocks of embeddings
+
+        :param batch_size: Maximum number of embeddings in each block
+        :type batch_size: int
+        :return: (node names, embeddings as ``float32`` matrix)
+        :rtype: tuple
+        """
+        with self._profiler.phase('training'):
+            embeddings = self._get_embeddings()
+        node_names = self._csr_graph.get_node_names()
+        for start in range(0, len(node_names), batch_size):
+            yield node_names[start:start + batch_size], embeddings[start:start + batch_size]
 
 
 class FakeEmbeddingGenerator(EmbeddingGenerator):
     """
-    Fakes PPI embedding
+    Fakes PPI embedding by drawing each embedding from a standard
+    normal distribution. Used to load test downstream tools so
+    embeddings are drawn a block at a time from a seeded
+    :py:class:`numpy.random.Generator`. The values depend only on
+    **seed**, not on the batch size requested
     """
+    GENE_PREFIX = 'FAKEGENE'
 
-    def __init__(self, ppi_downloaddir, dimensions=1024):
+    def __init__(self, ppi_downloaddir, dimensions=1024, seed=None, num_genes=None):
         """
         Constructor
 
+        :param ppi_downloaddir: directory with
+                                :py:const:`~cellmaps_utils.constants.PPI_GENE_NODE_ATTR_FILE`
+                                to get gene names from. Not used if **num_genes** is set
+        :type ppi_downloaddir: str
         :param dimensions: Desired size of output embedding
         :type dimensions: int
+        :param seed: Seed for random number generator. If ``None``
+                     embeddings differ from run to run
+        :type seed: int
+        :param num_genes: If set, embed this many synthetic genes named
+                          :py:const:`GENE_PREFIX` followed by a number
+                          instead of reading gene names
+        :type num_genes: int
         """
         super().__init__(dimensions=dimensions)
 
         self._ppi_downloaddir = ppi_downloaddir
-        self._gene_list = self._get_gene_list()
+        self._seed = seed
+        self._num_genes = num_genes
+        if num_genes is None:
+            self._gene_list = self._get_gene_list()
+        else:
+            self._gene_list = None
 
         warnings.warn(constants.PPI_EMBEDDING_FILE +
                       ' contains FAKE DATA!!!!\n'
@@ -222,19 +1388,61 @@ class FakeEmbeddingGenerator(EmbeddingGenerator):
                 gene_list.append(row['name'])
         return gene_list
 
+    def get_num_genes(self):
+        """
+        Gets number of genes embedded
+
+        :return: number of genes
+        :rtype: int
+        """
+        if self._gene_list is None:
+            return self._num_genes
+        return len(self._gene_list)
+
+    def _get_genes(self, start, end):
+        """
+        Gets names of genes **start** up to **end**
+
+        :param start: index of first gene
+        :type start: int
+        :param end: index after last gene
+        :type end: int
+        :return: gene names
+        :rtype: list
+        """
+        if self._gene_list is None:
+            return [FakeEmbeddingGenerator.GENE_PREFIX + str(i) for i in range(start, end)]
+        return self._gene_list[start:end]
+
     def get_next_embedding(self):
         """
-        Generator method for getting next embedding.
-        Caller should implement with ``yield`` operator
+        Yields fake embedding for each gene, one row at a time
+        from the blocks of :py:meth:`get_next_embedding_batch`
 
-        :raises: NotImplementedError: Subclasses should implement this
-        :return: Embedding
+        :return: gene name followed by embedding values
         :rtype: list
         """
-        for g in self._gene_list:
-            row = [g]
-            row.extend(np.random.normal(size=self.get_dimensions()))  # sample normal distribution
-            yield row
+        return EmbeddingGenerator.get_rows_from_batches(self.get_next_embedding_batch())
+
+    def get_next_embedding_batch(self, batch_size=EmbeddingGenerator.BATCH_SIZE):
+        """
+        Generator method for getting next block of fake embeddings
+        drawn from a normal distribution
+
+        :param batch_size: Maximum number of embeddings in each block
+        :type batch_size: int
+        :return: (gene names, embeddings as ``float32`` matrix)
+        :rtype: tuple
+        """
+        # consecutive draws continue the same stream so blocks
+        # concatenate to the matrix a single draw would give
+        rng = np.random.default_rng(self._seed)
+        num_genes = self.get_num_genes()
+        for start in range(0, num_genes, batch_size):
+            end = min(start + batch_size, num_genes)
+            yield self._get_genes(start, end), rng.standard_normal(size=(end - start,
+                                                                         self.get_dimensions()),
+                                                                   dtype=np.float32)
 
 
 class CellMapsPPIEmbedder(object):
@@ -242,6 +1450,9 @@ class CellMapsPPIEmbedder(object):
     Class to run algorithm
     """
     PPI_EDGELIST_FILEKEY = 'edgelist'
+    WRITE_BLOCK_SIZE = 1024
+    CHECKPOINT_DIR = 'checkpoint'
+    REEMBEDDED_NODES_FILE = 'reembedded_nodes.txt'
 
     def __init__(self, outdir=None,
                  embedding_generator=None,
@@ -252,7 +1463,17 @@ class CellMapsPPIEmbedder(object):
                  project_name=None,
                  provenance_utils=ProvenanceUtil(),
                  input_data_dict=None,
-                 provenance=None):
+                 provenance=None,
+                 output_format=writers.TSV_FORMAT,
+                 tsv_float_format=writers.TSVEmbeddingWriter.DEFAULT_FLOAT_FORMAT,
+                 compress_tsv=False,
+                 compress_workers=1,
+                 profiler=None,
+                 profile=False,
+                 register_profile=False,
+                 save_vectors=False,
+                 save_model=False,
+                 knn_neighbors=0):
         """
         Constructor
 
@@ -313,9 +1534,57 @@ class CellMapsPPIEmbedder(object):
                                    }
                                }
         :type provenance: dict or None
+        :param output_format: Format of embedding file written in addition to
+                              :py:const:`~cellmaps_utils.constants.PPI_EMBEDDING_FILE`.
+                              One of :py:const:`~cellmaps_ppi_embedding.writers.OUTPUT_FORMATS`,
+                              ``tsv`` means no additional file is written
+        :type output_format: str
+        :param tsv_float_format: printf style format for values in
+                                 :py:const:`~cellmaps_utils.constants.PPI_EMBEDDING_FILE`.
+                                 Default ``%r`` gives full precision
+        :type tsv_float_format: str
+        :param compress_tsv: If ``True`` gzip compress
+                             :py:const:`~cellmaps_utils.constants.PPI_EMBEDDING_FILE`,
+                             adding a ``.gz`` suffix to its name
+        :type compress_tsv: bool
+        :param compress_workers: Number of threads used to compress
+                                 :py:const:`~cellmaps_utils.constants.PPI_EMBEDDING_FILE`
+        :type compress_workers: int
+        :param profiler: Records how long each phase of :py:meth:`run` takes, shared
+                         with **embedding_generator** if it is a :py:class:`~EmbeddingGenerator`.
+                         If ``None`` a new one is created
+        :type profiler: :py:class:`~cellmaps_ppi_embedding.profiling.PhaseProfiler`
+        :param profile: If ``True`` profile :py:meth:`run` with
+                        :py:class:`~cellmaps_ppi_embedding.profiling.CallProfiler`
+                        writing its files to **outdir**
+        :type profile: bool
+        :param register_profile: If ``True`` register profile files in the
+                                 RO-Crate. Profiling then stops before the
+                                 output files are registered
+        :type register_profile: bool
+        :param save_vectors: If ``True`` and **embedding_generator** is a
+                             :py:class:`Node2VecEmbeddingGenerator`, save embeddings as
+                             memory mappable :py:class:`gensim.models.KeyedVectors`
+                             to **outdir** and register them in the RO-Crate
+        :type save_vectors: bool
+        :param save_model: Like **save_vectors** but also save the whole
+                           :py:class:`gensim.models.Word2Vec` model
+        :type save_model: bool
+        :param knn_neighbors: If greater than ``0``, write this many most similar
+                              genes, by cosine similarity of their embeddings, for
+                              every gene to :py:const:`~cellmaps_ppi_embedding.knn.KNN_FILE`
+                              using :py:class:`~cellmaps_ppi_embedding.knn.CosineKNN`
+        :type knn_neighbors: int
+        :raises CellMapsPPIEmbeddingError: If **outdir** is ``None`` or **save_model**
+                                           is set and **embedding_generator** splits
+                                           connected components
         """
         if outdir is None:
             raise CellMapsPPIEmbeddingError('outdir is None')
+        if save_model and isinstance(embedding_generator, Node2VecEmbeddingGenerator) and \
+                embedding_generator.get_split_components():
+            raise CellMapsPPIEmbeddingError('save_model cannot be used with split_components '
+                                            'since each component has its own model')
 
         self._outdir = os.path.abspath(outdir)
         self._inputdir = os.path.abspath(inputdir) if inputdir is not None else inputdir
@@ -331,6 +1600,25 @@ class CellMapsPPIEmbedder(object):
         self._provenance_utils = provenance_utils
         self._provenance = provenance
         self._inputdataset_ids = []
+        self._output_format = output_format
+        self._tsv_float_format = tsv_float_format
+        self._compress_tsv = compress_tsv
+        self._compress_workers = compress_workers
+        self._embedding_writer = None
+        self._extra_embedding_file_ids = []
+        self._reembedded_nodes_file = None
+        self._save_vectors = save_vectors or save_model
+        self._save_model = save_model
+        self._model_files = []
+        self._knn_neighbors = knn_neighbors
+        self._knn = None
+        self._knn_file = None
+        self._profiler = profiler if profiler is not None else PhaseProfiler()
+        self._call_profiler = CallProfiler() if profile else None
+        self._register_profile = register_profile
+        self._profile_file_ids = []
+        if isinstance(self._embedding_generator, EmbeddingGenerator):
+            self._embedding_generator.set_profiler(self._profiler)
         if skip_logging is None:
             self._skip_logging = False
         else:
@@ -344,11 +1632,23 @@ class CellMapsPPIEmbedder(object):
                                      'project_name': self._project_name,
                                      'organization_name': self._organization_name,
                                      'skip_logging': self._skip_logging,
-                                     'provenance': str(self._provenance)
+                                     'provenance': str(self._provenance),
+                                     'output_format': self._output_format,
+                                     'tsv_float_format': self._tsv_float_format,
+                                     'compress_tsv': self._compress_tsv
                                      }
 
         logger.debug('In constructor')
 
+    def get_profiler(self):
+        """
+        Gets profiler recording how long each phase of :py:meth:`run` took
+
+        :return: profiler
+        :rtype: :py:class:`~cellmaps_ppi_embedding.profiling.PhaseProfiler`
+        """
+        return self._profiler
+
     @staticmethod
     def get_apms_edgelist_file(input_dir=None,
                                edgelist_filename=constants.PPI_EDGELIST_FILE):
@@ -465,7 +1765,9 @@ class CellMapsPPIEmbedder(object):
                                                     keywords=keywords,
                                                     used_software=[self._softwareid],
                                                     used_dataset=self._inputdataset_ids,
-                                                    generated=[self._embedding_file_id])
+                                                    generated=[self._embedding_file_id] +
+                                                    self._extra_embedding_file_ids +
+                                                    self._profile_file_ids)
 
     def _register_input_datasets(self):
         """
@@ -506,7 +1808,7 @@ class CellMapsPPIEmbedder(object):
         data_dict = {'name': cellmaps_ppi_embedding.__name__ + ' output file',
                      'description': description,
                      'keywords': keywords,
-                     'data-format': 'tsv',
+                     'data-format': 'tsv.gz' if self._compress_tsv else 'tsv',
                      'author': cellmaps_ppi_embedding.__name__,
                      'version': cellmaps_ppi_embedding.__version__,
                      'schema': 'https://raw.githubusercontent.com/fairscape/cm4ai-schemas/main/v0.1.0/cm4ai_schema_apms_embedding.json',
@@ -514,16 +1816,237 @@ class CellMapsPPIEmbedder(object):
         self._embedding_file_id = self._provenance_utils.register_dataset(self._outdir,
                                                                           source_file=self.get_ppi_embedding_file(),
                                                                           data_dict=data_dict)
+        if self._embedding_writer is None:
+            return
+
+        for output_file, data_format in self._embedding_writer.get_output_files():
+            logger.debug('Registering ' + output_file + ' with FAIRSCAPE')
+            data_dict = {'name': cellmaps_ppi_embedding.__name__ + ' ' +
+                         os.path.basename(output_file) + ' output file',
+                         'description': description + ' in ' + data_format + ' format',
+                         'keywords': keywords,
+                         'data-format': data_format,
+                         'author': cellmaps_ppi_embedding.__name__,
+                         'version': cellmaps_ppi_embedding.__version__,
+                         'date-published': date.today().strftime(self._provenance_utils.get_default_date_format_str())}
+            self._extra_embedding_file_ids.append(self._provenance_utils.register_dataset(self._outdir,
+                                                                                          source_file=output_file,
+                                                                                          data_dict=data_dict))
+
+    def _register_reembedded_nodes_file(self):
+        """
+        Registers :py:const:`REEMBEDDED_NODES_FILE`, if it was written, as a dataset
+        """
+        if self._reembedded_nodes_file is None:
+            return
+        logger.debug('Registering ' + self._reembedded_nodes_file + ' with FAIRSCAPE')
+        data_dict = {'name': cellmaps_ppi_embedding.__name__ + ' ' +
+                     CellMapsPPIEmbedder.REEMBEDDED_NODES_FILE + ' output file',
+                     'description': 'Nodes whose embeddings were updated by ' + self._description,
+                     'keywords': self._keywords + ['update'],
+                     'data-format': 'txt',
+                     'author': cellmaps_ppi_embedding.__name__,
+                     'version': cellmaps_ppi_embedding.__version__,
+                     'date-published': date.today().strftime(self._provenance_utils.get_default_date_format_str())}
+        self._extra_embedding_file_ids.append(self._provenance_utils.register_dataset(self._outdir,
+                                                                                      source_file=self._reembedded_nodes_file,
+                                                                                      data_dict=data_dict))
+
+    def _register_knn_file(self):
+        """
+        Registers :py:const:`~cellmaps_ppi_embedding.knn.KNN_FILE`, if it was written, as a dataset
+        """
+        if self._knn_file is None:
+            return
+        logger.debug('Registering ' + self._knn_file + ' with FAIRSCAPE')
+        data_dict = {'name': cellmaps_ppi_embedding.__name__ + ' ' +
+                     knn.KNN_FILE + ' output file',
+                     'description': str(self._knn_neighbors) + ' most similar genes to each gene '
+                                    'by cosine similarity of ' + self._description,
+                     'keywords': self._keywords + ['nearest neighbors'],
+                     'data-format': 'tsv',
+                     'author': cellmaps_ppi_embedding.__name__,
+                     'version': cellmaps_ppi_embedding.__version__,
+                     'date-published': date.today().strftime(self._provenance_utils.get_default_date_format_str())}
+        self._extra_embedding_file_ids.append(self._provenance_utils.register_dataset(self._outdir,
+                                                                                      source_file=self._knn_file,
+                                                                                      data_dict=data_dict))
+
+    def _register_model_files(self):
+        """
+        Registers files saved by :py:meth:`_save_generator_model` as datasets
+        """
+        for model_file, data_format in self._model_files:
+            logger.debug('Registering ' + model_file + ' with FAIRSCAPE')
+            data_dict = {'name': cellmaps_ppi_embedding.__name__ + ' ' +
+                         os.path.basename(model_file) + ' model file',
+                         'description': 'gensim model of ' + self._description +
+                                        ' in ' + data_format + ' format',
+                         'keywords': self._keywords + ['model'],
+                         'data-format': data_format,
+                         'author': cellmaps_ppi_embedding.__name__,
+                         'version': cellmaps_ppi_embedding.__version__,
+                         'date-published': date.today().strftime(self._provenance_utils.get_default_date_format_str())}
+            self._extra_embedding_file_ids.append(self._provenance_utils.register_dataset(self._outdir,
+                                                                                          source_file=model_file,
+                                                                                          data_dict=data_dict))
+
+    def _register_profile_files(self, profile_files):
+        """
+        Registers files written by
+        :py:class:`~cellmaps_ppi_embedding.profiling.CallProfiler` as datasets
+
+        :param profile_files: paths to profile files
+        :type profile_files: list
+        """
+        for profile_file in profile_files:
+            logger.debug('Registering ' + profile_file + ' with FAIRSCAPE')
+            data_format = 'pstats' if profile_file.endswith('.pstats') else 'txt'
+            data_dict = {'name': cellmaps_ppi_embedding.__name__ + ' ' +
+                         os.path.basename(profile_file) + ' profile file',
+                         'description': 'Profile of ' + self._description + ' run in ' +
+                                        data_format + ' format',
+                         'keywords': self._keywords + ['profile'],
+                         'data-format': data_format,
+                         'author': cellmaps_ppi_embedding.__name__,
+                         'version': cellmaps_ppi_embedding.__version__,
+                         'date-published': date.today().strftime(self._provenance_utils.get_default_date_format_str())}
+            self._profile_file_ids.append(self._provenance_utils.register_dataset(self._outdir,
+                                                                                  source_file=profile_file,
+                                                                                  data_dict=data_dict))
 
     def get_ppi_embedding_file(self):
         """
-        Gets PPI embedding file in output directory
+        Gets PPI embedding file in output directory, which
+        has a ``.gz`` suffix if it is compressed
 
         :return:
         :rtype: str
         """
+        if self._compress_tsv:
+            return os.path.join(self._outdir, constants.PPI_EMBEDDING_FILE +
+                                writers.TSVEmbeddingWriter.GZIP_SUFFIX)
         return os.path.join(self._outdir, constants.PPI_EMBEDDING_FILE)
 
+    def _get_embedding_batches(self):
+        """
+        Gets blocks of embeddings from generator, falling back
+        to grouping rows from ``get_next_embedding()`` if the generator
+        is not a :py:class:`EmbeddingGenerator`
+
+        :return: (ids, embeddings) tuples
+        :rtype: iterable
+        """
+        if isinstance(self._embedding_generator, EmbeddingGenerator):
+            return self._embedding_generator.get_next_embedding_batch(batch_size=CellMapsPPIEmbedder.WRITE_BLOCK_SIZE)
+        return EmbeddingGenerator.get_batches_from_rows(self._embedding_generator.get_next_embedding(),
+                                                        batch_size=CellMapsPPIEmbedder.WRITE_BLOCK_SIZE)
+
+    def _write_embeddings(self):
+        """
+        Writes embeddings from generator to
+        :py:const:`~cellmaps_utils.constants.PPI_EMBEDDING_FILE` and, if
+        an output format other than ``tsv`` was requested, to
+        a binary file in that format as well
+        """
+        dimensions = self._embedding_generator.get_dimensions()
+        tsv_writer = writers.TSVEmbeddingWriter(self._outdir, dimensions,
+                                                float_format=self._tsv_float_format,
+                                                compress=self._compress_tsv,
+                                                workers=self._compress_workers)
+        try:
+            if self._output_format != writers.TSV_FORMAT:
+                self._embedding_writer = writers.get_embedding_writer(self._output_format,
+                                                                      self._outdir,
+                                                                      dimensions)
+            if self._knn_neighbors > 0:
+                self._knn = knn.CosineKNN()
+            for ids, embeddings in self._get_embedding_batches():
+                tsv_writer.add_embeddings(ids, embeddings)
+                if self._embedding_writer is not None:
+                    self._embedding_writer.add_embeddings(ids, embeddings)
+                if self._knn is not None:
+                    self._knn.add_embeddings(ids, embeddings)
+        finally:
+            tsv_writer.close()
+            if self._embedding_writer is not None:
+                self._embedding_writer.close()
+
+    def _write_reembedded_nodes(self):
+        """
+        Writes names of nodes, one per line, whose embeddings were
+        updated to :py:const:`REEMBEDDED_NODES_FILE` if the generator
+        is a :py:class:`Node2VecEmbeddingGenerator` updating the model
+        of an earlier run
+        """
+        if not isinstance(self._embedding_generator, Node2VecEmbeddingGenerator) or \
+                self._embedding_generator.get_updated_nodes() is None:
+            return
+        self._reembedded_nodes_file = os.path.join(self._outdir,
+                                                   CellMapsPPIEmbedder.REEMBEDDED_NODES_FILE)
+        with open(self._reembedded_nodes_file, 'w') as f:
+            for node in self._embedding_generator.get_updated_nodes():
+                f.write(node + '\n')
+
+    def _write_knn(self):
+        """
+        Writes most similar genes to each gene, among embeddings
+        written by :py:meth:`_write_embeddings`, to
+        :py:const:`~cellmaps_ppi_embedding.knn.KNN_FILE`
+        """
+        if len(self._knn.get_ids()) == 0:
+            return
+        self._knn_file = os.path.join(self._outdir, knn.KNN_FILE)
+        self._knn.write_neighbors(self._knn_file, self._knn_neighbors)
+        self._knn = None
+
+    def _save_generator_model(self):
+        """
+        Saves model of generator to output directory, via
+        :py:meth:`Node2VecEmbeddingGenerator.save_model`, if saving
+        vectors or model was requested
+        """
+        if not self._save_vectors:
+            return
+        if not isinstance(self._embedding_generator, Node2VecEmbeddingGenerator):
+            logger.warning('Not saving model cause embedding generator is not ' +
+                           Node2VecEmbeddingGenerator.__name__)
+            return
+        self._model_files = self._embedding_generator.save_model(self._outdir,
+                                                                 include_model=self._save_model)
+
+    def _add_profile_to_task_finish_json(self):
+        """
+        Adds time and memory used by each phase of the run, as
+        recorded by the profiler, to the task finish json file
+        written by :py:func:`~cellmaps_utils.logutils.write_task_finish_json`
+        under the ``phases`` key along with overall ``peak_rss_mb``.
+        Walk statistics of a :py:class:`Node2VecEmbeddingGenerator` that
+        generated walks are added under ``walk_stats`` and, if it split
+        the network into connected components, their structure under
+        ``components``
+        """
+        task_file = os.path.join(self._outdir, constants.TASK_FILE_PREFIX +
+                                 str(self._start_time) +
+                                 constants.TASK_FINISH_FILE_SUFFIX)
+        if not os.path.isfile(task_file):
+            return
+        try:
+            with open(task_file, 'r') as f:
+                task = json.load(f)
+            task['phases'] = self._profiler.get_phases()
+            task['peak_rss_mb'] = self._profiler.get_peak_rss_mb()
+            if isinstance(self._embedding_generator, Node2VecEmbeddingGenerator) and \
+                    self._embedding_generator.get_walk_stats() is not None:
+                task['walk_stats'] = self._embedding_generator.get_walk_stats()
+            if isinstance(self._embedding_generator, Node2VecEmbeddingGenerator) and \
+                    self._embedding_generator.get_component_stats() is not None:
+                task['components'] = self._embedding_generator.get_component_stats()
+            with open(task_file, 'w') as f:
+                json.dump(task, f, indent=2)
+        except (OSError, ValueError) as e:
+            logger.warning('Unable to add phases to ' + task_file + ' : ' + str(e))
+
     def generate_readme(self):
         description = getattr(cellmaps_ppi_embedding, '__description__', 'No description provided.')
         version = getattr(cellmaps_ppi_embedding, '__version__', '0.0.0')
@@ -544,6 +2067,9 @@ class CellMapsPPIEmbedder(object):
         """
         logger.debug('In run method')
         exitcode = 99
+        profile_files = []
+        if self._call_profiler is not None:
+            self._call_profiler.start()
         try:
             if not os.path.isdir(self._outdir):
                 os.makedirs(self._outdir, mode=0o755)
@@ -551,34 +2077,50 @@ class CellMapsPPIEmbedder(object):
             if self._skip_logging is False:
                 logutils.setup_filelogger(outdir=self._outdir,
                                           handlerprefix='cellmaps_ppi_embedding')
-            self._write_task_start_json()
+            with self._profiler.phase('setup'):
+                self._write_task_start_json()
+
+                self.generate_readme()
+
+            with self._profiler.phase('provenance'):
+                self._update_provenance_fields()
 
-            self.generate_readme()
+                self._create_run_crate()
 
-            self._update_provenance_fields()
+                self._register_software()
 
-            self._create_run_crate()
+            with self._profiler.phase('write'):
+                self._write_embeddings()
+                self._write_reembedded_nodes()
+                self._save_generator_model()
 
-            self._register_software()
+            if self._knn is not None:
+                with self._profiler.phase('knn'):
+                    self._write_knn()
 
-            with open(self.get_ppi_embedding_file(), 'w', newline='') as f:
-                writer = csv.writer(f, delimiter='\t')
-                header_line = ['id']
-                header_line.extend([x for x in range(self._embedding_generator.get_dimensions())])
-                writer.writerow(header_line)
-                for row in self._embedding_generator.get_next_embedding():
-                    writer.writerow(row)
+            if self._call_profiler is not None and self._register_profile:
+                profile_files = self._call_profiler.stop(self._outdir)
 
-            self._register_embedding_file()
-            self._register_computation()
+            with self._profiler.phase('provenance'):
+                self._register_embedding_file()
+                self._register_reembedded_nodes_file()
+                self._register_model_files()
+                self._register_knn_file()
+                self._register_profile_files(profile_files)
+                self._register_computation()
 
             exitcode = 0
 
         finally:
+            if self._call_profiler is not None and self._call_profiler.is_running():
+                self._call_profiler.stop(self._outdir)
             self._end_time = int(time.time())
             # write a task finish file
             logutils.write_task_finish_json(outdir=self._outdir,
                                             start_time=self._start_time,
                                             end_time=self._end_time,
                                             status=exitcode)
+            self._add_profile_to_task_finish_json()
+            if isinstance(self._embedding_generator, EmbeddingGenerator):
+                self._embedding_generator.log_profile(self._profiler)
         return exitcode
@@ -0,0 +1,204 @@
+#! /usr/bin/env python
+
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+ADJACENCY_MATRIX = 'adjacency'
+"""
+Symmetrically normalized adjacency matrix ``D^-1/2 A D^-1/2``
+"""
+
+NETMF_MATRIX = 'netmf'
+"""
+NetMF matrix, the matrix DeepWalk style random walk embeddings
+implicitly factorize
+"""
+
+MATRICES = [ADJACENCY_MATRIX, NETMF_MATRIX]
+"""
+Matrices :py:class:`~cellmaps_ppi_embedding.runner.SpectralEmbeddingGenerator`
+can factorize
+"""
+
+OVERSAMPLE = 10
+"""
+Number of extra random vectors used by :py:func:`randomized_eigsh`
+"""
+
+POWER_ITERATIONS = 4
+"""
+Number of power iterations run by :py:func:`randomized_eigsh`
+"""
+
+
+def get_normalized_adjacency(csr_graph):
+    """
+    Builds symmetrically normalized adjacency matrix ``D^-1/2 A D^-1/2``
+    of **csr_graph** where ``D`` holds the sum of edge weights of each
+    node. Rows and columns of nodes without edges are all zero
+
+    :param csr_graph: network
+    :type csr_graph: :py:class:`~cellmaps_ppi_embedding.graph.CSRGraph`
+    :return: (``float32`` :py:class:`scipy.sparse.csr_matrix`,
+             ``float64`` weighted degree of each node)
+    :rtype: tuple
+    """
+    from scipy.sparse import csr_matrix
+    num_nodes = csr_graph.get_num_nodes()
+    indptr = csr_graph.get_indptr()
+    indices = csr_graph.get_indices()
+    weights = csr_graph.get_weights().astype(np.float64)
+    rows = np.repeat(np.arange(num_nodes), np.diff(indptr))
+    degrees = np.bincount(rows, weights=weights, minlength=num_nodes)
+    inv_sqrt = np.zeros(num_nodes, dtype=np.float64)
+    has_edges = degrees > 0
+    inv_sqrt[has_edges] = 1.0 / np.sqrt(degrees[has_edges])
+    data = (weights * inv_sqrt[rows] * inv_sqrt[indices]).astype(np.float32)
+    return csr_matrix((data, indices, indptr), shape=(num_nodes, num_nodes)), degrees
+
+
+def randomized_eigsh(matmat, size, rank, oversample=OVERSAMPLE,
+                     power_iterations=POWER_ITERATIONS, seed=None):
+    """
+    Finds the **rank** eigenvalues of largest magnitude, and their
+    eigenvectors, of a symmetric **size** by **size** matrix that is only
+    available through its product with a block of vectors.
+
+    Uses the randomized range finder of Halko, Martinsson and Tropp:
+    the matrix is applied to **rank** plus **oversample** random
+    vectors, re-orthonormalized after each of **power_iterations**
+    further products, and the eigenproblem is solved exactly on
+    the small matrix projected onto the subspace found. Since the
+    matrix is symmetric, the magnitudes of its eigenvalues are its
+    singular values so this is a randomized truncated SVD. Blocks
+    of vectors are ``float32``, if **size** is at most **rank** plus
+    **oversample** the result is exact
+
+    :param matmat: function taking ``float32`` matrix with **size** rows
+                   and returning product of symmetric matrix and it
+    :type matmat: callable
+    :param size: number of rows and columns of matrix
+    :type size: int
+    :param rank: number of eigenvalues to find, capped at **size**
+    :type rank: int
+    :param oversample: number of extra random vectors
+    :type oversample: int
+    :param power_iterations: number of power iterations
+    :type power_iterations: int
+    :param seed: seed for random vectors
+    :type seed: int
+    :return: (eigenvalues ordered by decreasing magnitude,
+             ``float32`` matrix with eigenvector of each in its column)
+    :rtype: tuple
+    """
+    rank = min(rank, size)
+    num_vectors = min(size, rank + oversample)
+    rng = np.random.default_rng(seed)
+    basis, _ = np.linalg.qr(matmat(rng.standard_normal((size, num_vectors),
+                                                       dtype=np.float32)))
+    for _ in range(power_iterations):
+        basis, _ = np.linalg.qr(matmat(basis))
+    projected = (basis.T @ matmat(basis)).astype(np.float64)
+    eigenvalues, eigenvectors = np.linalg.eigh((projected + projected.T) / 2.0)
+    order = np.argsort(-np.abs(eigenvalues), kind='stable')[:rank]
+    return eigenvalues[order], basis @ eigenvectors[:, order].astype(np.float32)
+
+
+def filter_eigenvalues(eigenvalues, window):
+    """
+    Applies the NetMF window filter ``(1/T) sum_{r=1..T} x^r`` to
+    **eigenvalues** of the normalized adjacency matrix, which turns
+    them into eigenvalues of the average of its first **window** powers
+
+    :param eigenvalues: eigenvalues
+    :type eigenvalues: :py:class:`numpy.ndarray`
+    :param window: window size ``T``
+    :type window: int
+    :return: filtered eigenvalues
+    :rtype: :py:class:`numpy.ndarray`
+    """
+    eigenvalues = np.asarray(eigenvalues, dtype=np.float64)
+    power = np.ones_like(eigenvalues)
+    total = np.zeros_like(eigenvalues)
+    for _ in range(window):
+        power *= eigenvalues
+        total += power
+    return total / window
+
+
+class NetMFMatrix(object):
+    """
+    Dense NetMF matrix ``log(max(vol(G) / b * (1/T sum_{r=1..T} P^r) D^-1, 1))``
+    of Qiu et al., where ``P = D^-1 A``, approximated from the
+    eigenvalues of largest magnitude of the normalized adjacency
+    matrix as in their large window NetMF.
+
+    The matrix has a value for every pair of nodes so it is never
+    stored. :py:meth:`matmat` computes it a block of rows at a time,
+    each block staying under :py:const:`BLOCK_BYTES`, and multiplies
+    the block right away. Each product therefore takes time
+    quadratic in the number of nodes
+    """
+    BLOCK_BYTES = 64 * 1024 ** 2
+
+    def __init__(self, eigenvalues, eigenvectors, degrees, window=10,
+                 negative=1, block_bytes=BLOCK_BYTES):
+        """
+        Constructor
+
+        :param eigenvalues: eigenvalues of normalized adjacency matrix
+        :type eigenvalues: :py:class:`numpy.ndarray`
+        :param eigenvectors: matrix with eigenvector of each eigenvalue
+                             in its column
+        :type eigenvectors: :py:class:`numpy.ndarray`
+        :param degrees: weighted degree of each node
+        :type degrees: :py:class:`numpy.ndarray`
+        :param window: window size ``T``, as in context window of Word2Vec
+        :type window: int
+        :param negative: number of negative samples ``b``
+        :type negative: int
+        :param block_bytes: Maximum size in bytes of each block of rows
+        :type block_bytes: int
+        """
+        degrees = np.asarray(degrees, dtype=np.float64)
+        inv_sqrt = np.zeros(len(degrees), dtype=np.float64)
+        has_edges = degrees > 0
+        inv_sqrt[has_edges] = 1.0 / np.sqrt(degrees[has_edges])
+        scale = degrees.sum() / negative
+        # matrix is scale * X diag(filtered) X^T where X = D^-1/2 U
+        self._right = eigenvectors * inv_sqrt[:, None].astype(np.float32)
+        self._left = self._right * (scale * filter_eigenvalues(eigenvalues,
+                                                               window)).astype(np.float32)
+        self._block_bytes = block_bytes
+
+    def get_size(self):
+        """
+        Gets number of rows and columns of matrix
+
+        :return: number of nodes
+        :rtype: int
+        """
+        return self._right.shape[0]
+
+    def matmat(self, vectors):
+        """
+        Multiplies matrix by **vectors**
+
+        :param vectors: matrix with :py:meth:`get_size` rows
+        :type vectors: :py:class:`numpy.ndarray`
+        :return: ``float32`` product
+        :rtype: :py:class:`numpy.ndarray`
+        """
+        size = self.get_size()
+        product = np.empty((size, vectors.shape[1]), dtype=np.float32)
+        block_rows = max(1, min(size, self._block_bytes // (4 * size)))
+        for start in range(0, size, block_rows):
+            end = min(start + block_rows, size)
+            block = self._left[start:end] @ self._right.T
+            np.maximum(block, 1.0, out=block)
+            np.log(block, out=block)
+            product[start:end] = block @ vectors
+        return product
@@ -0,0 +1,311 @@
+#! /usr/bin/env python
+
+import os
+import csv
+import time
+import random
+import logging
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+
+from cellmaps_ppi_embedding.exceptions import CellMapsPPIEmbeddingError
+from cellmaps_ppi_embedding.cache import WalkCache
+from cellmaps_ppi_embedding.runner import Node2VecEmbeddingGenerator
+from cellmaps_ppi_embedding.runner import CellMapsPPIEmbedder
+
+logger = logging.getLogger(__name__)
+
+_worker_sweep = None
+"""
+:py:class:`HyperparameterSweep` used by the current pool worker process,
+set by :py:func:`_init_sweep_worker`
+"""
+
+
+def _init_sweep_worker(sweep):
+    """
+    Initializer for pool worker processes that stores **sweep**
+    so the graph is sent to each worker once instead of once
+    per configuration
+
+    :param sweep: sweep being run
+    :type sweep: :py:class:`HyperparameterSweep`
+    """
+    global _worker_sweep
+    _worker_sweep = sweep
+
+
+def _run_config_task(config):
+    """
+    Runs **config** with the sweep of this worker process
+
+    :param config: configuration to run
+    :type config: dict
+    :return: row for summary table
+    :rtype: dict
+    """
+    return _worker_sweep.run_config(config)
+
+
+class HyperparameterSweep(object):
+    """
+    Runs Node2Vec over a grid of parameters, loading the graph once
+    and generating walks once for every combination of ``p`` and ``q``.
+
+    Each configuration is written to its own output directory under
+    **outdir** by :py:class:`~cellmaps_ppi_embedding.runner.CellMapsPPIEmbedder`
+    and a summary of timings and training loss is written to
+    :py:const:`SUMMARY_FILE`
+    """
+    SUMMARY_FILE = 'sweep_summary.tsv'
+    WALK_CACHE_DIR = 'walk_cache'
+    WALK_PARAMS = ['p', 'q']
+    MODEL_PARAMS = ['dimensions', 'window', 'epochs']
+    SUMMARY_COLS = ['config'] + WALK_PARAMS + MODEL_PARAMS + ['status', 'walk_seconds',
+                                                              'run_seconds', 'training_loss',
+                                                              'outdir', 'error']
+
+    def __init__(self, outdir, csr_graph, grid, inputdir=None,
+                 walk_length=Node2VecEmbeddingGenerator.WALK_LENGTH,
+                 num_walks=Node2VecEmbeddingGenerator.NUM_WALKS,
+                 seed=None, workers=1, parallel_configs=1,
+                 walk_cache_dir=None, tmpdir=None, embedder_args=None):
+        """
+        Constructor
+
+        :param outdir: directory where output directory of each
+                       configuration and summary are written
+        :type outdir: str
+        :param csr_graph: network to embed
+        :type csr_graph: :py:class:`~cellmaps_ppi_embedding.graph.CSRGraph`
+        :param grid: values to try for each of ``p``, ``q``, ``dimensions``,
+                     ``window`` and ``epochs``. Parameters left out use the
+                     :py:class:`~cellmaps_ppi_embedding.runner.Node2VecEmbeddingGenerator`
+                     default
+
+                     Example:
+
+                     .. code-block:: python
+
+                         {'p': [0.5, 1, 2], 'dimensions': [128, 1024]}
+        :type grid: dict
+        :param inputdir: directory with edge list file, passed to
+                         :py:class:`~cellmaps_ppi_embedding.runner.CellMapsPPIEmbedder`
+        :type inputdir: str
+        :param walk_length: Length of each walk
+        :type walk_length: int
+        :param num_walks: Number of walks per node
+        :type num_walks: int
+        :param seed: Seed for walks and Word2Vec. Walks can only be shared by
+                     configurations when seeded so if ``None`` a seed is
+                     chosen at random
+        :type seed: int
+        :param workers: Total number of cores to use
+        :type workers: int
+        :param parallel_configs: Number of configurations to run at the same time,
+                                 each gets an equal share of **workers**
+        :type parallel_configs: int
+        :param walk_cache_dir: Directory to cache walks in. If ``None``
+                               :py:const:`WALK_CACHE_DIR` under **outdir** is used
+        :type walk_cache_dir: str
+        :param tmpdir: Directory for temporary walk files
+        :type tmpdir: str
+        :param embedder_args: Additional keyword arguments passed to
+                              :py:class:`~cellmaps_ppi_embedding.runner.CellMapsPPIEmbedder`
+                              such as ``provenance`` or ``skip_logging``
+        :type embedder_args: dict
+        """
+        if outdir is None:
+            raise CellMapsPPIEmbeddingError('outdir is None')
+        unknown = set(grid.keys()).difference(HyperparameterSweep.WALK_PARAMS +
+                                              HyperparameterSweep.MODEL_PARAMS)
+        if len(unknown) > 0:
+            raise CellMapsPPIEmbeddingError('Unsupported sweep parameters: ' +
+                                            ', '.join(sorted(unknown)))
+        self._outdir = os.path.abspath(outdir)
+        self._csr_graph = csr_graph
+        self._grid = grid
+        self._inputdir = inputdir
+        self._walk_length = walk_length
+        self._num_walks = num_walks
+        if seed is None:
+            seed = random.randrange(2 ** 31)
+            logger.info('No seed set, using ' + str(seed))
+        self._seed = seed
+        self._workers = max(1, workers)
+        self._parallel_configs = max(1, min(parallel_configs, self._workers))
+        if walk_cache_dir is None:
+            walk_cache_dir = os.path.join(self._outdir, HyperparameterSweep.WALK_CACHE_DIR)
+        self._walk_cache_dir = walk_cache_dir
+        self._tmpdir = tmpdir
+        self._embedder_args = embedder_args if embedder_args is not None else {}
+        self._walk_seconds = {}
+
+    def get_seed(self):
+        """
+        Gets seed used by all configurations
+
+        :return: seed
+        :rtype: int
+        """
+        return self._seed
+
+    def get_summary_file(self):
+        """
+        Gets path to summary table
+
+        :return: path
+        :rtype: str
+        """
+        return os.path.join(self._outdir, HyperparameterSweep.SUMMARY_FILE)
+
+    def get_configs(self):
+        """
+        Gets every combination of values in grid ordered so
+        configurations sharing walks are adjacent
+
+        :return: configurations as dicts of parameter name to value
+        :rtype: list
+        """
+        defaults = {'p': Node2VecEmbeddingGenerator.P_DEFAULT,
+                    'q': Node2VecEmbeddingGenerator.Q_DEFAULT,
+                    'dimensions': Node2VecEmbeddingGenerator.DIMENSIONS,
+                    'window': Node2VecEmbeddingGenerator.WINDOW,
+                    'epochs': Node2VecEmbeddingGenerator.EPOCHS}
+        names = HyperparameterSweep.WALK_PARAMS + HyperparameterSweep.MODEL_PARAMS
+        values = [self._grid.get(name, [defaults[name]]) for name in names]
+        return [dict(zip(names, combo)) for combo in itertools.product(*values)]
+
+    @staticmethod
+    def get_config_name(config):
+        """
+        Gets name of configuration used for its output directory
+
+        :param config: configuration
+        :type config: dict
+        :return: name such as ``p1_q1_dimensions1024_window10_epochs1``
+        :rtype: str
+        """
+        return '_'.join(name + ('%g' % config[name] if isinstance(config[name], float)
+                                else str(config[name])) for name in
+                        HyperparameterSweep.WALK_PARAMS + HyperparameterSweep.MODEL_PARAMS)
+
+    def _get_generator(self, config, workers):
+        """
+        Creates generator for **config**
+
+        :param config: configuration
+        :type config: dict
+        :param workers: Number of workers for generator
+        :type workers: int
+        :return: generator
+        :rtype: :py:class:`~cellmaps_ppi_embedding.runner.Node2VecEmbeddingGenerator`
+        """
+        return Node2VecEmbeddingGenerator(csr_graph=self._csr_graph,
+                                          p=config['p'], q=config['q'],
+                                          dimensions=config['dimensions'],
+                                          window=config['window'],
+                                          epochs=config['epochs'],
+                                          walk_length=self._walk_length,
+                                          num_walks=self._num_walks,
+                                          seed=self._seed, workers=workers,
+                                          tmpdir=self._tmpdir,
+                                          walk_cache=WalkCache(self._walk_cache_dir,
+                                                               max_bytes=None),
+                                          compute_loss=True)
+
+    def _generate_walks(self, configs):
+        """
+        Generates walks, using all workers, for every distinct
+        combination of walk parameters in **configs**
+
+        :param configs: configurations
+        :type configs: list
+        """
+        for config in configs:
+            walk_key = tuple(config[name] for name in HyperparameterSweep.WALK_PARAMS)
+            if walk_key in self._walk_seconds:
+                continue
+            start = time.time()
+            self._get_generator(config, self._workers).cache_walks()
+            self._walk_seconds[walk_key] = time.time() - start
+            logger.info('Generated walks for p=' + str(config['p']) + ' q=' + str(config['q']) +
+                        ' in ' + str(round(self._walk_seconds[walk_key], 2)) + ' seconds')
+
+    def run_config(self, config):
+        """
+        Trains model for **config** and writes its output directory
+
+        :param config: configuration
+        :type config: dict
+        :return: row for summary table
+        :rtype: dict
+        """
+        name = HyperparameterSweep.get_config_name(config)
+        config_outdir = os.path.join(self._outdir, name)
+        row = {'config': name, 'outdir': config_outdir, 'error': ''}
+        row.update(config)
+        workers = max(1, self._workers // self._parallel_configs)
+        gen = self._get_generator(config, workers)
+        input_data_dict = dict(config)
+        input_data_dict.update({'outdir': config_outdir, 'inputdir': self._inputdir,
+                                'walk_length': self._walk_length, 'num_walks': self._num_walks,
+                                'seed': self._seed, 'workers': workers})
+        start = time.time()
+        try:
+            embedder = CellMapsPPIEmbedder(outdir=config_outdir, embedding_generator=gen,
+                                           inputdir=self._inputdir,
+                                           input_data_dict=input_data_dict,
+                                           **self._embedder_args)
+            row['status'] = embedder.run()
+        except Exception as e:
+            logger.exception('Configuration ' + name + ' failed')
+            row['status'] = 2
+            row['error'] = str(e)
+        row['run_seconds'] = round(time.time() - start, 3)
+        row['training_loss'] = gen.get_training_loss()
+        return row
+
+    def _write_summary(self, rows):
+        """
+        Writes summary table
+
+        :param rows: rows as returned by :py:meth:`run_config`
+        :type rows: list
+        """
+        with open(self.get_summary_file(), 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=HyperparameterSweep.SUMMARY_COLS,
+                                    delimiter='\t')
+            writer.writeheader()
+            for row in rows:
+                writer.writerow(row)
+
+    def run(self):
+        """
+        Generates walks and runs every configuration, then
+        writes summary table
+
+        :return: ``0`` if all configurations succeeded otherwise ``1``
+        :rtype: int
+        """
+        os.makedirs(self._outdir, exist_ok=True)
+        configs = self.get_configs()
+        logger.info('Running ' + str(len(configs)) + ' configurations with ' +
+                    str(self._parallel_configs) + ' at a time')
+        self._generate_walks(configs)
+
+        if self._parallel_configs == 1:
+            rows = [self.run_config(config) for config in configs]
+        else:
+            with ProcessPoolExecutor(max_workers=self._parallel_configs,
+                                     initializer=_init_sweep_worker,
+                                     initargs=(self,)) as pool:
+                rows = list(pool.map(_run_config_task, configs))
+
+        for row in rows:
+            walk_key = tuple(row[name] for name in HyperparameterSweep.WALK_PARAMS)
+            row['walk_seconds'] = round(self._walk_seconds[walk_key], 3)
+        self._write_summary(rows)
+        if all(row['status'] == 0 for row in rows):
+            return 0
+        return 1
@@ -0,0 +1,653 @@
+#! /usr/bin/env python
+
+import logging
+import multiprocessing
+from multiprocessing import shared_memory
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# walker used by worker processes, set by _init_walk_worker()
+_worker_walker = None
+_worker_shms = None
+
+
+def _to_shared_memory(arrays):
+    """
+    Copies **arrays** into shared memory blocks
+
+    :param arrays: arrays keyed by name
+    :type arrays: dict
+    :return: (shared memory blocks, specification of each array
+             keyed by name as tuple of block name, shape and dtype)
+    :rtype: tuple
+    """
+    shms = []
+    specs = {}
+    for name, arr in arrays.items():
+        shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+        shms.append(shm)
+        np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)[...] = arr
+        specs[name] = (shm.name, arr.shape, arr.dtype.str)
+    return shms, specs
+
+
+def _attach_shared_memory(specs):
+    """
+    Maps arrays created by :py:func:`_to_shared_memory` without copying them
+
+    :param specs: specification of arrays keyed by name
+    :type specs: dict
+    :return: (shared memory blocks, arrays keyed by name)
+    :rtype: tuple
+    """
+    shms = []
+    arrays = {}
+    for name, (shm_name, shape, dtype) in specs.items():
+        shm = shared_memory.SharedMemory(name=shm_name)
+        shms.append(shm)
+        arrays[name] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+    return shms, arrays
+
+
+def _init_walk_worker(specs, walker_params):
+    """
+    Initializer for walk worker processes that builds a
+    :py:class:`Node2VecWalker` on top of the shared graph arrays
+
+    :param specs: specification of shared arrays
+    :type specs: dict
+    :param walker_params: keyword arguments for :py:class:`Node2VecWalker`
+    :type walker_params: dict
+    """
+    global _worker_walker, _worker_shms
+    _worker_shms, arrays = _attach_shared_memory(specs)
+    _worker_walker = Node2VecWalker(arrays=arrays, **walker_params)
+
+
+def _walk_task(task):
+    """
+    Generates walks in a worker process
+
+    :param task: (ids of start nodes, :py:class:`numpy.random.SeedSequence`)
+    :type task: tuple
+    :return: walks
+    :rtype: :py:class:`numpy.ndarray`
+    """
+    start_nodes, seed_seq = task
+    return _worker_walker._walk_batch(start_nodes, np.random.default_rng(seed_seq))
+
+
+class Node2VecWalker(object):
+    """
+    Generates second order biased (node2vec) random walks over a
+    :py:class:`~cellmaps_ppi_embedding.graph.CSRGraph`.
+
+    Unlike the `node2vec <https://pypi.org/project/node2vec>`__ package
+    no transition probabilities are precomputed. Each step is drawn
+    by rejection sampling: a neighbor of the current node is proposed
+    and accepted with probability proportional to the node2vec bias
+    (``1/p`` to return to the previous node, ``1`` to stay near it and
+    ``1/q`` to move away). A whole batch of walkers is advanced at once
+    with NumPy, so memory use is ``O(edges)`` and the cost of a step
+    grows at most with the logarithm of the degree of the current node.
+
+    If all edges have the same weight neighbors are proposed uniformly.
+    Otherwise they are proposed in proportion to their edge weight with
+    a binary search of the cumulative edge weights, a single ``float64``
+    array over all edges. Unlike accepting uniform proposals in
+    proportion to their weight, this does not slow down when a few edges
+    of a node carry most of its weight.
+
+    Nodes with at most **degree_threshold** neighbors instead take
+    exact steps: for every edge into such a node the normalized
+    transition probabilities are precomputed, so steps from it never
+    need to be rejected. Tables hold at most ``degree_threshold``
+    entries per edge, so hubs, whose tables would grow with the square
+    of their degree, always use rejection sampling.
+    :py:meth:`get_stats` reports how many nodes use each path.
+
+    Walks are returned as :py:class:`numpy.ndarray` of node ids with
+    shape ``(number of walks, walk_length)``. Walks that end early,
+    at nodes without neighbors or whose edges all have a weight
+    of ``0``, are padded with :py:const:`PAD`
+    """
+    PAD = -1
+    BATCH_SIZE = 4096
+    DEGREE_THRESHOLD = 16
+
+    def __init__(self, csr_graph=None, p=1, q=1, walk_length=80,
+                 batch_size=BATCH_SIZE, arrays=None,
+                 degree_threshold=DEGREE_THRESHOLD):
+        """
+        Constructor
+
+        :param csr_graph: Graph to walk
+        :type csr_graph: :py:class:`~cellmaps_ppi_embedding.graph.CSRGraph`
+        :param p: Return parameter, likelihood of immediately
+                  revisiting previous node is ``1/p``
+        :type p: float
+        :param q: In-out parameter, likelihood of moving away
+                  from previous node is ``1/q``
+        :type q: float
+        :param walk_length: Number of nodes in each walk
+        :type walk_length: int
+        :param batch_size: Number of walks generated at once
+        :type batch_size: int
+        :param arrays: Arrays returned by :py:meth:`get_arrays` of another
+                       walker, with the same **p**, **q** and **degree_threshold**,
+                       used instead of **csr_graph** so worker processes can share them
+        :type arrays: dict
+        :param degree_threshold: Nodes with at most this many neighbors
+                                 take exact steps from precomputed tables,
+                                 ``0`` uses rejection sampling for all nodes
+        :type degree_threshold: int
+        """
+        self._p = p
+        self._q = q
+        self._inv_p = 1.0 / p
+        self._inv_q = 1.0 / q
+        if arrays is None:
+            arrays = Node2VecWalker._build_arrays(csr_graph)
+            arrays.update(self._build_tables(arrays, degree_threshold))
+        self._arrays = arrays
+        self._indptr = arrays['indptr']
+        self._indices = arrays['indices']
+        self._weights = arrays['weights']
+        self._max_weights = arrays['max_weights']
+        self._cum_weights = arrays.get('cum_weights')
+        self._edge_keys = arrays['edge_keys']
+        self._table_ptr = arrays.get('table_ptr')
+        self._table_cum = arrays.get('table_cum')
+        self._degrees = np.diff(self._indptr)
+        self._num_nodes = len(self._indptr) - 1
+        self._degree_threshold = degree_threshold
+        self._max_alpha = max(self._inv_p, 1.0, self._inv_q)
+        self._walk_length = walk_length
+        self._batch_size = batch_size
+
+    @staticmethod
+    def _build_arrays(csr_graph):
+        """
+        Builds arrays needed to walk **csr_graph**
+
+        :param csr_graph: Graph to walk
+        :type csr_graph: :py:class:`~cellmaps_ppi_embedding.graph.CSRGraph`
+        :return: arrays keyed by name
+        :rtype: dict
+        """
+        indptr = csr_graph.get_indptr()
+        indices = csr_graph.get_indices()
+        weights = csr_graph.get_weights()
+        degrees = csr_graph.get_degrees()
+        num_nodes = csr_graph.get_num_nodes()
+
+        # largest edge weight of each node, bounds the acceptance ratio
+        max_weights = np.zeros(num_nodes, dtype=np.float32)
+        has_edges = degrees > 0
+        if np.any(has_edges):
+            max_weights[has_edges] = np.maximum.reduceat(weights, indptr[:-1][has_edges])
+
+        # sorted source * N + target keys, used to check if two
+        # nodes are adjacent with a binary search
+        edge_keys = np.repeat(np.arange(num_nodes, dtype=np.int64), degrees) * num_nodes + indices
+        arrays = {'indptr': indptr,
+                  'indices': indices,
+                  'weights': weights,
+                  'max_weights': max_weights,
+                  'edge_keys': edge_keys}
+
+        if len(weights) > 0 and np.any(weights != weights[0]):
+            # running total of edge weights, neighbors of a node are
+            # drawn in proportion to weight by searching its slice
+            cum_weights = np.empty(len(weights) + 1, dtype=np.float64)
+            cum_weights[0] = 0.0
+            np.cumsum(weights, dtype=np.float64, out=cum_weights[1:])
+            arrays['cum_weights'] = cum_weights
+        return arrays
+
+    def _build_tables(self, arrays, degree_threshold):
+        """
+        Builds exact transition tables for edges into nodes with
+        at most **degree_threshold** neighbors. For edge ``u -> v``
+        the table holds, for each neighbor ``x`` of ``v``, the
+        probability of moving ``u -> v -> x`` accumulated over all
+        tables, so the entries of each table span ``1``
+
+        :param arrays: arrays returned by :py:meth:`_build_arrays`
+        :type arrays: dict
+        :param degree_threshold: largest degree with a table
+        :type degree_threshold: int
+        :return: ``table_ptr``, offsets of each edge's table into
+                 ``table_cum`` of length ``edges + 1``, and ``table_cum``
+                 or empty dict if no node qualifies
+        :rtype: dict
+        """
+        indptr = arrays['indptr']
+        indices = arrays['indices']
+        weights = arrays['weights']
+        degrees = np.diff(indptr)
+        if degree_threshold is None or degree_threshold <= 0:
+            return {}
+        # only nodes a walker can move from get tables
+        small = (degrees <= degree_threshold) & (arrays['max_weights'] > 0)
+        table_sizes = np.where(small[indices], degrees[indices], 0)
+        if not np.any(table_sizes):
+            return {}
+        table_ptr = np.zeros(len(indices) + 1, dtype=np.int64)
+        np.cumsum(table_sizes, out=table_ptr[1:])
+
+        # for every table entry of edge u -> v get u and offset of v -> x
+        edges = np.flatnonzero(table_sizes)
+        sizes = table_sizes[edges]
+        num_entries = int(table_ptr[-1])
+        entry_edges = np.repeat(edges, sizes)
+        within = np.arange(num_entries, dtype=np.int64) - np.repeat(table_ptr[edges], sizes)
+        src = np.repeat(np.repeat(np.arange(len(degrees), dtype=np.int64), degrees)[edges], sizes)
+        offsets = indptr[indices[entry_edges]] + within
+        dst = indices[offsets]
+
+        alpha = np.full(num_entries, self._inv_q)
+        alpha[self._is_edge_keys(arrays['edge_keys'], len(degrees), src, dst)] = 1.0
+        alpha[dst == src] = self._inv_p
+        probs = weights[offsets] * alpha
+        probs /= np.repeat(np.add.reduceat(probs, table_ptr[edges]), sizes)
+        table_cum = np.empty(num_entries + 1, dtype=np.float64)
+        table_cum[0] = 0.0
+        np.cumsum(probs, out=table_cum[1:])
+        return {'table_ptr': table_ptr, 'table_cum': table_cum}
+
+    def get_stats(self):
+        """
+        Gets how many nodes take exact steps from precomputed
+        tables and how many use rejection sampling
+
+        :return: ``degree_threshold``, ``max_degree``, ``exact_nodes``
+                 with degree of at least ``1`` up to ``degree_threshold``,
+                 ``rejection_nodes`` with more neighbors, ``dead_end_nodes``
+                 that cannot be left and ``table_entries``
+        :rtype: dict
+        """
+        can_leave = self._max_weights > 0
+        if self._table_ptr is None:
+            exact = np.zeros(self._num_nodes, dtype=bool)
+            table_entries = 0
+        else:
+            exact = can_leave & (self._degrees <= self._degree_threshold)
+            table_entries = int(self._table_ptr[-1])
+        return {'degree_threshold': self._degree_threshold,
+                'max_degree': int(self._degrees.max()) if self._num_nodes > 0 else 0,
+                'exact_nodes': int(np.count_nonzero(exact)),
+                'rejection_nodes': int(np.count_nonzero(can_leave & ~exact)),
+                'dead_end_nodes': int(np.count_nonzero(~can_leave)),
+                'table_entries': table_entries}
+
+    def is_weighted(self):
+        """
+        Gets whether neighbors are proposed in proportion to edge weight
+
+        :return: ``True`` if edge weights differ
+        :rtype: bool
+        """
+        return self._cum_weights is not None
+
+    def get_arrays(self):
+        """
+        Gets arrays this walker operates on
+
+        :return: arrays keyed by name
+        :rtype: dict
+        """
+        return self._arrays
+
+    def get_walk_length(self):
+        """
+        Gets number of nodes in each walk
+
+        :return: walk length
+        :rtype: int
+        """
+        return self._walk_length
+
+    def _is_edge(self, src, dst):
+        """
+        Checks if there is an edge between pairs of nodes
+
+        :param src: ids of first nodes
+        :type src: :py:class:`numpy.ndarray`
+        :param dst: ids of second nodes
+        :type dst: :py:class:`numpy.ndarray`
+        :return: ``True`` for each pair with an edge
+        :rtype: :py:class:`numpy.ndarray`
+        """
+        return Node2VecWalker._is_edge_keys(self._edge_keys, self._num_nodes, src, dst)
+
+    @staticmethod
+    def _is_edge_keys(edge_keys, num_nodes, src, dst):
+        """
+        Checks if there is an edge between pairs of nodes
+
+        :param edge_keys: sorted ``source * num_nodes + target`` keys of all edges
+        :type edge_keys: :py:class:`numpy.ndarray`
+        :param num_nodes: number of nodes
+        :type num_nodes: int
+        :param src: ids of first nodes
+        :type src: :py:class:`numpy.ndarray`
+        :param dst: ids of second nodes
+        :type dst: :py:class:`numpy.ndarray`
+        :return: ``True`` for each pair with an edge
+        :rtype: :py:class:`numpy.ndarray`
+        """
+        keys = src.astype(np.int64) * num_nodes + dst
+        pos = np.searchsorted(edge_keys, keys)
+        pos[pos == len(edge_keys)] = 0
+        return edge_keys[pos] == keys
+
+    def _propose_weighted(self, cur, rng):
+        """
+        Proposes a neighbor of each of the **cur** nodes with
+        probability proportional to edge weight
+
+        :param cur: ids of current nodes
+        :type cur: :py:class:`numpy.ndarray`
+        :param rng: random number generator
+        :type rng: :py:class:`numpy.random.Generator`
+        :return: offsets of proposed edges into the adjacency
+        :rtype: :py:class:`numpy.ndarray`
+        """
+        row_start = self._cum_weights[self._indptr[cur]]
+        row_end = self._cum_weights[self._indptr[cur + 1]]
+        targets = row_start + rng.random(len(cur)) * (row_end - row_start)
+        offsets = np.searchsorted(self._cum_weights, targets, side='right') - 1
+        # guard against rounding putting target on a row boundary
+        return np.clip(offsets, self._indptr[cur], self._indptr[cur + 1] - 1)
+
+    def _step(self, cur, prev, prev_offsets, rng):
+        """
+        Picks next node for walkers at **cur** nodes that
+        arrived from **prev** nodes
+
+        :param cur: ids of current nodes
+        :type cur: :py:class:`numpy.ndarray`
+        :param prev: ids of previous nodes or ``None`` for the
+                     first step of the walks
+        :type prev: :py:class:`numpy.ndarray`
+        :param prev_offsets: offsets into the adjacency of the edges
+                             from **prev** to **cur** or ``None`` for
+                             the first step of the walks
+        :type prev_offsets: :py:class:`numpy.ndarray`
+        :param rng: random number generator
+        :type rng: :py:class:`numpy.random.Generator`
+        :return: (ids of next nodes, offsets into the adjacency of
+                 the edges taken), with :py:const:`PAD` and ``-1`` for
+                 walkers at nodes that cannot be left
+        :rtype: tuple
+        """
+        next_nodes = np.full(len(cur), Node2VecWalker.PAD, dtype=np.int32)
+        next_offsets = np.full(len(cur), -1, dtype=np.int64)
+        # walkers at nodes whose edges all have a weight of 0 would
+        # never accept a proposal so their walks end here
+        pending = np.flatnonzero(self._max_weights[cur] > 0)
+        if prev_offsets is not None and self._table_ptr is not None:
+            table_start = self._table_ptr[prev_offsets]
+            table_end = self._table_ptr[prev_offsets + 1]
+            exact = np.flatnonzero(table_end > table_start)
+            if len(exact) > 0:
+                start = table_start[exact]
+                sizes = table_end[exact] - start
+                low = self._table_cum[start]
+                targets = low + rng.random(len(exact)) * (self._table_cum[start + sizes] - low)
+                # tables are short so a scan, which reads each table
+                # in order, is faster than a binary search of all tables
+                entries = np.zeros(len(exact), dtype=np.int64)
+                for k in range(1, int(sizes.max())):
+                    entries += (k < sizes) & (self._table_cum[np.minimum(start + k, table_end[exact])]
+                                              <= targets)
+                offsets = self._indptr[cur[exact]] + entries
+                next_nodes[exact] = self._indices[offsets]
+                next_offsets[exact] = offsets
+                pending = pending[table_end[pending] == table_start[pending]]
+        while len(pending) > 0:
+            p_cur = cur[pending]
+            if self._cum_weights is None:
+                offsets = self._indptr[p_cur] + (rng.random(len(pending)) *
+                                                 self._degrees[p_cur]).astype(np.int64)
+                accept_prob = self._weights[offsets] / self._max_weights[p_cur]
+            else:
+                offsets = self._propose_weighted(p_cur, rng)
+                accept_prob = np.ones(len(pending))
+            candidates = self._indices[offsets]
+            if prev is not None:
+                p_prev = prev[pending]
+                alpha = np.full(len(pending), self._inv_q)
+                alpha[self._is_edge(p_prev, candidates)] = 1.0
+                alpha[candidates == p_prev] = self._inv_p
+                accept_prob *= alpha / self._max_alpha
+            accepted = rng.random(len(pending)) < accept_prob
+            next_nodes[pending[accepted]] = candidates[accepted]
+            next_offsets[pending[accepted]] = offsets[accepted]
+            pending = pending[~accepted]
+        return next_nodes, next_offsets
+
+    def _walk_batch(self, start_nodes, rng):
+        """
+        Generates one walk from each of the **start_nodes**
+
+        :param start_nodes: ids of nodes to start walks from
+        :type start_nodes: :py:class:`numpy.ndarray`
+        :param rng: random number generator
+        :type rng: :py:class:`numpy.random.Generator`
+        :return: walks
+        :rtype: :py:class:`numpy.ndarray`
+        """
+        walks = np.full((len(start_nodes), self._walk_length), Node2VecWalker.PAD,
+                        dtype=np.int32)
+        walks[:, 0] = start_nodes
+        if self._walk_length < 2:
+            return walks
+
+        # nodes without neighbors, or whose edges all have
+        # a weight of 0, are dead ends
+        active = np.flatnonzero(self._max_weights[start_nodes] > 0)
+        if len(active) == 0:
+            return walks
+
+        # first step only depends on edge weights
+        walks[active, 1], offsets = self._step(walks[active, 0], None, None, rng)
+        for step in range(2, self._walk_length):
+            # walks that reached a dead end stop there
+            moved = walks[active, step - 1] != Node2VecWalker.PAD
+            if not np.all(moved):
+                active = active[moved]
+                offsets = offsets[moved]
+                if len(active) == 0:
+                    break
+            walks[active, step], offsets = self._step(walks[active, step - 1],
+                                                      walks[active, step - 2], offsets, rng)
+        return walks
+
+    def _get_tasks(self, num_walks, seed, nodes):
+        """
+        Generator that splits walk generation into batches of start
+        nodes, each with its own seed derived from **seed**, so the
+        walks do not depend on how many processes generate them
+
+        :return: (ids of start nodes, :py:class:`numpy.random.SeedSequence`)
+        :rtype: tuple
+        """
+        seed_seq = np.random.SeedSequence(seed)
+        rng = np.random.default_rng(seed_seq.spawn(1)[0])
+        if nodes is None:
+            nodes = np.arange(self._num_nodes, dtype=np.int32)
+        for walk_round in range(num_walks):
+            logger.debug('Generating walk round ' + str(walk_round + 1) +
+                         ' of ' + str(num_walks))
+            shuffled = rng.permutation(nodes)
+            for batch_num, start in enumerate(range(0, len(shuffled), self._batch_size)):
+                yield (shuffled[start:start + self._batch_size],
+                       np.random.SeedSequence(seed_seq.entropy,
+                                              spawn_key=(1, walk_round, batch_num)))
+
+    def generate_walks(self, num_walks, seed=None, nodes=None, workers=1):
+        """
+        Generator that yields batches of walks. For each of
+        **num_walks** rounds, every node in **nodes** is the
+        start of one walk, and nodes are visited in a new
+        random order every round.
+
+        If **workers** is greater than ``1``, batches are generated
+        by a pool of processes that share the graph arrays through
+        :py:mod:`multiprocessing.shared_memory` instead of each
+        receiving a copy. Batches are yielded in the same order,
+        with the same walks, regardless of **workers**
+
+        :param num_walks: Number of walks to start from each node
+        :type num_walks: int
+        :param seed: Seed for random number generator
+        :type seed: int
+        :param nodes: ids of nodes to start walks from, if ``None``
+                      all nodes in the graph are used
+        :type nodes: :py:class:`numpy.ndarray`
+        :param workers: Number of processes generating walks
+        :type workers: int
+        :return: batch of walks
+        :rtype: :py:class:`numpy.ndarray`
+        """
+        tasks = self._get_tasks(num_walks, seed, nodes)
+        if workers is None or workers <= 1:
+            for start_nodes, seed_seq in tasks:
+                yield self._walk_batch(start_nodes, np.random.default_rng(seed_seq))
+            return
+
+        shms, specs = _to_shared_memory(self._arrays)
+        try:
+            walker_params = {'p': self._p, 'q': self._q,
+                             'walk_length': self._walk_length,
+                             'batch_size': self._batch_size,
+                             'degree_threshold': self._degree_threshold}
+            with multiprocessing.Pool(workers, initializer=_init_walk_worker,
+                                      initargs=(specs, walker_params)) as pool:
+                for walks in pool.imap(_walk_task, tasks):
+                    yield walks
+        finally:
+            for shm in shms:
+                shm.close()
+                shm.unlink()
+
+
+class WalkCorpus(object):
+    """
+    Restartable iterable over walks spooled to disk as a
+    ``.npy`` matrix of ``int32`` node ids, one walk per row.
+
+    Walks are read back through a memory map in small chunks, so
+    only the chunk being consumed is held in memory no matter how
+    many walks were generated. Unless **node_names** is set, walks
+    are yielded as lists of ``int`` node ids rather than names so no
+    strings are created or hashed for each step; the vocabulary of
+    :py:class:`gensim.models.Word2Vec` is then node ids, built with
+    ``build_vocab_from_freq()`` from :py:meth:`get_counts`. Suitable as
+    ``corpus_iterable`` for :py:class:`gensim.models.Word2Vec` which
+    iterates the corpus once per epoch
+    """
+    CHUNK_SIZE = 10000
+
+    def __init__(self, walk_file, node_names=None):
+        """
+        Constructor
+
+        :param walk_file: Path to ``.npy`` file of walks
+        :type walk_file: str
+        :param node_names: If set, names of nodes indexed by node id which
+                           walks are translated to
+        :type node_names: list
+        """
+        self._walk_file = walk_file
+        self._node_names = node_names
+
+    def get_walk_file(self):
+        """
+        Gets path to file containing walks
+
+        :return: path to walk file
+        :rtype: str
+        """
+        return self._walk_file
+
+    def get_walks(self):
+        """
+        Gets walks as a read only memory mapped array
+
+        :return: walks
+        :rtype: :py:class:`numpy.ndarray`
+        """
+        return np.load(self._walk_file, mmap_mode='r')
+
+    def __len__(self):
+        """
+        Gets number of walks
+
+        :return: number of walks
+        :rtype: int
+        """
+        return self.get_walks().shape[0]
+
+    def __iter__(self):
+        """
+        Iterates over walks
+
+        :return: walk as list of node ids, or node names if set
+        :rtype: list
+        """
+        names = self._node_names
+        walks = self.get_walks()
+        for start in range(0, walks.shape[0], WalkCorpus.CHUNK_SIZE):
+            for walk in walks[start:start + WalkCorpus.CHUNK_SIZE].tolist():
+                if names is not None:
+                    yield [names[x] for x in walk if x != Node2VecWalker.PAD]
+                elif walk[-1] == Node2VecWalker.PAD:
+                    yield [x for x in walk if x != Node2VecWalker.PAD]
+                else:
+                    yield walk
+
+    def get_counts(self, num_nodes):
+        """
+        Counts how many times each node appears in the walks
+
+        :param num_nodes: number of nodes in network walked
+        :type num_nodes: int
+        :return: ``int64`` count of each node indexed by node id
+        :rtype: :py:class:`numpy.ndarray`
+        """
+        counts = np.zeros(num_nodes + 1, dtype=np.int64)
+        walks = self.get_walks()
+        for start in range(0, walks.shape[0], WalkCorpus.CHUNK_SIZE):
+            # shift by one so PAD is counted at index 0
+            counts += np.bincount(walks[start:start + WalkCorpus.CHUNK_SIZE].ravel() + 1,
+                                  minlength=num_nodes + 1)
+        return counts[1:]
+
+    @staticmethod
+    def write_walks(walk_file, walk_batches, num_walks, walk_length):
+        """
+        Writes batches of walks to **walk_file** as they are generated
+
+        :param walk_file: Path to ``.npy`` file to write
+        :type walk_file: str
+        :param walk_batches: batches of walks as returned by
+                             :py:meth:`Node2VecWalker.generate_walks`
+        :type walk_batches: iterable
+        :param num_walks: Total number of walks in **walk_batches**
+        :type num_walks: int
+        :param walk_length: Number of nodes in each walk
+        :type walk_length: int
+        """
+        walks = np.lib.format.open_memmap(walk_file, mode='w+', dtype=np.int32,
+                                          shape=(num_walks, walk_length))
+        row = 0
+        for batch in walk_batches:
+            walks[row:row + batch.shape[0]] = batch
+            row += batch.shape[0]
+        walks.flush()
+        del walks
@@ -0,0 +1,439 @@
+#! /usr/bin/env python
+
+import os
+import gzip
+import importlib.util
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from cellmaps_utils import constants
+
+from cellmaps_ppi_embedding.exceptions import CellMapsPPIEmbeddingError
+
+logger = logging.getLogger(__name__)
+
+# pyarrow and h5py are only imported by the writers that need
+# them since importing them slows down starting the command line tool
+PYARROW_LOADED = importlib.util.find_spec('pyarrow') is not None
+if not PYARROW_LOADED:
+    logger.debug('Unable to find pyarrow. Writing embeddings '
+                 'in parquet format will not work')
+
+H5PY_LOADED = importlib.util.find_spec('h5py') is not None
+if not H5PY_LOADED:
+    logger.debug('Unable to find h5py. Writing embeddings '
+                 'in hdf5 format will not work')
+
+
+TSV_FORMAT = 'tsv'
+NPY_FORMAT = 'npy'
+PARQUET_FORMAT = 'parquet'
+HDF5_FORMAT = 'hdf5'
+
+OUTPUT_FORMATS = [TSV_FORMAT, NPY_FORMAT, PARQUET_FORMAT, HDF5_FORMAT]
+"""
+Output formats supported by :py:func:`get_embedding_writer`
+"""
+
+
+class EmbeddingWriter(object):
+    """
+    Base class for implementations that write embeddings,
+    passed in as blocks of rows, to files in an output directory
+    """
+
+    def __init__(self, outdir, dimensions):
+        """
+        Constructor
+
+        :param outdir: directory where embeddings will be written
+        :type outdir: str
+        :param dimensions: length of each embedding vector
+        :type dimensions: int
+        """
+        self._outdir = outdir
+        self._dimensions = dimensions
+        self._num_rows = 0
+
+    def get_embedding_file_prefix(self):
+        """
+        Gets path to embedding file without extension
+
+        :return: path prefix
+        :rtype: str
+        """
+        return os.path.join(self._outdir,
+                            os.path.splitext(constants.PPI_EMBEDDING_FILE)[0])
+
+    def get_output_files(self):
+        """
+        Gets files created by this writer
+
+        :raises: NotImplementedError: Subclasses should implement this
+        :return: list of (path to file, data format) tuples
+        :rtype: list
+        """
+        raise NotImplementedError('Subclasses should implement')
+
+    def get_num_rows(self):
+        """
+        Gets number of embeddings written so far
+
+        :return: number of embeddings
+        :rtype: int
+        """
+        return self._num_rows
+
+    def add_embeddings(self, ids, embeddings):
+        """
+        Writes block of embeddings
+
+        :param ids: id of each embedding
+        :type ids: list
+        :param embeddings: embeddings, one row per id
+        :type embeddings: :py:class:`numpy.ndarray`
+        """
+        self._write(ids, np.asarray(embeddings, dtype=np.float32))
+        self._num_rows += len(ids)
+
+    def _write(self, ids, embeddings):
+        """
+        Writes block of embeddings
+
+        :raises: NotImplementedError: Subclasses should implement this
+        """
+        raise NotImplementedError('Subclasses should implement')
+
+    def close(self):
+        """
+        Finishes writing and closes any open files
+        """
+        pass
+
+
+class TSVEmbeddingWriter(EmbeddingWriter):
+    """
+    Writes embeddings to :py:const:`~cellmaps_utils.constants.PPI_EMBEDDING_FILE`
+    in the layout written by :py:class:`csv.writer`: a header of
+    ``id`` followed by column numbers, then one row per id, tab
+    delimited with ``\\r\\n`` line endings.
+
+    Each block of embeddings is formatted with a single ``%``
+    operation over the whole block instead of one call per value.
+    With the default **float_format** of ``%r`` the output is byte
+    for byte what :py:class:`csv.writer` produces; a format such as
+    ``%.6g`` gives a smaller file and is faster to write.
+
+    If **compress** is ``True`` output is gzip compressed to
+    :py:const:`~cellmaps_utils.constants.PPI_EMBEDDING_FILE` ``.gz``.
+    Blocks are compressed in parallel by **workers** threads into
+    separate gzip members which are written in order; the result is
+    a valid gzip file readable by ``gzip``, ``zcat`` or pandas
+    """
+    DEFAULT_FLOAT_FORMAT = '%r'
+    GZIP_SUFFIX = '.gz'
+    COMPRESS_LEVEL = 6
+
+    def __init__(self, outdir, dimensions, float_format=DEFAULT_FLOAT_FORMAT,
+                 compress=False, workers=1):
+        """
+        Constructor
+
+        :param float_format: printf style format for embedding values,
+                             for example ``%.6g``
+        :type float_format: str
+        :param compress: If ``True`` gzip compress output
+        :type compress: bool
+        :param workers: Number of threads compressing output
+        :type workers: int
+        """
+        super().__init__(outdir, dimensions)
+        if float_format is None:
+            float_format = TSVEmbeddingWriter.DEFAULT_FLOAT_FORMAT
+        try:
+            float_format % 1.0
+        except (TypeError, ValueError) as e:
+            raise CellMapsPPIEmbeddingError('Invalid float format ' + str(float_format) +
+                                            ' : ' + str(e))
+        self._row_format = ('\t' + float_format) * dimensions + '\r\n'
+        self._compress = compress
+        self._tsv_file = os.path.join(outdir, constants.PPI_EMBEDDING_FILE)
+        if compress:
+            self._tsv_file += TSVEmbeddingWriter.GZIP_SUFFIX
+        self._workers = max(1, workers if workers is not None else 1)
+        self._executor = None
+        self._pending = deque()
+        if compress and self._workers > 1:
+            self._executor = ThreadPoolExecutor(max_workers=self._workers)
+        self._out = open(self._tsv_file, 'wb')
+
+        header_line = ['id']
+        header_line.extend([str(x) for x in range(dimensions)])
+        self._write_bytes(('\t'.join(header_line) + '\r\n').encode('utf-8'))
+
+    def get_output_files(self):
+        """
+        Gets files created by this writer
+
+        :return: list of (path to file, data format) tuples
+        :rtype: list
+        """
+        if self._compress:
+            return [(self._tsv_file, TSV_FORMAT + TSVEmbeddingWriter.GZIP_SUFFIX)]
+        return [(self._tsv_file, TSV_FORMAT)]
+
+    @staticmethod
+    def _quote_id(node_id):
+        """
+        Quotes **node_id** the way :py:class:`csv.writer` does if
+        it contains a delimiter, quote or newline
+
+        :param node_id: id to quote
+        :type node_id: str
+        :return: possibly quoted id
+        :rtype: str
+        """
+        node_id = str(node_id)
+        if '\t' in node_id or '"' in node_id or '\n' in node_id or '\r' in node_id:
+            return '"' + node_id.replace('"', '""') + '"'
+        return node_id
+
+    def _write_bytes(self, data):
+        """
+        Writes **data**, compressing it first if needed
+
+        :param data: data to write
+        :type data: bytes
+        """
+        if not self._compress:
+            self._out.write(data)
+        elif self._executor is None:
+            self._out.write(gzip.compress(data, compresslevel=TSVEmbeddingWriter.COMPRESS_LEVEL))
+        else:
+            # zlib releases the GIL so blocks compress in parallel,
+            # limit queued blocks to bound memory
+            self._pending.append(self._executor.submit(gzip.compress, data,
+                                                       TSVEmbeddingWriter.COMPRESS_LEVEL))
+            while len(self._pending) > self._workers * 2:
+                self._out.write(self._pending.popleft().result())
+
+    def _write(self, ids, embeddings):
+        """
+        Formats block of embeddings with a single ``%`` operation
+        and writes it
+        """
+        args = np.empty((len(ids), self._dimensions + 1), dtype=object)
+        args[:, 0] = [TSVEmbeddingWriter._quote_id(x) for x in ids]
+        # float64 so values format like the python floats csv.writer received
+        args[:, 1:] = embeddings.astype(np.float64)
+        block = (('%s' + self._row_format) * len(ids)) % tuple(args.ravel().tolist())
+        self._write_bytes(block.encode('utf-8'))
+
+    def close(self):
+        """
+        Writes remaining compressed blocks and closes file
+        """
+        try:
+            while len(self._pending) > 0:
+                self._out.write(self._pending.popleft().result())
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown()
+            self._out.close()
+
+
+class NPYEmbeddingWriter(EmbeddingWriter):
+    """
+    Writes embeddings as a ``float32`` ``.npy`` matrix that
+    can be loaded with ``numpy.load(..., mmap_mode='r')`` along
+    with a text file listing the id of each row.
+
+    Blocks are appended to the ``.npy`` file as they arrive and
+    the header, which holds the number of rows, is rewritten by
+    :py:meth:`close`
+    """
+    MAGIC = b'\x93NUMPY\x01\x00'
+    HEADER_LEN = 118
+    """
+    Header length, leaves room for any shape and with the 10 byte
+    preamble keeps the data 64 byte aligned as the format requires
+    """
+
+    def __init__(self, outdir, dimensions):
+        """
+        Constructor
+        """
+        super().__init__(outdir, dimensions)
+        self._npy_file = self.get_embedding_file_prefix() + '.npy'
+        self._ids_file = self.get_embedding_file_prefix() + '_ids.txt'
+        self._npy = open(self._npy_file, 'wb')
+        self._write_header()
+        self._ids = open(self._ids_file, 'w')
+
+    def _write_header(self):
+        """
+        Writes ``.npy`` header for the rows written so far
+        at the start of the file
+        """
+        header = ("{'descr': '<f4', 'fortran_order': False, 'shape': (" +
+                  str(self._num_rows) + ', ' + str(self._dimensions) + '), }')
+        header = header.ljust(NPYEmbeddingWriter.HEADER_LEN - 1) + '\n'
+        self._npy.seek(0)
+        self._npy.write(NPYEmbeddingWriter.MAGIC)
+        self._npy.write(np.uint16(NPYEmbeddingWriter.HEADER_LEN).tobytes())
+        self._npy.write(header.encode('latin1'))
+
+    def get_output_files(self):
+        """
+        Gets files created by this writer
+
+        :return: list of (path to file, data format) tuples
+        :rtype: list
+        """
+        return [(self._npy_file, NPY_FORMAT), (self._ids_file, 'txt')]
+
+    def _write(self, ids, embeddings):
+        """
+        Appends block of embeddings
+        """
+        self._npy.write(embeddings.astype('<f4', copy=False).tobytes())
+        self._ids.write(''.join([str(x) + '\n' for x in ids]))
+
+    def close(self):
+        """
+        Writes final header and closes files
+        """
+        self._write_header()
+        self._npy.close()
+        self._ids.close()
+
+
+class ParquetEmbeddingWriter(EmbeddingWriter):
+    """
+    Writes embeddings to a parquet file with an ``id`` column
+    followed by one ``float32`` column per dimension named
+    ``0`` to ``dimensions - 1``. Requires
+    `pyarrow <https://pypi.org/project/pyarrow>`__
+    """
+
+    def __init__(self, outdir, dimensions):
+        """
+        Constructor
+
+        :raises CellMapsPPIEmbeddingError: If pyarrow is not installed
+        """
+        super().__init__(outdir, dimensions)
+        if not PYARROW_LOADED:
+            raise CellMapsPPIEmbeddingError('pyarrow is required to write '
+                                            'embeddings in ' + PARQUET_FORMAT + ' format')
+        import pyarrow
+        import pyarrow.parquet
+        self._parquet_file = self.get_embedding_file_prefix() + '.parquet'
+        fields = [pyarrow.field('id', pyarrow.string())]
+        fields.extend([pyarrow.field(str(x), pyarrow.float32()) for x in range(dimensions)])
+        self._schema = pyarrow.schema(fields)
+        self._writer = pyarrow.parquet.ParquetWriter(self._parquet_file, self._schema)
+
+    def get_output_files(self):
+        """
+        Gets files created by this writer
+
+        :return: list of (path to file, data format) tuples
+        :rtype: list
+        """
+        return [(self._parquet_file, PARQUET_FORMAT)]
+
+    def _write(self, ids, embeddings):
+        """
+        Writes block of embeddings as a row group
+        """
+        import pyarrow
+        columns = [pyarrow.array([str(x) for x in ids], type=pyarrow.string())]
+        columns.extend([pyarrow.array(embeddings[:, x]) for x in range(self._dimensions)])
+        self._writer.write_table(pyarrow.Table.from_arrays(columns, schema=self._schema))
+
+    def close(self):
+        """
+        Closes parquet file
+        """
+        self._writer.close()
+
+
+class HDF5EmbeddingWriter(EmbeddingWriter):
+    """
+    Writes embeddings to an HDF5 file with a ``float32``
+    ``embeddings`` dataset and an ``ids`` dataset holding the id of
+    each row. Requires `h5py <https://pypi.org/project/h5py>`__
+    """
+
+    def __init__(self, outdir, dimensions):
+        """
+        Constructor
+
+        :raises CellMapsPPIEmbeddingError: If h5py is not installed
+        """
+        super().__init__(outdir, dimensions)
+        if not H5PY_LOADED:
+            raise CellMapsPPIEmbeddingError('h5py is required to write '
+                                            'embeddings in ' + HDF5_FORMAT + ' format')
+        import h5py
+        self._hdf5_file = self.get_embedding_file_prefix() + '.h5'
+        self._h5 = h5py.File(self._hdf5_file, 'w')
+        self._embeddings = self._h5.create_dataset('embeddings', shape=(0, dimensions),
+                                                   maxshape=(None, dimensions),
+                                                   dtype='f4',
+                                                   chunks=(max(1, min(1024, 262144 // max(dimensions, 1))),
+                                                           dimensions))
+        self._ids = self._h5.create_dataset('ids', shape=(0,), maxshape=(None,),
+                                            dtype=h5py.string_dtype(), chunks=(1024,))
+
+    def get_output_files(self):
+        """
+        Gets files created by this writer
+
+        :return: list of (path to file, data format) tuples
+        :rtype: list
+        """
+        return [(self._hdf5_file, HDF5_FORMAT)]
+
+    def _write(self, ids, embeddings):
+        """
+        Appends block of embeddings to datasets
+        """
+        start = self._num_rows
+        end = start + len(ids)
+        self._embeddings.resize(end, axis=0)
+        self._embeddings[start:end] = embeddings
+        self._ids.resize(end, axis=0)
+        self._ids[start:end] = [str(x) for x in ids]
+
+    def close(self):
+        """
+        Closes HDF5 file
+        """
+        self._h5.close()
+
+
+def get_embedding_writer(output_format, outdir, dimensions):
+    """
+    Gets writer for binary **output_format**
+
+    :param output_format: One of :py:const:`OUTPUT_FORMATS` other than ``tsv``
+    :type output_format: str
+    :param outdir: directory where embeddings will be written
+    :type outdir: str
+    :param dimensions: length of each embedding vector
+    :type dimensions: int
+    :raises CellMapsPPIEmbeddingError: If **output_format** is not supported
+    :return: writer
+    :rtype: :py:class:`EmbeddingWriter`
+    """
+    if output_format == NPY_FORMAT:
+        return NPYEmbeddingWriter(outdir, dimensions)
+    if output_format == PARQUET_FORMAT:
+        return ParquetEmbeddingWriter(outdir, dimensions)
+    if output_format == HDF5_FORMAT:
+        return HDF5EmbeddingWriter(outdir, dimensions)
+    raise CellMapsPPIEmbeddingError('Unsupported output format: ' + str(output_format))
@@ -29,9 +29,12 @@ with open('HISTORY.rst') as history_file:
 
 requirements = ['scipy>=1.10.1,<1.13',
                 'cellmaps_utils>=0.4.0,<1.0.0',
-                'node2vec>=0.4.6,<0.5.0',
+                'gensim>=4.3.0,<5.0.0',
                 'networkx>=2.8,<2.9']
 
+extras_requirements = {'parquet': ['pyarrow'],
+                       'hdf5': ['h5py']}
+
 setup_requirements = [ ]
 
 setup(
@@ -49,6 +52,7 @@ setup(
     ],
     description=desc,
     install_requires=requirements,
+    extras_require=extras_requirements,
     license="MIT license",
     long_description=readme + '\n\n' + history,
     long_description_content_type='text/x-rst',
@@ -58,7 +62,10 @@ setup(
     packages=find_packages(include=['cellmaps_ppi_embedding']),
     package_dir={'cellmaps_ppi_embedding': 'cellmaps_ppi_embedding'},
     package_data={'cellmaps_ppi_embedding': ['readme_outputs.txt']},
-    scripts=['cellmaps_ppi_embedding/cellmaps_ppi_embeddingcmd.py'],
+    scripts=['cellmaps_ppi_embedding/cellmaps_ppi_embeddingcmd.py',
+             'cellmaps_ppi_embedding/cellmaps_ppi_embedding_sweepcmd.py',
+             'cellmaps_ppi_embedding/cellmaps_ppi_embedding_batchcmd.py',
+             'cellmaps_ppi_embedding/cellmaps_ppi_embedding_benchmarkcmd.py'],
     setup_requires=setup_requirements,
     url=repo_url,
     version=version,
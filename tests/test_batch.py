@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `cellmaps_ppi_embedding.batch` module."""
+
+import os
+import csv
+import tempfile
+import shutil
+
+import unittest
+from cellmaps_ppi_embedding.batch import BatchEmbedder
+from cellmaps_ppi_embedding.exceptions import CellMapsPPIEmbeddingError
+
+
+class TestBatchEmbedder(unittest.TestCase):
+    """Tests for `cellmaps_ppi_embedding.batch` module."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+        self._temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """Tear down test fixtures, if any."""
+        shutil.rmtree(self._temp_dir)
+
+    def _write_network(self, name, edges):
+        inputdir = os.path.join(self._temp_dir, name)
+        os.makedirs(inputdir)
+        with open(os.path.join(inputdir, 'ppi_edgelist.tsv'), 'w') as f:
+            f.write('geneA\tgeneB\n')
+            for a, b in edges:
+                f.write(a + '\t' + b + '\n')
+        return inputdir
+
+    def test_read_manifest(self):
+        manifest_file = os.path.join(self._temp_dir, 'manifest.tsv')
+        with open(manifest_file, 'w') as f:
+            f.write('inputdir\tname\tprovenance\n'
+                    '# comment\n'
+                    'net1\t\t\n'
+                    '\n'
+                    '/abs/net2\tsecond\tprov.json\n')
+        networks = BatchEmbedder.read_manifest(manifest_file)
+        self.assertEqual([{'inputdir': os.path.join(self._temp_dir, 'net1')},
+                          {'inputdir': '/abs/net2', 'name': 'second',
+                           'provenance': os.path.join(self._temp_dir, 'prov.json')}],
+                         networks)
+
+        with open(manifest_file, 'w') as f:
+            f.write('inputdir\tfoo\nnet1\tx\n')
+        try:
+            BatchEmbedder.read_manifest(manifest_file)
+            self.fail('Expected exception')
+        except CellMapsPPIEmbeddingError as e:
+            self.assertEqual('Unsupported manifest columns: foo', str(e))
+
+    def test_duplicate_names(self):
+        try:
+            BatchEmbedder(self._temp_dir, [{'inputdir': '/a/net'}, {'inputdir': '/b/net'}])
+            self.fail('Expected exception')
+        except CellMapsPPIEmbeddingError as e:
+            self.assertEqual('Networks must have unique names, duplicates: net', str(e))
+
+    def test_reserved_args(self):
+        try:
+            BatchEmbedder(self._temp_dir, [{'inputdir': '/a/net'}],
+                          generator_args={'workers': 4, 'seed': 1, 'csr_graph': None})
+            self.fail('Expected exception')
+        except CellMapsPPIEmbeddingError as e:
+            self.assertEqual('Arguments set for each network cannot be '
+                             'passed in: csr_graph, workers', str(e))
+        try:
+            BatchEmbedder(self._temp_dir, [{'inputdir': '/a/net'}],
+                          embedder_args={'outdir': '/x'})
+            self.fail('Expected exception')
+        except CellMapsPPIEmbeddingError as e:
+            self.assertEqual('Arguments set for each network cannot be '
+                             'passed in: outdir', str(e))
+
+    def test_save_model_with_split_components(self):
+        try:
+            BatchEmbedder(self._temp_dir, [{'inputdir': '/a/net'}],
+                          generator_args={'split_components': True},
+                          embedder_args={'save_model': True})
+            self.fail('Expected exception')
+        except CellMapsPPIEmbeddingError as e:
+            self.assertTrue('save_model cannot be used with split_components' in str(e))
+
+    def test_get_networks_largest_first(self):
+        small = self._write_network('small', [('A', 'B')])
+        large = self._write_network('large', [('A', 'B'), ('B', 'C'), ('C', 'D')])
+        batch = BatchEmbedder(self._temp_dir, [{'inputdir': small}, {'inputdir': large},
+                                               {'inputdir': os.path.join(self._temp_dir, 'missing')}])
+        networks = batch.get_networks()
+        self.assertEqual(['large', 'small', 'missing'], [n['name'] for n in networks])
+        self.assertEqual([3, 1, 0], [n['num_edges'] for n in networks])
+
+    def test_run_isolates_failures(self):
+        edges = [('A', 'B'), ('B', 'C'), ('C', 'D'), ('D', 'A')]
+        net1 = self._write_network('net1', edges)
+        net2 = self._write_network('net2', edges + [('A', 'E')])
+        outdir = os.path.join(self._temp_dir, 'out')
+        batch = BatchEmbedder(outdir, [{'inputdir': net1},
+                                       {'inputdir': os.path.join(self._temp_dir, 'missing')},
+                                       {'inputdir': net2, 'name': 'second'}],
+                              workers=2, parallel_networks=2,
+                              generator_args={'dimensions': 3, 'walk_length': 5,
+                                              'num_walks': 2, 'seed': 1},
+                              embedder_args={'provenance': {}, 'skip_logging': True})
+        self.assertEqual(1, batch.run())
+
+        with open(batch.get_summary_file(), 'r') as f:
+            rows = list(csv.DictReader(f, delimiter='\t'))
+        self.assertEqual(['net1', 'missing', 'second'], [row['name'] for row in rows])
+        self.assertEqual(['0', '2', '0'], [row['status'] for row in rows])
+        self.assertEqual(['4', '', '5'], [row['num_nodes'] for row in rows])
+        self.assertNotEqual('', rows[1]['error'])
+        for row, num_genes in zip([rows[0], rows[2]], [4, 5]):
+            self.assertEqual(os.path.join(outdir, row['name']), row['outdir'])
+            with open(os.path.join(row['outdir'], 'ppi_emd.tsv'), 'r') as f:
+                lines = f.read().splitlines()
+            self.assertEqual(num_genes + 1, len(lines))
+            self.assertEqual(4, len(lines[0].split('\t')))
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `cellmaps_ppi_embedding.benchmark` module."""
+
+import os
+import tempfile
+import shutil
+
+import unittest
+import numpy as np
+from cellmaps_ppi_embedding.graph import CSRGraph
+from cellmaps_ppi_embedding import benchmark
+from cellmaps_ppi_embedding.benchmark import EmbeddingBenchmark
+
+
+class TestEmbeddingBenchmark(unittest.TestCase):
+    """Tests for `cellmaps_ppi_embedding.benchmark` module."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+        self._temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """Tear down test fixtures, if any."""
+        shutil.rmtree(self._temp_dir)
+
+    def test_write_scale_free_edgelist(self):
+        edgelist_file = os.path.join(self._temp_dir, 'ppi_edgelist.tsv')
+        num_nodes = benchmark.write_scale_free_edgelist(edgelist_file, 2000, seed=1)
+        graph = CSRGraph.from_edgelist_file(edgelist_file)
+        self.assertEqual(2000, graph.get_num_edges())
+        self.assertEqual(num_nodes, graph.get_num_nodes())
+        degrees = graph.get_degrees()
+        self.assertEqual(0, np.count_nonzero(graph.get_indices() == graph._get_row_ids()))
+        # heavy tailed degree distribution has hubs well above the mean
+        self.assertTrue(degrees.max() > 5 * degrees.mean())
+
+        other_file = os.path.join(self._temp_dir, 'other.tsv')
+        benchmark.write_scale_free_edgelist(other_file, 2000, seed=1)
+        with open(edgelist_file, 'r') as f, open(other_file, 'r') as o:
+            self.assertEqual(f.read(), o.read())
+
+    def test_write_scale_free_edgelist_small_sizes(self):
+        edgelist_file = os.path.join(self._temp_dir, 'ppi_edgelist.tsv')
+        # too few nodes at mean degree 8 to hold this many distinct edges
+        for num_edges in (1, 10, 30, 100):
+            benchmark.write_scale_free_edgelist(edgelist_file, num_edges, seed=1)
+            graph = CSRGraph.from_edgelist_file(edgelist_file)
+            self.assertEqual(num_edges, graph.get_num_edges())
+        benchmark.write_scale_free_edgelist(edgelist_file, 30, mean_degree=100, seed=1)
+        self.assertEqual(30, CSRGraph.from_edgelist_file(edgelist_file).get_num_edges())
+
+    def test_run(self):
+        bench = EmbeddingBenchmark(os.path.join(self._temp_dir, 'work'), sizes=[200],
+                                   dimensions=4, walk_length=5, num_walks=2,
+                                   isolate=False)
+        results = bench.run()
+        self.assertEqual(bench.get_params(), results['params'])
+        self.assertEqual(1, len(results['results']))
+        res = results['results'][0]
+        self.assertEqual(200, res['size'])
+        self.assertEqual(200, res['num_edges'])
+        self.assertEqual(0, res['status'])
+        self.assertEqual({'load', 'setup', 'walk_preprocessing', 'walks', 'training',
+                          'write', 'provenance'}, set(res['phases'].keys()))
+        self.assertEqual(set(res['phases'].keys()), set(res['phase_rss_peak_mb'].keys()))
+        self.assertTrue(res['peak_rss_mb'] > 0)
+        self.assertEqual([], os.listdir(os.path.join(self._temp_dir, 'work')))
+
+    def test_run_embedders(self):
+        bench = EmbeddingBenchmark(os.path.join(self._temp_dir, 'work'), sizes=[200],
+                                   dimensions=4, walk_length=5, num_walks=2,
+                                   isolate=False, embedders=['node2vec', 'spectral', 'fastrp'])
+        results = bench.run()
+        self.assertEqual(['node2vec', 'spectral', 'fastrp'], results['params']['embedders'])
+        self.assertEqual(['node2vec', 'spectral', 'fastrp'],
+                         [res['embedder'] for res in results['results']])
+        for res in results['results'][1:]:
+            self.assertEqual(200, res['num_edges'])
+            self.assertEqual(0, res['status'])
+            self.assertEqual({'load', 'setup', 'training', 'write', 'provenance'},
+                             set(res['phases'].keys()))
+
+    def test_compare_to_baseline(self):
+        baseline = {'results': [{'size': 10, 'total_seconds': 10.0, 'peak_rss_mb': 100.0,
+                                 'phases': {'walks': 4.0, 'training': 5.0, 'load': 0.01}},
+                                {'size': 20, 'total_seconds': 1.0}]}
+        results = {'results': [{'size': 10, 'total_seconds': 11.0, 'peak_rss_mb': 200.0,
+                                'phases': {'walks': 6.0, 'training': 5.0, 'load': 0.05,
+                                           'write': 1.0}},
+                               {'size': 30, 'total_seconds': 100.0}]}
+        regressions = EmbeddingBenchmark.compare_to_baseline(results, baseline, tolerance=0.25)
+        self.assertEqual(2, len(regressions))
+        self.assertTrue(regressions[0].startswith('10 edges: peak_rss_mb 200.0 vs baseline 100.0'))
+        self.assertTrue(regressions[1].startswith('10 edges: phase walks 6.0 vs baseline 4.0'))
+        self.assertEqual([], EmbeddingBenchmark.compare_to_baseline(results, baseline,
+                                                                     tolerance=1.0))
+
+        # results are matched by embedder too, node2vec if not set
+        results = {'results': [{'size': 10, 'embedder': 'spectral', 'total_seconds': 100.0},
+                               {'size': 10, 'embedder': 'node2vec', 'total_seconds': 9.0}]}
+        baseline['results'].append({'size': 10, 'embedder': 'spectral', 'total_seconds': 1.0})
+        self.assertEqual(['10 edges spectral: total_seconds 100.0 vs baseline 1.0 (+9900.0%)'],
+                         EmbeddingBenchmark.compare_to_baseline(results, baseline))
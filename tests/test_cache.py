@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `cellmaps_ppi_embedding.cache` module."""
+
+import os
+import tempfile
+import shutil
+
+import unittest
+import numpy as np
+import networkx as nx
+from unittest.mock import patch
+from cellmaps_ppi_embedding.graph import CSRGraph
+from cellmaps_ppi_embedding.cache import WalkCache
+from cellmaps_ppi_embedding.runner import Node2VecEmbeddingGenerator
+from cellmaps_ppi_embedding.walks import Node2VecWalker
+from cellmaps_ppi_embedding.exceptions import CellMapsPPIEmbeddingError
+
+
+class TestWalkCache(unittest.TestCase):
+    """Tests for `cellmaps_ppi_embedding.cache` module."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+        self._temp_dir = tempfile.mkdtemp()
+        self._graph = CSRGraph.from_edges(np.array([0, 1, 2]),
+                                          np.array([1, 2, 0]),
+                                          ['A', 'B', 'C'])
+
+    def tearDown(self):
+        """Tear down test fixtures, if any."""
+        shutil.rmtree(self._temp_dir)
+
+    def _write_file(self, name, num_bytes):
+        path = os.path.join(self._temp_dir, name)
+        with open(path, 'wb') as f:
+            f.write(b'x' * num_bytes)
+        return path
+
+    def test_get_key(self):
+        key = WalkCache.get_key(self._graph, {'p': 1, 'q': 2})
+        self.assertEqual(64, len(key))
+        self.assertEqual(key, WalkCache.get_key(self._graph, {'q': 2, 'p': 1}))
+        self.assertNotEqual(key, WalkCache.get_key(self._graph, {'p': 1, 'q': 3}))
+        renamed = CSRGraph(self._graph.get_indptr(), self._graph.get_indices(),
+                           self._graph.get_weights(), ['A', 'B', 'D'])
+        self.assertNotEqual(key, WalkCache.get_key(renamed, {'p': 1, 'q': 2}))
+
+    def test_get_and_put(self):
+        cache = WalkCache(os.path.join(self._temp_dir, 'cache'))
+        dest = os.path.join(self._temp_dir, 'dest.npy')
+        self.assertFalse(cache.get('abc', dest))
+        self.assertFalse(os.path.exists(dest))
+
+        cache.put('abc', self._write_file('walks.npy', 10))
+        self.assertEqual(10, cache.get_size())
+        self.assertTrue(cache.get('abc', dest))
+        with open(dest, 'rb') as f:
+            self.assertEqual(b'x' * 10, f.read())
+
+    def test_put_missing_file(self):
+        cache = WalkCache(os.path.join(self._temp_dir, 'cache'))
+        try:
+            cache.put('abc', os.path.join(self._temp_dir, 'doesnotexist'))
+            self.fail('Expected exception')
+        except CellMapsPPIEmbeddingError as e:
+            self.assertTrue('does not exist' in str(e))
+
+    def test_evicts_least_recently_used(self):
+        cache = WalkCache(os.path.join(self._temp_dir, 'cache'), max_bytes=25)
+        cache.put('a', self._write_file('a.npy', 10))
+        cache.put('b', self._write_file('b.npy', 10))
+        cache_dir = cache.get_cache_dir()
+        os.utime(os.path.join(cache_dir, 'a.npy'), (1, 1))
+        os.utime(os.path.join(cache_dir, 'b.npy'), (2, 2))
+
+        # using a makes b the least recently used entry
+        self.assertTrue(cache.get('a', os.path.join(self._temp_dir, 'x.npy')))
+        cache.put('c', self._write_file('c.npy', 10))
+        self.assertEqual(['a.npy', 'c.npy'], sorted(os.listdir(cache_dir)))
+        self.assertEqual(20, cache.get_size())
+
+    def test_entry_larger_than_cache_is_kept(self):
+        cache = WalkCache(os.path.join(self._temp_dir, 'cache'), max_bytes=5)
+        cache.put('a', self._write_file('a.npy', 10))
+        self.assertEqual(['a.npy'], os.listdir(cache.get_cache_dir()))
+
+    def test_node2vec_generator_reuses_cached_walks(self):
+        nx_network = nx.Graph()
+        nx_network.add_edges_from([('ABC', 'DEF'), ('DEF', 'GHI'), ('GHI', 'ABC')])
+        cache = WalkCache(os.path.join(self._temp_dir, 'cache'))
+        params = {'dimensions': 4, 'walk_length': 5, 'num_walks': 2,
+                  'workers': 1, 'seed': 1, 'walk_cache': cache}
+        first = Node2VecEmbeddingGenerator(nx_network.copy(), **params)._train_model()
+        self.assertEqual(1, len(os.listdir(cache.get_cache_dir())))
+
+        with patch.object(Node2VecWalker, 'generate_walks') as mock_walks:
+            second = Node2VecEmbeddingGenerator(nx_network.copy(), window=2,
+                                                **params)._train_model()
+            mock_walks.assert_not_called()
+        self.assertEqual(sorted(first.wv.index_to_key), sorted(second.wv.index_to_key))
+
+        # different walk parameters need new walks
+        params['walk_length'] = 6
+        Node2VecEmbeddingGenerator(nx_network.copy(), **params)._train_model()
+        self.assertEqual(2, len(os.listdir(cache.get_cache_dir())))
+
+    def test_node2vec_generator_without_seed_skips_cache(self):
+        nx_network = nx.Graph()
+        nx_network.add_edges_from([('ABC', 'DEF'), ('DEF', 'GHI'), ('GHI', 'ABC')])
+        cache = WalkCache(os.path.join(self._temp_dir, 'cache'))
+        Node2VecEmbeddingGenerator(nx_network, dimensions=4, walk_length=5,
+                                   num_walks=2, workers=1,
+                                   walk_cache=cache)._train_model()
+        self.assertEqual([], os.listdir(cache.get_cache_dir()))
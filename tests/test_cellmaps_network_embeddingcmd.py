@@ -4,8 +4,10 @@
 """Tests for `cellmaps_ppi_embedding` package."""
 
 import os
+import sys
 import tempfile
 import shutil
+import subprocess
 
 import unittest
 from cellmaps_ppi_embedding import cellmaps_ppi_embeddingcmd
@@ -33,6 +35,10 @@ class TestCellmapsNetworkEmbedding(unittest.TestCase):
         self.assertEqual(2, res.p)
         self.assertEqual(1, res.q)
         self.assertEqual(1024, res.dimensions)
+        self.assertEqual('node2vec', res.embedder)
+        self.assertEqual('adjacency', res.spectral_matrix)
+        self.assertEqual([0.0, 1.0, 1.0], res.fastrp_iteration_weights)
+        self.assertEqual(0.0, res.fastrp_normalization_strength)
         self.assertEqual(None, res.logconf)
 
         someargs = ['-vv', '--logconf', 'hi', 'outdir',
@@ -55,3 +61,22 @@ class TestCellmapsNetworkEmbedding(unittest.TestCase):
             self.assertEqual(res, 2)
         finally:
             shutil.rmtree(temp_dir)
+
+    def test_import_does_not_load_heavy_modules(self):
+        """Tests heavy dependencies are only imported when needed
+        by parsing output of python -X importtime"""
+        res = subprocess.run([sys.executable, '-X', 'importtime', '-c',
+                              'import cellmaps_ppi_embedding.cellmaps_ppi_embeddingcmd'],
+                             stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                             universal_newlines=True)
+        self.assertEqual(0, res.returncode, res.stderr)
+        imported = {}
+        for line in res.stderr.splitlines():
+            if not line.startswith('import time:') or 'cumulative' in line:
+                continue
+            _, cumulative, name = line.split('|')
+            imported[name.strip()] = int(cumulative)
+        self.assertTrue('cellmaps_ppi_embedding.cellmaps_ppi_embeddingcmd' in imported)
+        for heavy in ['gensim', 'networkx', 'mlflow', 'pyarrow', 'h5py', 'scipy']:
+            self.assertFalse(heavy in imported, heavy + ' imported in ' +
+                             str(imported.get(heavy)) + ' microseconds')
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `cellmaps_ppi_embedding.fastrp` module."""
+
+import unittest
+import numpy as np
+from cellmaps_ppi_embedding import fastrp
+from cellmaps_ppi_embedding.graph import CSRGraph
+
+
+class TestFastRP(unittest.TestCase):
+    """Tests for `cellmaps_ppi_embedding.fastrp` module."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+        # G6 has no edges
+        src = [0, 0, 1, 2, 2, 3, 4]
+        dst = [1, 2, 2, 3, 4, 4, 5]
+        weights = [1.0, 2.0, 1.0, 1.0, 3.0, 1.0, 1.0]
+        self._graph = CSRGraph.from_edges(np.array(src), np.array(dst),
+                                          ['G' + str(x) for x in range(7)],
+                                          weights=np.array(weights))
+        self._adjacency = np.zeros((7, 7))
+        self._adjacency[src, dst] = weights
+        self._adjacency[dst, src] = weights
+
+    def tearDown(self):
+        """Tear down test fixtures, if any."""
+
+    def test_get_transition_matrix(self):
+        transition, degrees = fastrp.get_transition_matrix(self._graph)
+        self.assertTrue(np.allclose(self._adjacency.sum(axis=1), degrees))
+        self.assertEqual(np.float32, transition.dtype)
+        dense = transition.toarray()
+        self.assertTrue(np.allclose(self._adjacency[:6] / degrees[:6, None], dense[:6]))
+        self.assertTrue(np.all(dense[6] == 0))
+
+    def test_get_random_projection(self):
+        projection = fastrp.get_random_projection(1000, 64, seed=1)
+        self.assertEqual((1000, 64), projection.shape)
+        self.assertEqual(np.float32, projection.dtype)
+        # about sqrt(64) values per row
+        self.assertTrue(7000 < projection.nnz < 9000)
+        self.assertEqual([-1.0, 1.0], np.unique(projection.data).tolist())
+        other = fastrp.get_random_projection(1000, 64, seed=1)
+        self.assertEqual(0, (projection != other).nnz)
+
+        # drawing fewer gaps at a time gives same positions
+        other = fastrp.get_random_projection(1000, 64, seed=1, chunk_size=100)
+        self.assertTrue(np.array_equal(projection.indptr, other.indptr))
+        self.assertTrue(np.array_equal(projection.indices, other.indices))
+
+    def test_project(self):
+        transition, _ = fastrp.get_transition_matrix(self._graph)
+        projection = fastrp.get_random_projection(7, 16, seed=1)
+        weights = [0.5, 0.0, 2.0]
+
+        dense_transition = transition.toarray().astype(np.float64)
+        current = projection.toarray().astype(np.float64)
+        expected = np.zeros((7, 16))
+        for weight in weights:
+            current = dense_transition @ current
+            norms = np.linalg.norm(current, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            expected += weight * current / norms
+
+        # tiny blocks so rows are computed a few at a time
+        embeddings = fastrp.project(transition, projection, weights, block_bytes=4 * 16 * 3)
+        self.assertEqual(np.float32, embeddings.dtype)
+        self.assertTrue(np.allclose(expected, embeddings, atol=1e-5))
+        self.assertTrue(np.all(embeddings[6] == 0))
+        self.assertTrue(np.allclose(embeddings, fastrp.project(transition, projection, weights)))
@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `cellmaps_ppi_embedding.graph` module."""
+
+import os
+import tempfile
+import shutil
+
+import unittest
+import numpy as np
+import networkx as nx
+from cellmaps_ppi_embedding.graph import CSRGraph
+from cellmaps_ppi_embedding.exceptions import CellMapsPPIEmbeddingError
+
+
+class TestCSRGraph(unittest.TestCase):
+    """Tests for `cellmaps_ppi_embedding.graph` module."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+
+    def tearDown(self):
+        """Tear down test fixtures, if any."""
+
+    def _write_edgelist(self, temp_dir, lines):
+        e_file = os.path.join(temp_dir, 'ppi_edgelist.tsv')
+        with open(e_file, 'w') as f:
+            for line in lines:
+                f.write(line + '\n')
+        return e_file
+
+    def test_from_edgelist_file_with_header(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            e_file = self._write_edgelist(temp_dir, ['geneA\tgeneB',
+                                                     'ABC\tDEF',
+                                                     'DEF\tGHI',
+                                                     'GHI\tABC',
+                                                     'DEF\tABC'])
+            graph = CSRGraph.from_edgelist_file(e_file)
+            self.assertEqual(['ABC', 'DEF', 'GHI'], graph.get_node_names())
+            self.assertEqual(3, graph.get_num_nodes())
+            self.assertEqual(3, graph.get_num_edges())
+            self.assertEqual([0, 2, 4, 6], graph.get_indptr().tolist())
+            self.assertEqual([1, 2], graph.get_neighbors(0).tolist())
+            self.assertEqual([0, 2], graph.get_neighbors(1).tolist())
+            self.assertEqual([2, 2, 2], graph.get_degrees().tolist())
+            self.assertTrue(np.all(graph.get_weights() == 1.0))
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_from_edgelist_file_no_header_and_selfloop(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            e_file = self._write_edgelist(temp_dir, ['ABC\tDEF', 'ABC\tABC', ''])
+            graph = CSRGraph.from_edgelist_file(e_file)
+            self.assertEqual(['ABC', 'DEF'], graph.get_node_names())
+            self.assertEqual(2, graph.get_num_edges())
+            self.assertEqual([0, 1], graph.get_neighbors(0).tolist())
+            self.assertEqual([0], graph.get_neighbors(1).tolist())
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_from_edgelist_file_comments_and_padding(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            e_file = self._write_edgelist(temp_dir, ['# PPI network',
+                                                     'geneA\tgeneB\t score ',
+                                                     '#ABC\tXYZ\t1.0',
+                                                     ' ABC \tDEF\t0.5  # comment',
+                                                     'DEF\t GHI\t 2.0\r'])
+            graph = CSRGraph.from_edgelist_file(e_file, weight_col='score')
+            self.assertEqual(['ABC', 'DEF', 'GHI'], graph.get_node_names())
+            self.assertEqual(2, graph.get_num_edges())
+            self.assertEqual([0.5, 0.5, 2.0, 2.0], graph.get_weights().tolist())
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_from_edgelist_file_too_few_columns(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            e_file = self._write_edgelist(temp_dir, ['geneA\tgeneB', 'ABC'])
+            CSRGraph.from_edgelist_file(e_file)
+            self.fail('Expected exception')
+        except CellMapsPPIEmbeddingError as ce:
+            self.assertTrue('has too few columns' in str(ce))
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_from_edgelist_file_with_weight_col(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            e_file = self._write_edgelist(temp_dir, ['geneA\tgeneB\tscore',
+                                                     'ABC\tDEF\t0.5',
+                                                     'DEF\tGHI\t2'])
+            graph = CSRGraph.from_edgelist_file(e_file, weight_col='score')
+            self.assertEqual([0.5], graph.get_weights()[graph.get_indptr()[0]:
+                                                        graph.get_indptr()[1]].tolist())
+            self.assertEqual([0.5, 2.0], graph.get_weights()[graph.get_indptr()[1]:
+                                                             graph.get_indptr()[2]].tolist())
+
+            try:
+                CSRGraph.from_edgelist_file(e_file, weight_col='foo')
+                self.fail('Expected exception')
+            except CellMapsPPIEmbeddingError as ce:
+                self.assertEqual('Weight column foo not found in header of ' + e_file, str(ce))
+
+            e_file = self._write_edgelist(temp_dir, ['geneA\tgeneB\tscore',
+                                                     'ABC\tDEF\t-1'])
+            try:
+                CSRGraph.from_edgelist_file(e_file, weight_col='score')
+                self.fail('Expected exception')
+            except CellMapsPPIEmbeddingError as ce:
+                self.assertEqual('Line 2 of ' + e_file + ' has invalid score value: -1', str(ce))
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_networkx_round_trip(self):
+        nx_network = nx.Graph()
+        nx_network.add_edge('A', 'B', weight=2.0)
+        nx_network.add_edge('B', 'C')
+        graph = CSRGraph.from_networkx(nx_network)
+        self.assertEqual(['A', 'B', 'C'], graph.get_node_names())
+        self.assertEqual(2, graph.get_num_edges())
+        res = graph.to_networkx()
+        self.assertEqual(2, res.number_of_edges())
+        self.assertEqual(2.0, res['A']['B']['weight'])
+        self.assertEqual(1.0, res['C']['B']['weight'])
+
+    def test_save_and_load(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            graph = CSRGraph.from_edges(np.array([0, 1]), np.array([1, 2]), ['A', 'B', 'C'],
+                                        weights=np.array([2.0, 1.0]))
+            graph_file = os.path.join(temp_dir, 'graph.npz')
+            graph.save(graph_file)
+            res = CSRGraph.load(graph_file)
+            self.assertEqual(['A', 'B', 'C'], res.get_node_names())
+            self.assertEqual(graph.get_indptr().tolist(), res.get_indptr().tolist())
+            self.assertEqual(graph.get_indices().tolist(), res.get_indices().tolist())
+            self.assertEqual(graph.get_weights().tolist(), res.get_weights().tolist())
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_get_changed_nodes_and_expand_nodes(self):
+        old = CSRGraph.from_edges(np.array([0, 1, 2, 3]), np.array([1, 2, 3, 4]),
+                                  ['A', 'B', 'C', 'D', 'E'])
+        self.assertFalse(np.any(old.get_changed_nodes(old)))
+
+        # C-D removed, E-F added, order of nodes differs
+        new = CSRGraph.from_edges(np.array([1, 0, 3, 4]), np.array([0, 2, 4, 5]),
+                                  ['B', 'A', 'C', 'D', 'E', 'F'])
+        changed = new.get_changed_nodes(old)
+        self.assertEqual(['C', 'D', 'E', 'F'],
+                         [name for name, c in zip(new.get_node_names(), changed) if c])
+        self.assertEqual(['B', 'C', 'D', 'E', 'F'],
+                         [name for name, c in zip(new.get_node_names(),
+                                                  new.expand_nodes(changed, 1)) if c])
+        self.assertEqual(changed.tolist(), new.expand_nodes(changed, 0).tolist())
+
+        # only weight of A-B changed
+        reweighted = CSRGraph.from_edges(np.array([0, 1, 2, 3]), np.array([1, 2, 3, 4]),
+                                         ['A', 'B', 'C', 'D', 'E'],
+                                         weights=np.array([2.0, 1.0, 1.0, 1.0]))
+        self.assertEqual([True, True, False, False, False],
+                         reweighted.get_changed_nodes(old).tolist())
+
+        # E removed along with its edge to D
+        smaller = CSRGraph.from_edges(np.array([0, 1, 2]), np.array([1, 2, 3]),
+                                      ['A', 'B', 'C', 'D'])
+        self.assertEqual([False, False, False, True],
+                         smaller.get_changed_nodes(old).tolist())
+
+    def test_get_components_and_subgraph(self):
+        # A-B, C-D-E-C triangle, F alone via self loop, G-H
+        graph = CSRGraph.from_edges(np.array([0, 2, 3, 4, 5, 6]), np.array([1, 3, 4, 2, 5, 7]),
+                                    ['A', 'B', 'C', 'D', 'E', 'F', 'G', 'H'],
+                                    weights=np.array([1.0, 2.0, 3.0, 4.0, 5.0, 6.0]))
+        labels, sizes = graph.get_components()
+        self.assertEqual([3, 2, 2, 1], sizes.tolist())
+        self.assertEqual([1, 1, 0, 0, 0, 3, 2, 2], labels.tolist())
+
+        triangle = graph.subgraph(np.flatnonzero(labels == 0))
+        self.assertEqual(['C', 'D', 'E'], triangle.get_node_names())
+        self.assertEqual(3, triangle.get_num_edges())
+        self.assertEqual([1, 2], triangle.get_neighbors(0).tolist())
+        self.assertEqual({frozenset(('C', 'D')): 2.0, frozenset(('D', 'E')): 3.0,
+                          frozenset(('E', 'C')): 4.0},
+                         {frozenset(e[:2]): e[2]['weight']
+                          for e in triangle.to_networkx().edges(data=True)})
+
+        rest = graph.subgraph(np.flatnonzero(labels != 0))
+        self.assertEqual(['A', 'B', 'F', 'G', 'H'], rest.get_node_names())
+        self.assertEqual(3, rest.get_num_edges())
+        self.assertEqual([2], rest.get_neighbors(2).tolist())
+        self.assertEqual([3], rest.get_neighbors(4).tolist())
+
+        # edges to nodes left out are dropped
+        partial = graph.subgraph(np.array([2, 3]))
+        self.assertEqual(1, partial.get_num_edges())
+        self.assertEqual([0, 1, 2], partial.get_indptr().tolist())
@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `cellmaps_ppi_embedding.knn` module."""
+
+import os
+import csv
+import tempfile
+import shutil
+
+import unittest
+import numpy as np
+from cellmaps_ppi_embedding import knn
+from cellmaps_ppi_embedding.knn import CosineKNN
+from cellmaps_ppi_embedding.exceptions import CellMapsPPIEmbeddingError
+
+
+class TestCosineKNN(unittest.TestCase):
+    """Tests for `cellmaps_ppi_embedding.knn` module."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+        self._temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """Tear down test fixtures, if any."""
+        shutil.rmtree(self._temp_dir)
+
+    def _check_against_brute_force(self, embeddings, k, block_bytes):
+        index = CosineKNN(block_bytes=block_bytes)
+        for start in range(0, len(embeddings), 100):
+            index.add_embeddings([str(x) for x in range(start, min(start + 100, len(embeddings)))],
+                                 embeddings[start:start + 100])
+        vectors = CosineKNN.normalize(embeddings)
+        num_rows = 0
+        for start, neighbors, sims in index.get_neighbors(k):
+            # block products so rounding matches
+            expected = vectors[start:start + len(neighbors)] @ vectors.T
+            rows = np.arange(len(neighbors))
+            expected[rows, rows + start] = -np.inf
+            expected_neighbors = np.argsort(-expected, axis=1, kind='stable')[:, :k]
+            self.assertEqual(expected_neighbors.tolist(), neighbors.tolist())
+            self.assertTrue(np.allclose(np.take_along_axis(expected, expected_neighbors, axis=1),
+                                        sims))
+            num_rows += len(neighbors)
+        self.assertEqual(len(embeddings), num_rows)
+
+    def test_get_neighbors_matches_brute_force(self):
+        rng = np.random.default_rng(1)
+        embeddings = rng.standard_normal((1500, 8)).astype(np.float32)
+        embeddings[3] = embeddings[7] * 2
+        # small blocks and enough columns to use group threshold
+        self._check_against_brute_force(embeddings, 5, block_bytes=4 * 1500 * 64)
+        # few enough columns to sort whole rows
+        self._check_against_brute_force(embeddings[:300], 5, block_bytes=CosineKNN.BLOCK_BYTES)
+
+    def test_get_neighbors_fewer_embeddings_than_k(self):
+        index = CosineKNN()
+        self.assertRaises(CellMapsPPIEmbeddingError, lambda: list(index.get_neighbors(2)))
+        index.add_embeddings(['A', 'B', 'C'], np.array([[1.0, 0.0], [0.0, 1.0], [1.0, 0.1]]))
+        self.assertRaises(CellMapsPPIEmbeddingError, lambda: list(index.get_neighbors(0)))
+        res = list(index.get_neighbors(5))
+        self.assertEqual(1, len(res))
+        self.assertEqual([[2, 1], [2, 0], [0, 1]], res[0][1].tolist())
+
+    def test_write_neighbors(self):
+        index = CosineKNN()
+        index.add_embeddings(['A', 'B'], np.array([[1.0, 0.0], [0.0, 2.0]]))
+        index.add_embeddings(['C', 'ZERO'], np.array([[3.0, 3.0], [0.0, 0.0]]))
+        knn_file = os.path.join(self._temp_dir, knn.KNN_FILE)
+        index.write_neighbors(knn_file, 2)
+        with open(knn_file, 'r') as f:
+            rows = list(csv.DictReader(f, delimiter='\t'))
+        self.assertEqual(8, len(rows))
+        self.assertEqual({'id': 'A', 'neighbor': 'C', 'rank': '1', 'similarity': '0.707107'},
+                         rows[0])
+        self.assertEqual(['B', 'C', 'ZERO'], sorted({row['id'] for row in rows[2:]}))
+        # A and ZERO tie so first added comes first
+        self.assertEqual(['A', '2'], [rows[3]['neighbor'], rows[3]['rank']])
@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `cellmaps_ppi_embedding.profiling` module."""
+
+import os
+import time
+import pstats
+import shutil
+import tempfile
+import unittest
+from cellmaps_ppi_embedding import profiling
+from cellmaps_ppi_embedding.profiling import PhaseProfiler
+from cellmaps_ppi_embedding.profiling import CallProfiler
+
+
+class TestPhaseProfiler(unittest.TestCase):
+    """Tests for `cellmaps_ppi_embedding.profiling` module."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+
+    def tearDown(self):
+        """Tear down test fixtures, if any."""
+
+    def test_nested_phases_are_exclusive(self):
+        profiler = PhaseProfiler()
+        with profiler.phase('write'):
+            time.sleep(0.02)
+            with profiler.phase('training'):
+                time.sleep(0.05)
+        with profiler.phase('write'):
+            pass
+        phases = profiler.get_phases()
+        self.assertEqual(['write', 'training'], list(phases.keys()))
+        self.assertEqual(2, phases['write']['calls'])
+        self.assertEqual(1, phases['training']['calls'])
+        self.assertTrue(phases['training']['seconds'] >= 0.05)
+        self.assertTrue(0.02 <= phases['write']['seconds'] < 0.05)
+        self.assertAlmostEqual(phases['write']['seconds'] + phases['training']['seconds'],
+                               profiler.get_total_seconds())
+
+    def test_phase_recorded_on_exception(self):
+        profiler = PhaseProfiler()
+        try:
+            with profiler.phase('load'):
+                raise ValueError('bad')
+        except ValueError:
+            pass
+        self.assertEqual(1, profiler.get_phases()['load']['calls'])
+
+    @unittest.skipIf(profiling.get_rss_bytes() is None, 'resident set size not available')
+    def test_memory_sampled(self):
+        profiler = PhaseProfiler()
+        with profiler.phase('walks'):
+            block = bytearray(50 * 1024 ** 2)
+            block[::4096] = b'x' * len(block[::4096])
+            time.sleep(2 * PhaseProfiler.SAMPLE_INTERVAL)
+            del block
+        stats = profiler.get_phases()['walks']
+        self.assertTrue(stats['rss_peak_mb'] >= stats['rss_start_mb'] + 40)
+        self.assertEqual(stats['rss_peak_mb'], profiler.get_peak_rss_mb())
+        self.assertEqual({'walks_seconds', 'walks_rss_peak_mb'}, set(profiler.get_metrics().keys()))
+
+    def test_trace_python_memory(self):
+        profiler = PhaseProfiler(sample_memory=False, trace_python_memory=True)
+        with profiler.phase('write'):
+            with profiler.phase('training'):
+                block = bytearray(20 * 1024 ** 2)
+                del block
+            block = bytearray(5 * 1024 ** 2)
+            del block
+        phases = profiler.get_phases()
+        self.assertTrue(phases['training']['python_peak_mb'] >= 20)
+        # peak of nested phase counts towards the enclosing phase too
+        self.assertTrue(phases['write']['python_peak_mb'] >= 20)
+        self.assertFalse('rss_peak_mb' in phases['write'])
+        self.assertIsNone(profiler.get_peak_rss_mb())
+
+
+def _busy_loop(seconds):
+    end = time.perf_counter() + seconds
+    total = 0
+    while time.perf_counter() < end:
+        total += 1
+    return total
+
+
+class TestCallProfiler(unittest.TestCase):
+    """Tests for `cellmaps_ppi_embedding.profiling.CallProfiler`"""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+        self._temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """Tear down test fixtures, if any."""
+        shutil.rmtree(self._temp_dir)
+
+    def test_stop_when_not_running(self):
+        profiler = CallProfiler()
+        self.assertFalse(profiler.is_running())
+        self.assertEqual([], profiler.stop(self._temp_dir))
+        self.assertEqual([], os.listdir(self._temp_dir))
+
+    def test_start_stop(self):
+        profiler = CallProfiler(interval=0.001)
+        profiler.start()
+        self.assertTrue(profiler.is_running())
+        _busy_loop(0.2)
+        res = profiler.stop(self._temp_dir)
+        self.assertFalse(profiler.is_running())
+        self.assertEqual([os.path.join(self._temp_dir, CallProfiler.PSTATS_FILE),
+                          os.path.join(self._temp_dir, CallProfiler.COLLAPSED_FILE)], res)
+
+        stats = pstats.Stats(res[0])
+        self.assertTrue(any(func[2] == '_busy_loop' for func in stats.stats.keys()))
+
+        with open(res[1], 'r') as f:
+            lines = f.read().splitlines()
+        self.assertTrue(len(lines) > 0)
+        busy = 0
+        for line in lines:
+            stack, count = line.rsplit(' ', 1)
+            if stack.split(';')[-1].startswith('_busy_loop (test_profiling.py:'):
+                busy += int(count)
+        self.assertTrue(busy > 0)
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `cellmaps_ppi_embedding.spectral` module."""
+
+import unittest
+import numpy as np
+from cellmaps_ppi_embedding import spectral
+from cellmaps_ppi_embedding.graph import CSRGraph
+from cellmaps_ppi_embedding.spectral import NetMFMatrix
+
+
+class TestSpectral(unittest.TestCase):
+    """Tests for `cellmaps_ppi_embedding.spectral` module."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+        # G6 has no edges
+        src = [0, 0, 1, 2, 2, 3, 4]
+        dst = [1, 2, 2, 3, 4, 4, 5]
+        weights = [1.0, 2.0, 1.0, 1.0, 3.0, 1.0, 1.0]
+        self._graph = CSRGraph.from_edges(np.array(src), np.array(dst),
+                                          ['G' + str(x) for x in range(7)],
+                                          weights=np.array(weights))
+        self._adjacency = np.zeros((7, 7))
+        self._adjacency[src, dst] = weights
+        self._adjacency[dst, src] = weights
+
+    def tearDown(self):
+        """Tear down test fixtures, if any."""
+
+    def test_get_normalized_adjacency(self):
+        normalized, degrees = spectral.get_normalized_adjacency(self._graph)
+        expected_degrees = self._adjacency.sum(axis=1)
+        self.assertTrue(np.allclose(expected_degrees, degrees))
+        inv_sqrt = np.zeros(7)
+        inv_sqrt[:6] = 1.0 / np.sqrt(expected_degrees[:6])
+        self.assertEqual(np.float32, normalized.dtype)
+        self.assertTrue(np.allclose(inv_sqrt[:, None] * self._adjacency * inv_sqrt[None, :],
+                                    normalized.toarray(), atol=1e-6))
+
+    def test_randomized_eigsh(self):
+        normalized, _ = spectral.get_normalized_adjacency(self._graph)
+        dense = normalized.toarray().astype(np.float64)
+        expected = np.linalg.eigvalsh(dense)
+        expected = expected[np.argsort(-np.abs(expected), kind='stable')]
+
+        # fewer nodes than rank plus oversample so result is exact
+        eigenvalues, eigenvectors = spectral.randomized_eigsh(normalized.dot, 7, 3, seed=1)
+        self.assertTrue(np.allclose(expected[:3], eigenvalues, atol=1e-5))
+        self.assertEqual((7, 3), eigenvectors.shape)
+        self.assertEqual(np.float32, eigenvectors.dtype)
+        self.assertTrue(np.allclose(dense @ eigenvectors, eigenvectors * eigenvalues, atol=1e-5))
+
+        # rank is capped at size
+        eigenvalues, eigenvectors = spectral.randomized_eigsh(normalized.dot, 7, 10, seed=1)
+        self.assertEqual(7, len(eigenvalues))
+        self.assertEqual((7, 7), eigenvectors.shape)
+
+        # same seed gives same result
+        other, _ = spectral.randomized_eigsh(normalized.dot, 7, 3, oversample=0, seed=1)
+        again, _ = spectral.randomized_eigsh(normalized.dot, 7, 3, oversample=0, seed=1)
+        self.assertTrue(np.array_equal(other, again))
+
+    def test_filter_eigenvalues(self):
+        self.assertTrue(np.allclose([1.0, 0.0, (0.5 + 0.25 + 0.125) / 3, -1.0 / 3],
+                                    spectral.filter_eigenvalues([1.0, 0.0, 0.5, -1.0], 3)))
+
+    def test_netmf_matrix(self):
+        normalized, degrees = spectral.get_normalized_adjacency(self._graph)
+        eigenvalues, eigenvectors = np.linalg.eigh(normalized.toarray().astype(np.float64))
+
+        # NetMF matrix computed directly from transition matrix
+        window = 3
+        transition = np.zeros((7, 7))
+        transition[:6] = self._adjacency[:6] / degrees[:6, None]
+        inv_degrees = np.zeros(7)
+        inv_degrees[:6] = 1.0 / degrees[:6]
+        powers = sum(np.linalg.matrix_power(transition, r) for r in range(1, window + 1))
+        expected = np.log(np.maximum(degrees.sum() / 2 * powers / window * inv_degrees[None, :], 1.0))
+
+        # tiny blocks so rows are computed a few at a time
+        netmf = NetMFMatrix(eigenvalues, eigenvectors.astype(np.float32), degrees,
+                            window=window, negative=2, block_bytes=4 * 7 * 2)
+        self.assertEqual(7, netmf.get_size())
+        vectors = np.random.default_rng(1).standard_normal((7, 4)).astype(np.float32)
+        product = netmf.matmat(vectors)
+        self.assertEqual(np.float32, product.dtype)
+        self.assertTrue(np.allclose(expected @ vectors, product, atol=1e-4))
@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `cellmaps_ppi_embedding.sweep` module."""
+
+import os
+import csv
+import tempfile
+import shutil
+
+import unittest
+import numpy as np
+from cellmaps_ppi_embedding.graph import CSRGraph
+from cellmaps_ppi_embedding.sweep import HyperparameterSweep
+from cellmaps_ppi_embedding.exceptions import CellMapsPPIEmbeddingError
+
+
+class TestHyperparameterSweep(unittest.TestCase):
+    """Tests for `cellmaps_ppi_embedding.sweep` module."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+        self._temp_dir = tempfile.mkdtemp()
+        self._graph = CSRGraph.from_edges(np.array([0, 1, 2, 3]),
+                                          np.array([1, 2, 3, 0]),
+                                          ['A', 'B', 'C', 'D'])
+
+    def tearDown(self):
+        """Tear down test fixtures, if any."""
+        shutil.rmtree(self._temp_dir)
+
+    def test_unsupported_parameter(self):
+        try:
+            HyperparameterSweep(self._temp_dir, self._graph, {'p': [1], 'foo': [1]})
+            self.fail('Expected exception')
+        except CellMapsPPIEmbeddingError as e:
+            self.assertEqual('Unsupported sweep parameters: foo', str(e))
+
+    def test_get_configs(self):
+        sweep = HyperparameterSweep(self._temp_dir, self._graph,
+                                    {'p': [1, 2], 'dimensions': [4, 8, 16]}, seed=1)
+        configs = sweep.get_configs()
+        self.assertEqual(6, len(configs))
+        self.assertEqual({'p': 1, 'q': 1, 'dimensions': 4, 'window': 10, 'epochs': 1},
+                         configs[0])
+        self.assertEqual([1, 1, 1, 2, 2, 2], [c['p'] for c in configs])
+        self.assertEqual('p0.5_q1_dimensions4_window10_epochs1',
+                         HyperparameterSweep.get_config_name({'p': 0.5, 'q': 1, 'dimensions': 4,
+                                                              'window': 10, 'epochs': 1}))
+
+    def test_seed_chosen_if_unset(self):
+        sweep = HyperparameterSweep(self._temp_dir, self._graph, {})
+        self.assertTrue(isinstance(sweep.get_seed(), int))
+
+    def test_run(self):
+        outdir = os.path.join(self._temp_dir, 'sweep')
+        sweep = HyperparameterSweep(outdir, self._graph,
+                                    {'dimensions': [2, 3], 'window': [2]},
+                                    inputdir='inputdir', walk_length=5, num_walks=2,
+                                    seed=1, embedder_args={'provenance': {},
+                                                           'skip_logging': True})
+        self.assertEqual(0, sweep.run())
+
+        # walks were generated once and shared by both configurations
+        self.assertEqual(1, len(os.listdir(os.path.join(outdir, HyperparameterSweep.WALK_CACHE_DIR))))
+        with open(sweep.get_summary_file(), 'r') as f:
+            rows = list(csv.DictReader(f, delimiter='\t'))
+        self.assertEqual(2, len(rows))
+        for row, dims in zip(rows, [2, 3]):
+            self.assertEqual('0', row['status'])
+            self.assertEqual(str(dims), row['dimensions'])
+            self.assertTrue(float(row['training_loss']) >= 0)
+            with open(os.path.join(row['outdir'], 'ppi_emd.tsv'), 'r') as f:
+                lines = f.read().splitlines()
+            self.assertEqual(5, len(lines))
+            self.assertEqual(dims + 1, len(lines[0].split('\t')))
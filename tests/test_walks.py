@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `cellmaps_ppi_embedding.walks` module."""
+
+import os
+import tempfile
+import shutil
+
+import unittest
+import numpy as np
+from cellmaps_ppi_embedding.graph import CSRGraph
+from cellmaps_ppi_embedding.walks import Node2VecWalker
+from cellmaps_ppi_embedding.walks import WalkCorpus
+
+
+class TestNode2VecWalker(unittest.TestCase):
+    """Tests for `cellmaps_ppi_embedding.walks` module."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+        # square with a diagonal plus a node without neighbors
+        self._graph = CSRGraph.from_edges(np.array([0, 1, 2, 3, 0]),
+                                          np.array([1, 2, 3, 0, 2]),
+                                          ['A', 'B', 'C', 'D', 'E'])
+
+    def tearDown(self):
+        """Tear down test fixtures, if any."""
+
+    def _get_all_walks(self, walker, num_walks, seed):
+        return np.concatenate(list(walker.generate_walks(num_walks, seed=seed)))
+
+    def test_walks_follow_edges(self):
+        walker = Node2VecWalker(self._graph, p=2, q=0.5, walk_length=10, batch_size=3)
+        walks = self._get_all_walks(walker, 4, 1)
+        self.assertEqual((20, 10), walks.shape)
+        self.assertEqual([4] * 5, np.bincount(walks[:, 0]).tolist())
+        for walk in walks:
+            if walk[0] == 4:
+                self.assertEqual([4] + [Node2VecWalker.PAD] * 9, walk.tolist())
+                continue
+            for a, b in zip(walk[:-1], walk[1:]):
+                self.assertTrue(b in self._graph.get_neighbors(a))
+
+    def test_walks_reproducible_with_seed(self):
+        walker = Node2VecWalker(self._graph, walk_length=5)
+        self.assertTrue(np.array_equal(self._get_all_walks(walker, 2, 3),
+                                       self._get_all_walks(walker, 2, 3)))
+
+    def test_return_parameter(self):
+        # very small p means walks should mostly go back to previous node
+        walker = Node2VecWalker(self._graph, p=0.001, q=1, walk_length=3)
+        walks = self._get_all_walks(walker, 100, 1)
+        walks = walks[walks[:, 0] != 4]
+        self.assertTrue(np.mean(walks[:, 0] == walks[:, 2]) > 0.95)
+
+    def test_parallel_walks_match_serial(self):
+        walker = Node2VecWalker(self._graph, walk_length=6, batch_size=2)
+        serial = np.concatenate(list(walker.generate_walks(3, seed=5, workers=1)))
+        parallel = np.concatenate(list(walker.generate_walks(3, seed=5, workers=2)))
+        self.assertTrue(np.array_equal(serial, parallel))
+
+
+    def test_weighted_walks(self):
+        # star where one edge carries almost all weight of the center
+        graph = CSRGraph.from_edges(np.array([0, 0, 0, 0]), np.array([1, 2, 3, 4]),
+                                    ['A', 'B', 'C', 'D', 'E'],
+                                    weights=np.array([1000.0, 1.0, 1.0, 0.0]))
+        walker = Node2VecWalker(graph, walk_length=2)
+        self.assertTrue(walker.is_weighted())
+        self.assertFalse(Node2VecWalker(self._graph).is_weighted())
+        walks = np.concatenate(list(walker.generate_walks(20000, seed=1, nodes=np.array([0]))))
+        counts = np.bincount(walks[:, 1], minlength=5)
+        # edge with weight 0 is never taken
+        self.assertEqual(0, counts[4])
+        self.assertAlmostEqual(1000.0 / 1002.0, counts[1] / 20000.0, places=2)
+        self.assertTrue(counts[2] > 0 and counts[3] > 0)
+
+        # node whose only edge has weight 0 is a dead end
+        walks = np.concatenate(list(walker.generate_walks(1, seed=1, nodes=np.array([4]))))
+        self.assertEqual([[4, Node2VecWalker.PAD]], walks.tolist())
+
+    def test_step_from_zero_weight_node(self):
+        # D and E are only joined by an edge of weight 0 so
+        # walkers at either cannot move on
+        graph = CSRGraph.from_edges(np.array([0, 1, 2, 3]), np.array([1, 2, 0, 4]),
+                                    ['A', 'B', 'C', 'D', 'E'],
+                                    weights=np.array([1.0, 2.0, 1.0, 0.0]))
+        indptr = graph.get_indptr()
+        rng = np.random.default_rng(1)
+        for degree_threshold in (0, Node2VecWalker.DEGREE_THRESHOLD):
+            for weighted in (True, False):
+                walker = Node2VecWalker(graph, walk_length=5, degree_threshold=degree_threshold)
+                if not weighted:
+                    walker._cum_weights = None
+                next_nodes, offsets = walker._step(np.array([4, 0, 3], dtype=np.int32),
+                                                   None, None, rng)
+                self.assertEqual(Node2VecWalker.PAD, next_nodes[0])
+                self.assertTrue(next_nodes[1] in (1, 2))
+                self.assertEqual(Node2VecWalker.PAD, next_nodes[2])
+                self.assertEqual([-1, -1], offsets[[0, 2]].tolist())
+
+                # as if edge of weight 0 from D to E had been taken
+                next_nodes, _ = walker._step(np.array([4, 1], dtype=np.int32),
+                                             np.array([3, 0], dtype=np.int32),
+                                             np.array([indptr[3], indptr[0]]), rng)
+                self.assertEqual(Node2VecWalker.PAD, next_nodes[0])
+                self.assertTrue(next_nodes[1] in (0, 2))
+
+    def test_weighted_parallel_walks_match_serial(self):
+        graph = CSRGraph.from_edges(np.array([0, 1, 2, 3, 0]), np.array([1, 2, 3, 0, 2]),
+                                    ['A', 'B', 'C', 'D'],
+                                    weights=np.array([1.0, 5.0, 0.5, 2.0, 3.0]))
+        walker = Node2VecWalker(graph, p=0.5, q=2, walk_length=6, batch_size=2)
+        serial = np.concatenate(list(walker.generate_walks(3, seed=5, workers=1)))
+        parallel = np.concatenate(list(walker.generate_walks(3, seed=5, workers=2)))
+        self.assertTrue(np.array_equal(serial, parallel))
+        for walk in serial:
+            for a, b in zip(walk[:-1], walk[1:]):
+                self.assertTrue(b in graph.get_neighbors(a))
+
+
+    def test_exact_steps_match_rejection_sampling(self):
+        graph = CSRGraph.from_edges(np.array([0, 0, 0, 1, 1, 2, 3]),
+                                    np.array([1, 2, 3, 2, 4, 4, 4]),
+                                    ['A', 'B', 'C', 'D', 'E'],
+                                    weights=np.array([1.0, 2.0, 1.0, 3.0, 1.0, 0.5, 1.0]))
+        rejection = Node2VecWalker(graph, p=0.5, q=2, walk_length=3, degree_threshold=0)
+        exact = Node2VecWalker(graph, p=0.5, q=2, walk_length=3, degree_threshold=3)
+        self.assertEqual({'degree_threshold': 0, 'max_degree': 3, 'exact_nodes': 0,
+                          'rejection_nodes': 5, 'dead_end_nodes': 0, 'table_entries': 0},
+                         rejection.get_stats())
+        stats = exact.get_stats()
+        self.assertEqual(5, stats['exact_nodes'])
+        self.assertEqual(0, stats['rejection_nodes'])
+        # sum of squared degrees
+        self.assertEqual(9 + 9 + 9 + 4 + 9, stats['table_entries'])
+        self.assertEqual(1, Node2VecWalker(graph, degree_threshold=2).get_stats()['exact_nodes'])
+
+        # frequency of each (first, second, third) node triple should match
+        counts = []
+        for walker in (rejection, exact):
+            walks = np.concatenate(list(walker.generate_walks(4000, seed=2)))
+            triples = walks[:, 0] * 25 + walks[:, 1] * 5 + walks[:, 2]
+            counts.append(np.bincount(triples, minlength=125) / len(walks))
+        self.assertTrue(np.max(np.abs(counts[0] - counts[1])) < 0.01)
+
+
+class TestWalkCorpus(unittest.TestCase):
+    """Tests for `cellmaps_ppi_embedding.walks.WalkCorpus` class."""
+
+    def test_write_and_iterate(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            walk_file = os.path.join(temp_dir, 'walks.npy')
+            batches = [np.array([[0, 1, 0], [1, 0, 1]], dtype=np.int32),
+                       np.array([[2, Node2VecWalker.PAD, Node2VecWalker.PAD]], dtype=np.int32)]
+            WalkCorpus.write_walks(walk_file, batches, num_walks=3, walk_length=3)
+            corpus = WalkCorpus(walk_file, ['A', 'B', 'C'])
+            self.assertEqual(3, len(corpus))
+            expected = [['A', 'B', 'A'], ['B', 'A', 'B'], ['C']]
+            # corpus can be iterated more than once
+            self.assertEqual(expected, list(corpus))
+            self.assertEqual(expected, list(corpus))
+
+            corpus = WalkCorpus(walk_file)
+            self.assertEqual([[0, 1, 0], [1, 0, 1], [2]], list(corpus))
+            self.assertEqual([3, 3, 1, 0], corpus.get_counts(4).tolist())
+        finally:
+            shutil.rmtree(temp_dir)
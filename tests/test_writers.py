@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `cellmaps_ppi_embedding.writers` module."""
+
+import os
+import io
+import csv
+import gzip
+import tempfile
+import shutil
+
+import unittest
+import numpy as np
+from cellmaps_ppi_embedding import writers
+from cellmaps_ppi_embedding.exceptions import CellMapsPPIEmbeddingError
+
+
+class TestWriters(unittest.TestCase):
+    """Tests for `cellmaps_ppi_embedding.writers` module."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+        self._ids = ['ABC', 'DEF', 'GHI']
+        self._embeddings = np.arange(9, dtype=np.float64).reshape(3, 3) / 7.0
+
+    def tearDown(self):
+        """Tear down test fixtures, if any."""
+
+    def _write(self, output_format, outdir):
+        writer = writers.get_embedding_writer(output_format, outdir, 3)
+        writer.add_embeddings(self._ids[:2], self._embeddings[:2])
+        writer.add_embeddings(self._ids[2:], self._embeddings[2:].tolist())
+        writer.close()
+        self.assertEqual(3, writer.get_num_rows())
+        return writer
+
+    def test_get_embedding_writer_invalid_format(self):
+        try:
+            writers.get_embedding_writer('tsv', '/foo', 3)
+            self.fail('Expected exception')
+        except CellMapsPPIEmbeddingError as ce:
+            self.assertEqual('Unsupported output format: tsv', str(ce))
+
+    def _get_csv_writer_output(self):
+        f = io.StringIO(newline='')
+        writer = csv.writer(f, delimiter='\t')
+        writer.writerow(['id', 0, 1, 2])
+        for node_id, row in zip(self._ids, self._embeddings.astype(np.float32).tolist()):
+            writer.writerow([node_id] + row)
+        return f.getvalue().encode('utf-8')
+
+    def test_tsv_writer_matches_csv_writer(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            self._ids[1] = 'DE\tF'
+            writer = writers.TSVEmbeddingWriter(temp_dir, 3)
+            writer.add_embeddings(self._ids[:2], self._embeddings[:2])
+            writer.add_embeddings(self._ids[2:], self._embeddings[2:])
+            writer.close()
+            tsv_file = os.path.join(temp_dir, 'ppi_emd.tsv')
+            self.assertEqual([(tsv_file, 'tsv')], writer.get_output_files())
+            with open(tsv_file, 'rb') as f:
+                self.assertEqual(self._get_csv_writer_output(), f.read())
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_tsv_writer_float_format_and_compress(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            writer = writers.TSVEmbeddingWriter(temp_dir, 3, float_format='%.3g',
+                                                compress=True, workers=2)
+            for x in range(3):
+                writer.add_embeddings(self._ids[x:x + 1], self._embeddings[x:x + 1])
+            writer.close()
+            gz_file = os.path.join(temp_dir, 'ppi_emd.tsv.gz')
+            self.assertEqual([(gz_file, 'tsv.gz')], writer.get_output_files())
+            with gzip.open(gz_file, 'rt', newline='') as f:
+                self.assertEqual('id\t0\t1\t2\r\n'
+                                 'ABC\t0\t0.143\t0.286\r\n'
+                                 'DEF\t0.429\t0.571\t0.714\r\n'
+                                 'GHI\t0.857\t1\t1.14\r\n', f.read())
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_tsv_writer_invalid_float_format(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            writers.TSVEmbeddingWriter(temp_dir, 3, float_format='%s %s')
+            self.fail('Expected exception')
+        except CellMapsPPIEmbeddingError as ce:
+            self.assertTrue(str(ce).startswith('Invalid float format %s %s'))
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_npy_writer(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            writer = self._write(writers.NPY_FORMAT, temp_dir)
+            npy_file = os.path.join(temp_dir, 'ppi_emd.npy')
+            ids_file = os.path.join(temp_dir, 'ppi_emd_ids.txt')
+            self.assertEqual([(npy_file, 'npy'), (ids_file, 'txt')],
+                             writer.get_output_files())
+            res = np.load(npy_file, mmap_mode='r')
+            self.assertEqual(np.float32, res.dtype)
+            self.assertTrue(np.array_equal(self._embeddings.astype(np.float32), res))
+            with open(ids_file, 'r') as f:
+                self.assertEqual(self._ids, f.read().splitlines())
+        finally:
+            shutil.rmtree(temp_dir)
+
+    @unittest.skipUnless(writers.PYARROW_LOADED, 'pyarrow not installed')
+    def test_parquet_writer(self):
+        import pyarrow.parquet
+        temp_dir = tempfile.mkdtemp()
+        try:
+            self._write(writers.PARQUET_FORMAT, temp_dir)
+            table = pyarrow.parquet.read_table(os.path.join(temp_dir, 'ppi_emd.parquet'))
+            self.assertEqual(['id', '0', '1', '2'], table.column_names)
+            self.assertEqual(self._ids, table.column('id').to_pylist())
+            self.assertTrue(np.array_equal(self._embeddings[:, 1].astype(np.float32),
+                                           table.column('1').to_numpy()))
+        finally:
+            shutil.rmtree(temp_dir)
+
+    @unittest.skipUnless(writers.H5PY_LOADED, 'h5py not installed')
+    def test_hdf5_writer(self):
+        import h5py
+        temp_dir = tempfile.mkdtemp()
+        try:
+            self._write(writers.HDF5_FORMAT, temp_dir)
+            with h5py.File(os.path.join(temp_dir, 'ppi_emd.h5'), 'r') as f:
+                self.assertEqual(self._ids, [x.decode() for x in f['ids'][:]])
+                self.assertTrue(np.array_equal(self._embeddings.astype(np.float32),
+                                               f['embeddings'][:]))
+        finally:
+            shutil.rmtree(temp_dir)